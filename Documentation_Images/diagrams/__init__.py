@@ -0,0 +1,182 @@
+"""
+Documentation diagrams for Student Progress Tracker
+
+Each diagram lives in its own module with a `render(output, dpi=300, fmt='png')`
+function, laid out from a declarative spec in specs/. Any other spec dropped
+into specs/ is picked up as a diagram too, rendered to `<name>.png`. Modules
+are imported on first use, so looking up the registry does not pay for
+importing matplotlib.
+
+Renders are timed phase by phase when diagrams.phases is recording; set
+DIAGRAMS_TRACE to a file name to record a whole run into a Chrome trace.
+"""
+import argparse
+import atexit
+import importlib
+import io
+import os
+
+from . import phases
+from .phases import phase, render_phase
+from .specfile import list_specs
+
+# Rendering is always headless; pin Agg so nothing probes for a GUI toolkit
+# if pyplot does get imported along the way.
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# Output resolution when none is given
+DEFAULT_DPI = 300
+
+# Formats saved as vector graphics, whose files do not depend on the DPI
+VECTOR_FORMATS = ('svg', 'svgz', 'pdf', 'eps', 'ps')
+
+# Formats the diagrams can be saved in: every one takes the reproducible
+# metadata save_outputs passes, which Matplotlib's other raster writers reject
+OUTPUT_FORMATS = ('png', *VECTOR_FORMATS)
+
+# Diagram name -> default output file, in the order they are generated
+DIAGRAMS = {
+    'architecture': 'architecture_diagram.png',
+    'gpa_flow': 'gpa_calculation_flow.png',
+    'erd': 'database_erd.png',
+    'mvvm': 'mvvm_pattern.png',
+    'csv_export_flow': 'csv_export_flow.png',
+}
+
+# Spec-only diagrams: specs without a module of their own
+for _name in list_specs():
+    DIAGRAMS.setdefault(_name, f'{_name}.png')
+
+if os.environ.get(phases.TRACE_ENV) and not phases.enabled():
+    phases.enable()
+    atexit.register(phases.save, os.environ[phases.TRACE_ENV])
+
+
+def load(name):
+    """Import and return the module (or spec diagram) that draws diagram `name`"""
+    if name not in DIAGRAMS:
+        raise ValueError(f"Unknown diagram '{name}' (expected one of: {', '.join(DIAGRAMS)})")
+    try:
+        with phase('import', module=f'{__name__}.{name}'):
+            return importlib.import_module(f'{__name__}.{name}')
+    except ModuleNotFoundError as e:
+        if e.name != f'{__name__}.{name}':
+            raise
+    from .spec import SpecDiagram
+    return SpecDiagram(name)
+
+
+def default_output(name, fmt='png', dpi=None):
+    """Default file name for diagram `name` in format `fmt`
+
+    Raster outputs at a `dpi` other than DEFAULT_DPI carry it in the name
+    (database_erd-96dpi.png), so several resolutions can sit side by side.
+    """
+    base, _ = os.path.splitext(DIAGRAMS[name])
+    if dpi is not None and dpi != DEFAULT_DPI and fmt not in VECTOR_FORMATS:
+        base = f'{base}-{dpi}dpi'
+    return f'{base}.{fmt}'
+
+
+def parse_variant(text):
+    """Parse an output variant written as FMT[@DPI] ('png@96', 'svg') into (fmt, dpi)"""
+    fmt, _, dpi = text.partition('@')
+    if not fmt or (dpi and not dpi.isdigit()) or dpi == '0':
+        raise ValueError(f"bad output variant '{text}' (expected FMT or FMT@DPI, e.g. png@96)")
+    fmt = fmt.lower()
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"unsupported output format '{fmt}' (expected one of: {', '.join(OUTPUT_FORMATS)})")
+    return fmt, int(dpi) if dpi else DEFAULT_DPI
+
+
+def unique_variants(variants):
+    """`variants` without the ones that would overwrite an earlier one's file
+
+    Vector outputs are named without their DPI, so 'svg' and 'svg@96' both
+    write the same file; only the first is kept.
+    """
+    seen = set()
+    unique = []
+    for fmt, dpi in variants:
+        key = (fmt, None if fmt in VECTOR_FORMATS else dpi)
+        if key not in seen:
+            seen.add(key)
+            unique.append((fmt, dpi))
+    return unique
+
+
+def variant_type(text):
+    """parse_variant as an argparse `type`, so a bad --variant is a usage error"""
+    try:
+        return parse_variant(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def render(name, output=None, dpi=300, fmt='png'):
+    """Render diagram `name` to `output` (a path or a binary file object) and return it"""
+    if output is None:
+        output = default_output(name, fmt, dpi)
+    with render_phase(name):
+        return load(name).render(output, dpi=dpi, fmt=fmt)
+
+
+def render_to(name, target, dpi=300, fmt='png'):
+    """Render diagram `name` into memory or a stream; returns the output size in bytes
+
+    `target` is either a binary file object (BytesIO, an open file, a pipe),
+    which the encoded output is streamed to, or a writable buffer (bytearray,
+    memoryview, mmap), which it is written into from the start. Nothing goes
+    through a temporary file, and each encoded chunk is copied only into the
+    target. A buffer that is too small raises ValueError naming the size
+    needed.
+    """
+    from .buffers import BufferWriter, StreamWriter
+
+    if hasattr(target, 'write'):
+        seekable = getattr(target, 'seekable', None)
+        if seekable is not None and seekable():
+            start = target.tell()
+            render(name, target, dpi=dpi, fmt=fmt)
+            return target.tell() - start
+        stream = StreamWriter(target)
+        render(name, stream, dpi=dpi, fmt=fmt)
+        stream.flush()
+        return stream.size
+    writer = BufferWriter(target)
+    render(name, writer, dpi=dpi, fmt=fmt)
+    if writer.overflowed:
+        raise ValueError(f"{name}: the {fmt} output is {writer.size:,} bytes but the buffer "
+                         f"holds {writer.capacity:,}")
+    return writer.size
+
+
+def render_bytes(name, dpi=300, fmt='png'):
+    """Render diagram `name` and return the encoded output as a memoryview
+
+    The view exposes the in-memory file the output was encoded into, so the
+    bytes are handed over without another copy; call `bytes()` on it if an
+    immutable copy is needed.
+    """
+    buffer = io.BytesIO()
+    render(name, buffer, dpi=dpi, fmt=fmt)
+    return buffer.getbuffer()
+
+
+def render_outputs(name, outputs):
+    """Render diagram `name` to every (output, dpi, fmt) in `outputs`
+
+    The figure is built and laid out once and then saved once per output.
+    Returns the paths written.
+    """
+    with render_phase(name):
+        module = load(name)
+        if hasattr(module, 'render_outputs'):
+            return module.render_outputs(outputs)
+        return [module.render(output, dpi=dpi, fmt=fmt) for output, dpi, fmt in outputs]
+
+
+def variant_outputs(name, variants, output_dir='.'):
+    """(output, dpi, fmt) for every distinct (fmt, dpi) variant of diagram `name`"""
+    return [(os.path.join(output_dir, default_output(name, fmt, dpi)), dpi, fmt)
+            for fmt, dpi in unique_variants(variants)]
@@ -0,0 +1,63 @@
+"""
+Render one or more diagrams in a single Python process
+
+Usage:
+    python -m diagrams                      # every diagram
+    python -m diagrams erd gpa_flow         # just these
+    python -m diagrams erd --format svg --output-dir build
+    python -m diagrams erd --variant png --variant png@96 --variant svg --variant pdf
+    python -m diagrams --optimize balanced  # losslessly shrink the PNGs afterwards
+    python -m diagrams erd --trace erd_trace.json   # per-phase timings and a Chrome trace
+"""
+import argparse
+import os
+import sys
+
+from . import DIAGRAMS, OUTPUT_FORMATS, phases, pngopt, render_outputs, variant_outputs, variant_type
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams',
+                                     description='Render documentation diagrams.')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"diagrams to render (default: all of {', '.join(DIAGRAMS)})")
+    parser.add_argument('--output-dir', default='.', help='directory to write into')
+    parser.add_argument('--dpi', type=int, default=300, help='output resolution (default: 300)')
+    parser.add_argument('--format', dest='fmt', default='png', choices=OUTPUT_FORMATS,
+                        help='output format (default: png)')
+    parser.add_argument('--variant', dest='variants', action='append', type=variant_type, metavar='FMT[@DPI]',
+                        help='output to write, e.g. png@96 or svg; repeat to write several from one '
+                             'render (overrides --dpi and --format)')
+    parser.add_argument('--optimize', choices=list(pngopt.PRESETS),
+                        help='losslessly post-compress the PNG outputs with this preset')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='record per-phase timings into a Chrome trace, with a JSON summary '
+                             'next to it (FILE.json -> FILE.summary.json)')
+    args = parser.parse_args(argv)
+
+    names = args.names or list(DIAGRAMS)
+    unknown = [name for name in names if name not in DIAGRAMS]
+    if unknown:
+        parser.error(f"unknown diagram(s): {', '.join(unknown)}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.trace:
+        phases.enable()
+    variants = args.variants or [(args.fmt, args.dpi)]
+    written = []
+    for name in names:
+        outputs = render_outputs(name, variant_outputs(name, variants, args.output_dir))
+        print(f"{name} saved as {', '.join(outputs)}")
+        written += outputs
+    if args.optimize:
+        pngs = [output for output in written if output.endswith('.png')]
+        for summary in pngopt.optimize_files(pngs, args.optimize):
+            print(f"{summary['path']}: {summary['bytes_saved']:,} bytes saved "
+                  f"in {summary['encode_seconds']:.2f}s")
+    if args.trace:
+        phases.print_summary(phases.save(args.trace))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
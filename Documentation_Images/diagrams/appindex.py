@@ -0,0 +1,278 @@
+"""
+Index of the MAUI app's Views, ViewModels and services
+
+Scans the XAML pages in Views/ (the root element's x:Class and x:DataType,
+and the commands bound with `Command="{Binding ...}"`), their code-behind
+(what BindingContext is set to), and the classes in ViewModels/ and
+Services/ (injected fields, [RelayCommand] and ICommand commands, and the
+methods they call on each injected service). From that it works out which
+page binds to which ViewModel, the commands of every ViewModel, and the
+ApiService calls each one makes, directly or through another service.
+
+Like schema.py this is a pattern-based reader, not a parser. Each file's
+result is kept in .app_index.json keyed by modification time, size and
+content hash (schema.parse_files), so a warm run only stats the files and
+re-reads the ones that changed.
+
+Usage:
+    python -m diagrams.appindex                # one line per page/ViewModel pair
+    python -m diagrams.appindex .. --json
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from .schema import _CLASS, _class_body, _strip_comments, parse_files
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_APP_DIR = os.path.dirname(ROOT)
+CACHE_PATH = os.path.join(ROOT, '.app_index.json')
+
+# Bump when the readers change so indexed results are discarded
+INDEX_VERSION = 1
+
+SOURCE_DIRS = ['Views', 'ViewModels', 'Services']
+
+# The service every HTTP call goes through
+API_SERVICE = 'ApiService'
+
+_ROOT_ELEMENT = re.compile(r'<(?![?!])[\w:.]+(?P<attributes>[^>]*)>')
+_XML_ATTRIBUTE = re.compile(r'([\w:.]+)\s*=\s*"([^"]*)"')
+_COMMAND_BINDING = re.compile(r'Command\s*=\s*"\{Binding\s+(?:Path=)?([\w.]+)')
+_XML_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+_FIELD = re.compile(r'\b(?:private|protected|internal|public)\s+(?:readonly\s+)?'
+                    r'(?P<type>[A-Z]\w*)\s+(?P<name>_?\w+)\s*;')
+_RELAY_COMMAND = re.compile(r'\[RelayCommand[^\]]*\]\s*(?:(?:public|private|protected|internal|async|partial|static)\s+)*'
+                            r'[\w<>?,\s]+?\s+(?P<name>\w+)\s*\(')
+_COMMAND_PROPERTY = re.compile(r'\bpublic\s+I?(?:Async)?(?:Relay)?Command(?:<[^>]*>)?\s+(?P<name>\w+Command)\b')
+_CALL = re.compile(r'\b(?P<field>_?\w+)\.(?P<method>[A-Z]\w*)\s*[<(]')
+_CONSTRUCTOR_PARAMETER = re.compile(r'(?P<type>[A-Z]\w*)\s+(?P<name>\w+)\s*[,)]')
+_BINDING_CONTEXT = re.compile(
+    r'BindingContext\s*=\s*(?:ServiceHelper\.GetRequiredService<(?P<service>\w+)>|new\s+(?P<new>\w+)\s*\(|'
+    r'(?P<variable>\w+)\s*;)|BindingContext\s+is\s+(?P<is>\w+)|\((?P<cast>\w+)\)\s*BindingContext')
+
+
+def _short(type_name):
+    """Unqualified type name: 'viewmodels:GPAViewModel' or 'A.B.GPAViewModel' -> 'GPAViewModel'"""
+    return re.split(r'[:.]', type_name)[-1] if type_name else type_name
+
+
+def parse_xaml(text):
+    """Page class, compiled-binding type and bound commands of one XAML file"""
+    text = _XML_COMMENT.sub('', text)
+    root = _ROOT_ELEMENT.search(text)
+    attributes = dict(_XML_ATTRIBUTE.findall(root.group('attributes'))) if root else {}
+    return {
+        'kind': 'xaml',
+        'class': _short(attributes.get('x:Class')),
+        'data_type': _short(attributes.get('x:DataType')),
+        'commands': sorted(set(_COMMAND_BINDING.findall(text))),
+    }
+
+
+def _command_name(method):
+    """Command the MVVM toolkit generates for a [RelayCommand] method"""
+    name = method.removesuffix('Async')
+    if name.startswith('On') and name[2:3].isupper():
+        name = name[2:]
+    return f'{name}Command'
+
+
+def parse_csharp(text):
+    """Classes with their injected fields, commands, service calls and BindingContext types"""
+    text = _strip_comments(text)
+    classes = []
+    for match in _CLASS.finditer(text):
+        name = match.group('name')
+        body = _class_body(text, match.end())
+        fields = {field: type_name for type_name, field in
+                  ((m.group('type'), m.group('name')) for m in _FIELD.finditer(body))}
+        # Constructor parameters are services too, and what `BindingContext = viewModel` means
+        parameters = {}
+        for constructor in re.finditer(rf'\b{name}\s*\(([^)]*)\)\s*(?::[^{{]*)?\{{', body):
+            for parameter in _CONSTRUCTOR_PARAMETER.finditer(constructor.group(1) + ')'):
+                parameters[parameter.group('name')] = parameter.group('type')
+        calls = {}
+        for call in _CALL.finditer(body):
+            type_name = fields.get(call.group('field')) or parameters.get(call.group('field'))
+            if type_name:
+                calls.setdefault(type_name, set()).add(call.group('method'))
+        contexts = []
+        for context in _BINDING_CONTEXT.finditer(body):
+            variable = context.group('variable')
+            type_name = (context.group('service') or context.group('new') or context.group('is')
+                         or context.group('cast') or parameters.get(variable) or fields.get(variable))
+            if type_name and type_name not in contexts:
+                contexts.append(type_name)
+        commands = [_command_name(m.group('name')) for m in _RELAY_COMMAND.finditer(body)]
+        commands += [m.group('name') for m in _COMMAND_PROPERTY.finditer(body)]
+        classes.append({
+            'name': name,
+            'bases': [base.strip() for base in (match.group('bases') or '').split(',') if base.strip()],
+            'services': sorted(set(fields.values()) | set(parameters.values())),
+            'commands': list(dict.fromkeys(commands)),
+            'calls': {type_name: sorted(methods) for type_name, methods in sorted(calls.items())},
+            'binding_context': contexts,
+        })
+    return {'kind': 'csharp', 'classes': classes}
+
+
+def parse_app_file(text, path):
+    return parse_xaml(text) if path.endswith('.xaml') else parse_csharp(text)
+
+
+def source_files(app_dir):
+    """XAML and C# files the index is built from, sorted"""
+    files = []
+    for sub in SOURCE_DIRS:
+        for directory, dirs, names in os.walk(os.path.join(app_dir, sub)):
+            dirs[:] = [d for d in dirs if d not in ('bin', 'obj')]
+            files.extend(os.path.join(directory, name) for name in names
+                         if name.endswith(('.xaml', '.cs')))
+    return sorted(files)
+
+
+def build_app(parsed):
+    """Pages, ViewModels and services from the per-file results
+
+    Returns {'pairs': [{'page', 'viewmodel', 'wiring'}], 'viewmodels': {...},
+    'services': {...}}. A ViewModel lists its commands (with those bound in
+    XAML marked), the services it uses and the ApiService methods it reaches,
+    directly or through a service.
+    """
+    pages = {}
+    classes = {}
+    for path, result in parsed:
+        directory = os.path.basename(os.path.dirname(path))
+        if result['kind'] == 'xaml':
+            if result['class']:
+                page = pages.setdefault(result['class'], {'file': os.path.basename(path), 'wiring': []})
+                page['file'] = os.path.basename(path)
+                page['data_type'] = result['data_type']
+                page['bound'] = result['commands']
+            continue
+        for cls in result['classes']:
+            classes[cls['name']] = dict(cls, directory=directory)
+            if path.endswith('.xaml.cs'):
+                pages.setdefault(cls['name'], {'file': os.path.basename(path)[:-3], 'wiring': []})
+                pages[cls['name']]['binding_context'] = cls['binding_context']
+
+    viewmodels = {name: cls for name, cls in classes.items() if name.endswith('ViewModel')}
+    services = {name: cls for name, cls in classes.items()
+                if name.endswith('Service') and not name.startswith('I')}
+
+    def api_calls(cls, seen=()):
+        methods = set(cls['calls'].get(API_SERVICE, ()))
+        for type_name in cls['services']:
+            service = services.get(type_name)
+            if service is not None and type_name != API_SERVICE and type_name not in seen:
+                methods |= api_calls(service, seen + (type_name,))
+        return methods
+
+    pairs = []
+    paired = set()
+    bound = {}
+    for name, page in sorted(pages.items()):
+        viewmodel = None
+        wiring = []
+        if page.get('data_type') in viewmodels:
+            viewmodel = page['data_type']
+            wiring.append('x:DataType')
+        for type_name in page.get('binding_context', []):
+            if type_name in viewmodels and viewmodel in (None, type_name):
+                viewmodel = type_name
+                wiring.append('BindingContext')
+                break
+        if viewmodel is None and 'data_type' not in page and not page.get('binding_context'):
+            continue
+        pairs.append({'page': page['file'], 'viewmodel': viewmodel, 'wiring': wiring})
+        paired.add(viewmodel)
+        if viewmodel:
+            bound.setdefault(viewmodel, set()).update(page.get('bound', []))
+    pairs.extend({'page': None, 'viewmodel': name, 'wiring': []}
+                 for name in sorted(viewmodels) if name not in paired)
+    return {
+        'pairs': pairs,
+        'viewmodels': {name: {'commands': cls['commands'],
+                              'bound_commands': sorted(bound.get(name, set()) & set(cls['commands'])),
+                              'services': [s for s in cls['services'] if s in services or s == API_SERVICE],
+                              'api_calls': sorted(api_calls(cls))}
+                       for name, cls in sorted(viewmodels.items())},
+        'services': {name: {'services': [s for s in cls['services'] if s in services],
+                            'api_calls': sorted(api_calls(cls)) if name != API_SERVICE else [],
+                            'used_by': sorted(vm for vm, vm_cls in viewmodels.items()
+                                              if name in vm_cls['services'])}
+                     for name, cls in sorted(services.items())},
+    }
+
+
+def extract_app(app_dir=DEFAULT_APP_DIR, cache_path=CACHE_PATH, stats=None):
+    """The MVVM structure of the MAUI app under `app_dir`
+
+    The result also carries 'sources', a digest of the files it was read from.
+    """
+    files = source_files(app_dir)
+    if not files:
+        raise ValueError(f"No Views, ViewModels or Services sources found under {app_dir}")
+    parsed = parse_files(files, cache_path, stats, parse=parse_app_file, version=INDEX_VERSION)
+    app = build_app([(path, parsed[path]['result']) for path in files])
+    app['sources'] = _sources_digest(app_dir, files, parsed)
+    return app
+
+
+def _sources_digest(app_dir, files, parsed):
+    digest = hashlib.sha256()
+    prefix = len(os.path.join(app_dir, ''))
+    for path in files:
+        digest.update(f"{path[prefix:]}:{parsed[path]['sha256']}\n".encode())
+    return digest.hexdigest()
+
+
+def sources_digest(app_dir, cache_path=CACHE_PATH):
+    """Hash over the contents of every indexed source file, via the index, without building the app"""
+    files = source_files(app_dir)
+    if not files:
+        raise ValueError(f"No Views, ViewModels or Services sources found under {app_dir}")
+    return _sources_digest(app_dir, files, parse_files(files, cache_path, parse=parse_app_file,
+                                                        version=INDEX_VERSION))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.appindex',
+                                     description="Index the MAUI app's Views, ViewModels and services.")
+    parser.add_argument('app_dir', nargs='?', default=DEFAULT_APP_DIR,
+                        help='app project directory (default: the parent of Documentation_Images)')
+    parser.add_argument('--json', action='store_true', help='print the whole index as JSON')
+    parser.add_argument('--no-cache', action='store_true', help='read every file')
+    args = parser.parse_args(argv)
+
+    stats = {}
+    start = time.perf_counter()
+    try:
+        app = extract_app(args.app_dir, None if args.no_cache else CACHE_PATH, stats)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if args.json:
+        print(json.dumps(app, indent=2))
+        return 0
+    for pair in app['pairs']:
+        viewmodel = app['viewmodels'].get(pair['viewmodel'], {})
+        print(f"{pair['page'] or '-':<24} {pair['viewmodel'] or '-':<24} {', '.join(pair['wiring']) or '-':<26} "
+              f"{len(viewmodel.get('commands', [])):>2} commands, {len(viewmodel.get('api_calls', [])):>2} API calls")
+    for name, service in app['services'].items():
+        print(f"{name:<24} used by {len(service['used_by'])} ViewModel(s)"
+              + (f", {len(service['api_calls'])} API calls" if service['api_calls'] else ''))
+    print(f"{len(app['pairs'])} pages/ViewModels, {len(app['services'])} services in {elapsed:.1f} ms "
+          f"({stats['parsed']} parsed, {stats['rehashed']} re-hashed, {stats['reused']} reused)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
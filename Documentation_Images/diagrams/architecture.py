@@ -0,0 +1,21 @@
+"""
+Three-Tier Architecture Diagram for Student Progress Tracker
+
+Laid out from specs/architecture.json.
+"""
+from .spec import render_spec, render_spec_outputs
+
+OUTPUT = 'architecture_diagram.png'
+
+
+def render(output=OUTPUT, dpi=300, fmt='png'):
+    """Draw the three-tier architecture diagram and save it to `output`"""
+    return render_spec('architecture', output, dpi=dpi, fmt=fmt)
+
+
+def render_outputs(outputs):
+    """Draw the three-tier architecture diagram once and save it to each of `outputs`
+
+    `outputs` is a list of (output, dpi, fmt) tuples.
+    """
+    return render_spec_outputs('architecture', outputs)
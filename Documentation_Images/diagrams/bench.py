@@ -0,0 +1,289 @@
+"""
+Benchmark suite for the documentation diagrams
+
+Each run renders one diagram in a fresh interpreter and records wall time,
+CPU time, peak RSS, the number of figure draws, the time spent inside them,
+the number of artists the diagram added and the output size. A suite
+run appends one record to a JSON-lines history file; `compare` checks the
+latest record against an earlier one and fails when any metric got worse by
+more than a threshold.
+
+Usage:
+    python -m diagrams.bench run                       # all diagrams, 5 runs each
+    python -m diagrams.bench run erd --runs 10 --label before-collections
+    python -m diagrams.bench compare                   # latest vs the one before
+    python -m diagrams.bench compare --baseline before-collections --threshold 0.05
+    python -m diagrams.bench run --unbatched --label one-artist-per-primitive
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import DIAGRAMS, default_output
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY = os.path.join(ROOT, 'benchmark_history.jsonl')
+
+# Metrics recorded per run; lower is better for all of them
+METRICS = ['wall_s', 'cpu_s', 'peak_rss_mb', 'draws', 'draw_s', 'artists', 'bytes']
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure_render(name, output, dpi=300, fmt='png', batched=True):
+    """Render one diagram in this process and return its metrics"""
+    import diagrams
+    from diagrams import draw
+    from matplotlib.figure import Figure
+
+    draws = 0
+    draw_s = 0.0
+    artists = 0
+    original_draw = Figure.draw
+
+    def counting_draw(self, renderer):
+        nonlocal draws, draw_s, artists
+        draws += 1
+        artists = max(artists, sum(len(ax.patches) + len(ax.lines) + len(ax.texts) + len(ax.collections)
+                                   for ax in self.axes))
+        start = time.perf_counter()
+        try:
+            return original_draw(self, renderer)
+        finally:
+            draw_s += time.perf_counter() - start
+
+    draw.BATCH_PRIMITIVES = batched
+    module = diagrams.load(name)
+    Figure.draw = counting_draw
+    try:
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        module.render(output, dpi=dpi, fmt=fmt)
+        cpu_s = time.process_time() - cpu_start
+        wall_s = time.perf_counter() - wall_start
+    finally:
+        Figure.draw = original_draw
+
+    return {
+        'wall_s': wall_s,
+        'cpu_s': cpu_s,
+        'peak_rss_mb': _peak_rss_mb(),
+        'draws': draws,
+        'draw_s': draw_s,
+        'artists': artists,
+        'bytes': os.path.getsize(output),
+    }
+
+
+def run_once(name, dpi=300, fmt='png', batched=True):
+    """Measure one diagram in a fresh interpreter so runs do not share state"""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, default_output(name, fmt))
+        command = [sys.executable, '-m', 'diagrams.bench', 'worker', name,
+                   output, '--dpi', str(dpi), '--format', fmt]
+        if not batched:
+            command.append('--unbatched')
+        proc = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    """Median of every metric over a diagram's runs"""
+    summary = {}
+    for metric in METRICS:
+        values = [sample[metric] for sample in samples if sample[metric] is not None]
+        summary[metric] = statistics.median(values) if values else None
+    return summary
+
+
+def _git_commit():
+    try:
+        proc = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return proc.stdout.strip() or None
+
+
+def run_suite(names, runs, dpi=300, fmt='png', label=None, batched=True):
+    """Benchmark every named diagram `runs` times and return a history record"""
+    from .cache import library_versions
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'label': label,
+        'commit': _git_commit(),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'libraries': library_versions(),
+        'dpi': dpi,
+        'format': fmt,
+        'runs': runs,
+        'batched': batched,
+        'diagrams': {},
+    }
+    for name in names:
+        samples = [run_once(name, dpi, fmt, batched) for _ in range(runs)]
+        record['diagrams'][name] = dict(summarize(samples), samples=samples)
+    return record
+
+
+def load_history(path):
+    """All records in a history file, oldest first"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, record):
+    """Append one suite record to the history file"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def find_record(history, ref):
+    """Look a record up by label, or by index (negative counts from the end)"""
+    for record in reversed(history):
+        if record.get('label') == ref:
+            return record
+    try:
+        return history[int(ref)]
+    except (ValueError, IndexError):
+        raise SystemExit(f"No benchmark record matches '{ref}'")
+
+
+def compare(baseline, current, thresholds):
+    """Compare two records; returns (rows, regressions)
+
+    A metric regresses when it grew by more than its relative threshold.
+    """
+    rows = []
+    regressions = []
+    for name, now in current['diagrams'].items():
+        before = baseline['diagrams'].get(name)
+        if before is None:
+            continue
+        for metric in METRICS:
+            old, new = before.get(metric), now.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+            regressed = change > thresholds[metric]
+            rows.append((name, metric, old, new, change, regressed))
+            if regressed:
+                regressions.append((name, metric))
+    return rows, regressions
+
+
+def print_record(record):
+    """Print the per-diagram medians of a suite record"""
+    print(f"{'diagram':<16} {'wall s':>8} {'cpu s':>8} {'peak MB':>8} {'draws':>6} {'draw s':>8} "
+          f"{'artists':>8} {'bytes':>10}")
+    for name, stats in record['diagrams'].items():
+        rss = f"{stats['peak_rss_mb']:8.1f}" if stats['peak_rss_mb'] is not None else f"{'-':>8}"
+        print(f"{name:<16} {stats['wall_s']:8.3f} {stats['cpu_s']:8.3f} {rss} "
+              f"{stats['draws']:6.0f} {stats['draw_s']:8.3f} {stats['artists']:8.0f} "
+              f"{stats['bytes']:10,.0f}")
+
+
+def _format_value(metric, value):
+    if metric == 'bytes':
+        return f'{value:,.0f}'
+    if metric in ('draws', 'artists'):
+        return f'{value:.0f}'
+    return f'{value:.3f}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.bench',
+                                     description='Benchmark diagram rendering.')
+    parser.add_argument('--history', default=HISTORY,
+                        help='JSON-lines history file (default: benchmark_history.jsonl)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='benchmark diagrams and append the result to the history')
+    run.add_argument('names', nargs='*', metavar='name',
+                     help=f"diagrams to benchmark (default: all of {', '.join(DIAGRAMS)})")
+    run.add_argument('--runs', type=int, default=5, help='fresh-process runs per diagram (default: 5)')
+    run.add_argument('--label', help='name for this record, usable as a compare baseline')
+    run.add_argument('--dpi', type=int, default=300)
+    run.add_argument('--format', dest='fmt', default='png')
+    run.add_argument('--unbatched', action='store_true',
+                     help='draw one artist per primitive instead of batching into collections')
+
+    cmp = commands.add_parser('compare', help='fail if the latest record regressed against a baseline')
+    cmp.add_argument('--baseline', default='-2',
+                     help='label or index of the baseline record (default: -2, the one before latest)')
+    cmp.add_argument('--current', default='-1', help='label or index of the record to check (default: -1)')
+    cmp.add_argument('--threshold', type=float, default=0.10,
+                     help='allowed relative increase for every metric (default: 0.10)')
+    for metric in METRICS:
+        cmp.add_argument(f"--max-{metric.replace('_', '-')}", type=float, dest=metric,
+                         help=f'allowed relative increase for {metric} (overrides --threshold)')
+
+    worker = commands.add_parser('worker')  # one measured render; used by `run`
+    worker.add_argument('name')
+    worker.add_argument('output')
+    worker.add_argument('--dpi', type=int, default=300)
+    worker.add_argument('--format', dest='fmt', default='png')
+    worker.add_argument('--unbatched', action='store_true')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        print(json.dumps(measure_render(args.name, args.output, args.dpi, args.fmt,
+                                        batched=not args.unbatched)))
+        return 0
+
+    if args.command == 'run':
+        names = args.names or list(DIAGRAMS)
+        unknown = [name for name in names if name not in DIAGRAMS]
+        if unknown:
+            parser.error(f"unknown diagram(s): {', '.join(unknown)}")
+        record = run_suite(names, args.runs, args.dpi, args.fmt, args.label, not args.unbatched)
+        append_history(args.history, record)
+        print_record(record)
+        print(f"Appended to {args.history}")
+        return 0
+
+    history = load_history(args.history)
+    if len(history) < 2:
+        print(f"Need at least two records in {args.history} to compare")
+        return 1
+    baseline = find_record(history, args.baseline)
+    current = find_record(history, args.current)
+    thresholds = {metric: getattr(args, metric) if getattr(args, metric) is not None
+                  else args.threshold for metric in METRICS}
+    rows, regressions = compare(baseline, current, thresholds)
+
+    print(f"Baseline: {baseline['timestamp']} {baseline.get('label') or ''} ({baseline.get('commit')})")
+    print(f"Current:  {current['timestamp']} {current.get('label') or ''} ({current.get('commit')})")
+    for name, metric, old, new, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"  {name:<16} {metric:<12} {_format_value(metric, old):>12} -> "
+              f"{_format_value(metric, new):>12} {change:+7.1%}{flag}")
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed past the threshold")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
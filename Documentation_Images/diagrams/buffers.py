@@ -0,0 +1,96 @@
+"""
+File objects over caller-supplied buffers and streams
+
+matplotlib's PNG writer only needs `write`, but the PDF and SVG backends
+also ask for `tell` (PDF cross-reference offsets) and refuse targets without
+`seek`, and TIFF seeks back to patch headers. These adapters give them that
+over a writable buffer or a plain stream, copying each encoded chunk once,
+straight into its destination.
+"""
+import io
+
+
+class BufferWriter(io.RawIOBase):
+    """Seekable binary file that writes into a caller's buffer
+
+    `buffer` is anything writable that supports the buffer protocol
+    (bytearray, memoryview, mmap, a NumPy array). Writes past its end are
+    not stored but still counted, so `size` always tells how large the full
+    output is and `overflowed` whether it fit.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        if self._view.readonly:
+            raise TypeError('the target buffer is read-only')
+        self._pos = 0
+        self.size = 0
+
+    @property
+    def capacity(self):
+        return len(self._view)
+
+    @property
+    def overflowed(self):
+        return self.size > len(self._view)
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        end = self._pos + len(data)
+        if end <= len(self._view):
+            self._view[self._pos:end] = data
+        elif self._pos < len(self._view):
+            self._view[self._pos:] = data[:len(self._view) - self._pos]
+        self._pos = end
+        self.size = max(self.size, end)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self.size}[whence]
+        if base + offset < 0:
+            raise ValueError('negative seek position')
+        self._pos = base + offset
+        return self._pos
+
+
+class StreamWriter(io.RawIOBase):
+    """Write-only file over a stream that cannot tell or seek (a pipe, a socket file)
+
+    Positions are counted from the first byte written here, which is what
+    the PDF backend needs for its offsets.
+    """
+
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        done = 0
+        # Raw streams may take only part of a chunk; callers expect it all written
+        while done < len(data):
+            written = self._stream.write(data[done:])
+            done += len(data) - done if written is None else written
+        self.size += done
+        return done
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        if not getattr(self._stream, 'closed', False):
+            self._stream.flush()
@@ -0,0 +1,242 @@
+"""
+Content-hash build cache for the documentation diagrams
+
+Every diagram gets a fingerprint built from everything that can change its
+output: the generator module and its spec, the C# models a schema-driven
+spec reads, the Views and ViewModels an app-driven spec reads, the projects
+of a solution-driven spec, the shared layout, drawing and output-pinning code
+and the bundled font list, the installed matplotlib/numpy/Pillow/zlib
+versions, the pinned and installed font files, the DPI, the format and the
+PNG optimization preset. The fingerprints are kept in a JSON manifest next
+to the outputs together with output hashes, sizes and timings, so an
+incremental build can skip every diagram whose fingerprint still matches.
+
+Nothing in here imports matplotlib, which keeps a no-op build in the
+millisecond range.
+"""
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import time
+import zlib
+
+from . import appindex, fonts, schema, solution
+from .specfile import SPEC_EXTENSIONS, SPECS_DIR, find_spec_file, read_spec
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MANIFEST_VERSION = 1
+
+# Package sources every diagram depends on besides its own module and spec
+SHARED_SOURCES = ['__init__.py', 'common.py', 'scene.py', 'spec.py', 'specfile.py', 'schema.py', 'layout.py',
+                  'draw.py', 'appindex.py', 'solution.py', 'reproducible.py', 'fonts.py']
+
+# Package data every diagram depends on: the bundled font list and its pins (see fonts.py)
+SHARED_DATA = [os.path.join('fontlist', '*.json')]
+
+# Import name -> distribution name of the libraries that affect rendered bytes
+LIBRARIES = {'matplotlib': 'matplotlib', 'numpy': 'numpy', 'PIL': 'pillow'}
+
+# Human readable names used when explaining why a diagram was rebuilt
+INPUT_LABELS = {
+    'source': 'generator source or spec',
+    'shared': 'shared package code or font list',
+    'schema': 'C# models',
+    'app': 'MAUI views and view models',
+    'solution': 'solution and project files',
+    'libraries': 'library versions',
+    'fonts': 'fonts',
+    'dpi': 'DPI',
+    'format': 'format',
+    'optimize': 'PNG optimization preset',
+}
+
+# pngopt summary fields recorded for optimized outputs
+OPTIMIZE_FIELDS = ['preset', 'bytes_before', 'bytes_saved', 'encode_seconds', 'color_type', 'bit_depth',
+                   'filter']
+
+_library_versions = None
+_fonts_digest = None
+
+
+def file_sha256(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _installed_version(module, dist):
+    """Version of an installed distribution, read from its dist-info directory
+
+    importlib.metadata would do the same lookup but costs more to import than
+    the rest of a no-op build put together.
+    """
+    spec = importlib.util.find_spec(module)
+    if spec is None:
+        return None
+    location = (spec.submodule_search_locations[0] if spec.submodule_search_locations
+                else spec.origin)
+    site_dir = os.path.dirname(location)
+    prefix = dist.lower().replace('-', '_') + '-'
+    for entry in os.listdir(site_dir):
+        name = entry.lower()
+        if name.startswith(prefix) and name.endswith('.dist-info'):
+            return entry[len(prefix):-len('.dist-info')]
+
+    from importlib import metadata
+    try:
+        return metadata.version(dist)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def library_versions():
+    """Installed versions of the rendering libraries, and of the zlib pngopt compresses with"""
+    global _library_versions
+    if _library_versions is None:
+        _library_versions = {dist: _installed_version(module, dist)
+                             for module, dist in LIBRARIES.items()}
+        _library_versions['zlib'] = zlib.ZLIB_RUNTIME_VERSION
+    return _library_versions
+
+
+def fonts_digest():
+    """Digest of the font files matplotlib ships and the diagrams draw with
+
+    Covers the SHA-256 of every font the bundled font list pins, and the
+    names and sizes of the TrueType fonts installed with matplotlib.
+    """
+    global _fonts_digest
+    if _fonts_digest is None:
+        digest = hashlib.sha256()
+        pins = fonts.load_pins() or {'fonts': {}}
+        for name, pin in sorted(pins['fonts'].items()):
+            digest.update(f"pin {name}:{pin['sha256']}\n".encode())
+        spec = importlib.util.find_spec('matplotlib')
+        if spec is not None and spec.submodule_search_locations:
+            font_dir = os.path.join(spec.submodule_search_locations[0], 'mpl-data', 'fonts', 'ttf')
+            if os.path.isdir(font_dir):
+                for entry in sorted(os.scandir(font_dir), key=lambda e: e.name):
+                    digest.update(f'{entry.name}:{entry.stat().st_size}\n'.encode())
+        _fonts_digest = digest.hexdigest()
+    return _fonts_digest
+
+
+def diagram_sources(name):
+    """Source files that diagram `name` is drawn from, as (own, shared) lists
+
+    A diagram's own sources are its module and its spec; spec-only diagrams
+    have no module.
+    """
+    own = [os.path.join(PACKAGE_DIR, f'{name}.py')]
+    own += [os.path.join(SPECS_DIR, name + ext) for ext in SPEC_EXTENSIONS]
+    shared = [os.path.join(PACKAGE_DIR, source) for source in SHARED_SOURCES]
+    for pattern in SHARED_DATA:
+        shared += sorted(glob.glob(os.path.join(PACKAGE_DIR, pattern)))
+    return [path for path in own if os.path.exists(path)], shared
+
+
+def _combined_sha256(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(f'{os.path.basename(path)}:{file_sha256(path)}\n'.encode())
+    return digest.hexdigest()
+
+
+def diagram_inputs(name, dpi=300, fmt='png', optimize=None):
+    """Everything that determines the bytes of one rendered diagram
+
+    `optimize` is the PNG post-compression preset, if any (see pngopt.py).
+    """
+    own, shared = diagram_sources(name)
+    inputs = {
+        'source': _combined_sha256(own),
+        'shared': _combined_sha256(shared),
+        'libraries': library_versions(),
+        'fonts': fonts_digest(),
+        'dpi': dpi,
+        'format': fmt,
+    }
+    spec_path = find_spec_file(name)
+    if spec_path:
+        _, spec = read_spec(spec_path)
+        if 'schema' in spec:
+            inputs['schema'] = schema.sources_digest(spec['schema'])
+        if 'app' in spec:
+            inputs['app'] = appindex.sources_digest(spec['app'])
+        if 'solution' in spec:
+            inputs['solution'] = solution.sources_digest(spec['solution'])
+    if optimize and fmt == 'png':
+        inputs['optimize'] = {'preset': optimize,
+                              'source': file_sha256(os.path.join(PACKAGE_DIR, 'pngopt.py'))}
+    return inputs
+
+
+def fingerprint(inputs):
+    """Single hash over a diagram's inputs"""
+    blob = json.dumps(inputs, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def load_manifest(path):
+    """Read a build manifest, or return an empty one if there is none"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'outputs': {}}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'outputs': {}}
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically so an interrupted build cannot corrupt it"""
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+def stale_reason(entry, inputs, output_path):
+    """Why a diagram has to be rebuilt, or None when its output is up to date"""
+    if not entry or entry.get('status') == 'failed':
+        return 'not built before'
+    if entry.get('fingerprint') != fingerprint(inputs):
+        previous = entry.get('inputs', {})
+        changed = [INPUT_LABELS.get(key, key) for key in sorted(inputs)
+                   if previous.get(key) != inputs[key]]
+        return f"{', '.join(changed) or 'inputs'} changed"
+    try:
+        size = os.path.getsize(output_path)
+    except OSError:
+        return 'output missing'
+    if size != entry.get('bytes') or file_sha256(output_path) != entry.get('sha256'):
+        return 'output modified'
+    return None
+
+
+def output_entry(name, inputs, output_path, seconds, optimized=None):
+    """Manifest record for a freshly rendered (and possibly optimized) output
+
+    `optimized` is the summary pngopt.optimize_png returned for the output.
+    """
+    entry = {
+        'diagram': name,
+        'status': 'built',
+        'fingerprint': fingerprint(inputs),
+        'inputs': inputs,
+        'bytes': os.path.getsize(output_path),
+        'sha256': file_sha256(output_path),
+        'render_seconds': round(seconds, 4),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    if optimized:
+        entry['optimize'] = {key: optimized[key] for key in OPTIMIZE_FIELDS if key in optimized}
+    return entry
@@ -0,0 +1,229 @@
+"""
+Shared colors and drawing helpers for the documentation diagrams
+
+The helpers add primitives to a SceneBuilder (see scene.py) rather than to a
+matplotlib axis, so laying a diagram out does not need matplotlib at all.
+"""
+import math
+
+# Color schemes - one per diagram style
+ARCHITECTURE_COLORS = {
+    'client': '#4A90E2',      # Blue
+    'api': '#5B9BD5',         # Medium blue
+    'database': '#7F8C8D',    # Gray
+    'connection': '#34495E',  # Dark gray
+    'library': '#27AE60',     # Green
+    'text': '#2C3E50',        # Dark blue-gray
+    'bg': '#FFFFFF'           # White
+}
+
+SEQUENCE_COLORS = {
+    'user': '#3498DB',
+    'maui': '#9B59B6',
+    'api': '#E74C3C',
+    'db': '#27AE60',
+    'text': '#2C3E50',
+    'line': '#7F8C8D'
+}
+
+ERD_COLORS = {
+    'table': '#3498DB',
+    'pk': '#E74C3C',
+    'fk': '#F39C12',
+    'text': '#2C3E50',
+    'line': '#34495E',  # Darker gray for better visibility
+    'bg': '#FFFFFF'
+}
+
+MVVM_COLORS = {
+    'view': '#3498DB',      # Blue
+    'viewmodel': '#9B59B6',  # Purple
+    'model': '#E74C3C',     # Red
+    'service': '#27AE60',   # Green
+    'text': '#2C3E50',
+    'arrow': '#7F8C8D',
+    'binding': '#F39C12'    # Orange for bindings
+}
+
+FLOWCHART_COLORS = {
+    'start_end': '#27AE60',   # Green
+    'process': '#3498DB',     # Blue
+    'decision': '#E74C3C',    # Red
+    'text': '#2C3E50',
+    'arrow': '#7F8C8D',
+    'error': '#E74C3C'
+}
+
+REPORT_COLORS = {
+    'gpa': '#3498DB',         # Blue
+    'cumulative': '#E67E22',  # Orange
+    'income': '#27AE60',      # Green
+    'text': '#2C3E50',
+    'grid': '#D5DBDB',
+    # Series colors for statuses, grades and expense categories, in order
+    'series': ['#3498DB', '#E67E22', '#9B59B6', '#E74C3C', '#1ABC9C', '#F1C40F',
+               '#34495E', '#EC7063', '#95A5A6'],
+}
+
+
+# Palettes by name, for specs that pick one with "palette"
+PALETTES = {
+    'architecture': ARCHITECTURE_COLORS,
+    'sequence': SEQUENCE_COLORS,
+    'erd': ERD_COLORS,
+    'mvvm': MVVM_COLORS,
+    'flowchart': FLOWCHART_COLORS,
+    'report': REPORT_COLORS,
+}
+
+
+# ERD helpers
+
+def draw_table(scene, x, y, name, fields, pk_fields, fk_fields=None, colors=ERD_COLORS):
+    """Draw a database table box"""
+    if fk_fields is None:
+        fk_fields = []
+
+    # Calculate box size
+    box_width, box_height = table_size(fields, name)
+
+    # Table box
+    scene.box(x - box_width/2, y - box_height/2, box_width, box_height,
+              boxstyle="round,pad=0.05",
+              edgecolor=colors['table'],
+              facecolor='white',
+              linewidth=2)
+
+    # Table name (header)
+    scene.rect(x - box_width/2, y + box_height/2 - 0.4, box_width, 0.4,
+               facecolor=colors['table'],
+               edgecolor=colors['table'],
+               linewidth=2)
+    scene.text(x, y + box_height/2 - 0.2, name,
+               ha='center', va='center', fontsize=11,
+               fontweight='bold', color='white')
+
+    # Fields
+    field_y = y + box_height/2 - 0.5
+    for field in fields:
+        field_text = field
+        if field in pk_fields:
+            field_text = f"PK: {field}"
+        elif field in fk_fields:
+            field_text = f"FK: {field}"
+
+        scene.text(x - box_width/2 + 0.1, field_y, field_text,
+                   ha='left', va='center', fontsize=8, color=colors['text'])
+        field_y -= 0.35
+
+    return x, y, box_width, box_height
+
+
+def table_size(fields, name=''):
+    """Width and height of the box draw_table uses for `fields`
+
+    Boxes are 2.2 wide unless a field (with its "PK: " prefix) or the table
+    name is too long to fit.
+    """
+    longest = max((len(field) for field in fields), default=0) + 4
+    width = max(2.2, 0.3 + 0.055 * longest, 0.4 + 0.075 * len(name))
+    return width, 0.4 + len(fields) * 0.35
+
+
+def draw_relationship(scene, from_x, from_y, to_x, to_y, label, side='right', linewidth=3,
+                      colors=ERD_COLORS):
+    """Draw a relationship line with crow's foot notation"""
+    line_style = dict(color=colors['line'], linewidth=linewidth, alpha=0.8)
+    # Main line - THICKER and DARKER
+    scene.line(from_x, from_y, to_x, to_y, zorder=1, **line_style)
+
+    # Crow's foot at "many" end
+    if side == 'right':
+        # Draw crow's foot at to_x, to_y
+        foot_size = 0.2
+        angle = math.atan2(to_y - from_y, to_x - from_x)
+        # Perpendicular direction
+        perp_angle = angle + math.pi/2
+
+        # Three lines for crow's foot
+        end_x = to_x - 0.4 * math.cos(angle)
+        end_y = to_y - 0.4 * math.sin(angle)
+
+        # Left branch
+        scene.line(end_x, end_y,
+                   end_x - foot_size * math.cos(perp_angle),
+                   end_y - foot_size * math.sin(perp_angle), zorder=2, **line_style)
+        # Right branch
+        scene.line(end_x, end_y,
+                   end_x + foot_size * math.cos(perp_angle),
+                   end_y + foot_size * math.sin(perp_angle), zorder=2, **line_style)
+        # Center line
+        scene.line(end_x, end_y, to_x, to_y, zorder=2, **line_style)
+
+        # Single line at "one" end
+        start_x = from_x + 0.4 * math.cos(angle)
+        start_y = from_y + 0.4 * math.sin(angle)
+        scene.line(from_x, from_y, start_x, start_y, zorder=2, **line_style)
+
+    # Label
+    mid_x = (from_x + to_x) / 2
+    mid_y = (from_y + to_y) / 2
+    scene.text(mid_x, mid_y, label, ha='center', va='center', fontsize=9,
+               bbox=dict(boxstyle='round,pad=0.3', facecolor='white',
+                         edgecolor=colors['line'], linewidth=1.5))
+
+
+# Flowchart helpers
+
+def draw_process(scene, x, y, text, width=2, height=0.6, colors=FLOWCHART_COLORS):
+    """Draw a process box (rectangle)"""
+    scene.box(x - width/2, y - height/2, width, height,
+              boxstyle="round,pad=0.05",
+              edgecolor=colors['process'],
+              facecolor='white',
+              linewidth=2)
+    scene.text(x, y, text, ha='center', va='center',
+               fontsize=9, color=colors['text'], fontweight='bold')
+    return x, y
+
+
+def draw_decision(scene, x, y, text, width=1.8, height=1.2, colors=FLOWCHART_COLORS):
+    """Draw a decision diamond"""
+    scene.diamond(x, y, width, height,
+                  edgecolor=colors['decision'],
+                  facecolor='white',
+                  linewidth=2)
+    scene.text(x, y, text, ha='center', va='center',
+               fontsize=8.5, color=colors['text'], fontweight='bold')
+    return x, y
+
+
+def draw_start_end(scene, x, y, text, width=2.2, height=0.6, colors=FLOWCHART_COLORS):
+    """Draw start/end oval"""
+    # Rounded rectangle (oval-like)
+    scene.box(x - width/2, y - height/2, width, height,
+              boxstyle="round,pad=0.1",
+              edgecolor=colors['start_end'],
+              facecolor=colors['start_end'],
+              linewidth=2, alpha=0.3)
+    scene.text(x, y, text, ha='center', va='center',
+               fontsize=9, color=colors['text'], fontweight='bold')
+    return x, y
+
+
+def draw_arrow(scene, x1, y1, x2, y2, label=None, label_pos='right', colors=FLOWCHART_COLORS):
+    """Draw an arrow with optional label"""
+    scene.arrow(x1, y1, x2, y2,
+                arrowstyle='->', mutation_scale=20,
+                linewidth=2, color=colors['arrow'],
+                zorder=3)
+    if label:
+        mid_x = (x1 + x2) / 2
+        mid_y = (y1 + y2) / 2
+        label_style = dict(va='center', fontsize=8, color=colors['text'],
+                           bbox=dict(boxstyle='round,pad=0.2', facecolor='white',
+                                     edgecolor=colors['arrow'], linewidth=1))
+        if label_pos == 'right':
+            scene.text(mid_x + 0.3, mid_y, label, ha='left', **label_style)
+        else:
+            scene.text(mid_x - 0.3, mid_y, label, ha='right', **label_style)
@@ -0,0 +1,21 @@
+"""
+CSV Export Flow Diagram (Flowchart)
+
+Laid out from specs/csv_export_flow.json.
+"""
+from .spec import render_spec, render_spec_outputs
+
+OUTPUT = 'csv_export_flow.png'
+
+
+def render(output=OUTPUT, dpi=300, fmt='png'):
+    """Draw the transcript CSV export flowchart and save it to `output`"""
+    return render_spec('csv_export_flow', output, dpi=dpi, fmt=fmt)
+
+
+def render_outputs(outputs):
+    """Draw the transcript CSV export flowchart once and save it to each of `outputs`
+
+    `outputs` is a list of (output, dpi, fmt) tuples.
+    """
+    return render_spec_outputs('csv_export_flow', outputs)
@@ -0,0 +1,445 @@
+"""
+Draw scenes with matplotlib and save them
+
+Primitives are batched: boxes, rectangles and diamonds that share a style go
+into one PatchCollection, and lines that share a style into one
+LineCollection, so a diagram costs a handful of artists rather than one per
+primitive. Arrows, arcs and text stay individual artists. The batches come
+from one np.unique over the kind and style columns, and a batch is drawn
+where its first primitive was. It is split where that would draw a primitive
+in front of an overlapping one that came earlier at the same zorder, so the
+stacking order, and with it the picture, is unchanged.
+
+Saving draws the figure exactly once per output. `tight_layout()` followed by
+`savefig(bbox_inches='tight')` would lay every text out again in each of its
+measuring passes, plus a throwaway draw; instead the content extents are
+computed here from a cache of text extents (keyed by string, font, size and
+alignment), the subplot parameters and crop box are derived from them the
+same way matplotlib does, and the figure is rasterized once into that box.
+One built figure can be saved to several formats and resolutions this way;
+the layout is shared and only the crop box is measured per resolution.
+STATS counts the draws and cache hits in this process.
+
+Outputs given as paths are encoded into memory and then written, so that
+diagrams.phases can time the draw, the encoding and the file write apart.
+
+With REPRODUCIBLE set, figures are built and saved under reproducible.pinned()
+and saved without version or date metadata, so identical inputs give
+identical bytes.
+"""
+import contextlib
+import io
+import os
+
+import matplotlib as mpl
+import numpy as np
+
+from . import VECTOR_FORMATS, fonts, reproducible
+
+# Before anything imports matplotlib's font manager, so it loads the bundled font list
+fonts.install()
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg, RendererAgg  # noqa: E402
+from matplotlib.collections import LineCollection, PatchCollection  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+from matplotlib.patches import Arc, FancyArrowPatch, FancyBboxPatch, Polygon, Rectangle  # noqa: E402
+from matplotlib.text import Text  # noqa: E402
+from matplotlib.transforms import Bbox  # noqa: E402
+
+from .phases import phase
+from .scene import ARC, ARROW, BOX, DIAMOND, LINE, RECT, TEXT
+
+# Set to False to draw one artist per primitive (for benchmarking the batching)
+BATCH_PRIMITIVES = True
+
+# Set to True to save PNGs at zlib level 1: faster to encode, bigger files (watch mode)
+FAST_PNG = False
+
+# Set to False to render with the local matplotlibrc and let matplotlib stamp
+# its version and the date into the outputs
+REPRODUCIBLE = True
+
+# Default zorders of the artists each primitive kind becomes
+DEFAULT_ZORDER = {BOX: 1, RECT: 1, DIAMOND: 1, ARC: 1, LINE: 2, ARROW: 1, TEXT: 3}
+
+# Kinds batched into PatchCollections (lines go into LineCollections)
+_PATCH_KINDS = (BOX, RECT, DIAMOND)
+
+# Rows of primitives checked for overlaps at a time when batches are split
+_OVERLAP_BLOCK = 512
+
+# Settings for vector outputs: SVG glyphs are defined once and referenced
+# wherever they are used, PDF/PS embed only the used glyphs as TrueType
+VECTOR_RC = {'svg.fonttype': 'path', 'pdf.fonttype': 42, 'ps.fonttype': 42}
+
+# Padding of tight_layout() around the content, in multiples of the font size
+LAYOUT_PAD = 1.08
+
+# Counters for this process: figure draws, and text extents measured or
+# served from the cache
+STATS = {'draws': 0, 'text_measured': 0, 'text_cached': 0}
+
+# Text extent cache: key from _text_key() -> (x0, y0, x1, y1) in pixels,
+# relative to the text's anchor point
+_TEXT_EXTENTS = {}
+
+# dpi -> 1x1 renderer used only to measure text at that resolution
+_MEASURING_RENDERERS = {}
+
+
+class DiagramFigure(Figure):
+    """A Figure that counts its draws in STATS"""
+
+    def draw(self, renderer):
+        STATS['draws'] += 1
+        with phase('draw'):
+            return super().draw(renderer)
+
+
+def new_figure(figsize, xlim, ylim, dpi=150):
+    """Create a figure with a single axis-less drawing area
+
+    The figure is built directly on an Agg canvas instead of through pyplot, so
+    no GUI backend is probed and nothing is registered with pyplot's global
+    figure manager.
+    """
+    fig = DiagramFigure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    ax.axis('off')
+    return fig, ax
+
+
+def _text_key(text, dpi):
+    """Everything the extent of `text` relative to its anchor depends on"""
+    prop = text.get_fontproperties()
+    return (text.get_text(), tuple(prop.get_family()), prop.get_style(), prop.get_variant(),
+            prop.get_weight(), prop.get_stretch(), prop.get_size_in_points(),
+            prop.get_math_fontfamily(), text.get_usetex(), text.get_rotation(),
+            text.get_rotation_mode(), text.get_horizontalalignment(),
+            text.get_verticalalignment(), text._get_multialignment(),
+            text._linespacing, dpi)
+
+
+def _text_anchor(text):
+    """Display coordinates of the point `text` is aligned to"""
+    return text.get_transform().transform(text.get_unitless_position())
+
+
+def text_extent(text, dpi):
+    """Display-space bounding box of `text` at `dpi`, from the extent cache
+
+    The figure's dpi must already be `dpi`. Only a miss lays the text out.
+    """
+    if text.get_wrap():
+        # Wrapped text depends on its position; measure it every time
+        return text.get_window_extent(measuring_renderer(dpi))
+    key = _text_key(text, dpi)
+    extent = _TEXT_EXTENTS.get(key)
+    if extent is None:
+        STATS['text_measured'] += 1
+        bbox = text.get_window_extent(measuring_renderer(dpi))
+        x, y = _text_anchor(text)
+        extent = _TEXT_EXTENTS[key] = (bbox.x0 - x, bbox.y0 - y, bbox.x1 - x, bbox.y1 - y)
+    else:
+        STATS['text_cached'] += 1
+    x, y = _text_anchor(text)
+    x0, y0, x1, y1 = extent
+    return Bbox([[x + x0, y + y0], [x + x1, y + y1]])
+
+
+def measuring_renderer(dpi):
+    """A tiny Agg renderer for measuring (never drawing) at `dpi`, shared per dpi"""
+    renderer = _MEASURING_RENDERERS.get(dpi)
+    if renderer is None:
+        renderer = _MEASURING_RENDERERS[dpi] = RendererAgg(1, 1, dpi)
+    return renderer
+
+
+def content_extent(ax):
+    """Display-space box around the axes and everything drawn outside them
+
+    The same box as `ax.get_tightbbox()`, with text taken from the extent
+    cache. Axes titles are left out: diagrams put their titles in the scene.
+    """
+    dpi = ax.figure.dpi
+    renderer = measuring_renderer(dpi)
+    boxes = [ax.get_window_extent(renderer)]
+    if ax.axison:
+        boxes.extend(axis.get_tightbbox(renderer) for axis in (ax.xaxis, ax.yaxis)
+                     if axis.get_visible())
+    for artist in ax.get_default_bbox_extra_artists():
+        if isinstance(artist, Text):
+            boxes.append(text_extent(artist, dpi))
+        else:
+            boxes.append(artist.get_tightbbox(renderer))
+    return Bbox.union([box for box in boxes if box is not None and np.isfinite(box.extents).all()
+                       and (box.width != 0 or box.height != 0)])
+
+
+def tight_layout(fig, ax, pad=LAYOUT_PAD):
+    """Fit `ax` and its content in the figure, as `fig.tight_layout()` does
+
+    Returns False (and leaves the figure alone) when the content cannot fit.
+    """
+    pad_inch = pad * mpl.rcParams['font.size'] / 72
+    position = ax.get_position(original=True)
+    content = fig.transFigure.inverted().transform_bbox(content_extent(ax))
+    width, height = fig.get_size_inches()
+    left = max(position.x0 - content.x0, 0) + pad_inch / width
+    right = max(content.x1 - position.x1, 0) + pad_inch / width
+    bottom = max(position.y0 - content.y0, 0) + pad_inch / height
+    top = max(content.y1 - position.y1, 0) + pad_inch / height
+    if left + right >= 1 or bottom + top >= 1:
+        return False
+    fig.subplots_adjust(left=left, right=1 - right, bottom=bottom, top=1 - top)
+    return True
+
+
+def tight_bbox(fig, ax, dpi):
+    """The crop box `savefig(bbox_inches='tight')` would use at `dpi`, in inches"""
+    layout_dpi = fig.dpi
+    fig.dpi = dpi
+    try:
+        extent = content_extent(ax)
+    finally:
+        fig.dpi = layout_dpi
+    pad = mpl.rcParams['savefig.pad_inches']
+    return Bbox.from_extents(*(np.array(extent.extents) / dpi)).padded(pad)
+
+
+def save_outputs(fig, outputs):
+    """Save a finished diagram to every (output, dpi, fmt) in `outputs`
+
+    The figure is laid out once, like `tight_layout()`, and then drawn once
+    per output into the crop box `bbox_inches='tight'` would use, with text
+    measured from the extent cache. Vector outputs are cropped with text
+    measured at 72 dpi, the resolution their backends lay text out at.
+    Returns the outputs written.
+    """
+    ax, = fig.axes
+    with phase('layout'):
+        tight_layout(fig, ax)
+    for output, dpi, fmt in outputs:
+        label = type(output).__name__ if hasattr(output, 'write') else os.fspath(output)
+        with phase('save', output=label, fmt=fmt, dpi=dpi):
+            vector = fmt in VECTOR_FORMATS
+            with phase('layout'):
+                bbox = tight_bbox(fig, ax, 72 if vector else dpi)
+            extra = {'pil_kwargs': {'compress_level': 1}} if fmt == 'png' and FAST_PNG else {}
+            with mpl.rc_context(VECTOR_RC if vector else {}):
+                _encode(output, lambda target: fig.savefig(
+                    target, dpi=dpi, bbox_inches=bbox, facecolor='white', edgecolor='none', format=fmt,
+                    metadata=reproducible.metadata(fmt) if REPRODUCIBLE else None, **extra))
+            if fmt == 'png' and not hasattr(output, 'write'):
+                with phase('thumbnail'):
+                    _remember(output, fig)
+    return [output for output, _, _ in outputs]
+
+
+def _encode(output, save):
+    """Call `save(target)` to encode into `output`; paths are encoded into memory first"""
+    if hasattr(output, 'write'):
+        with phase('encode'):
+            save(output)
+        return
+    buffer = io.BytesIO()
+    with phase('encode'):
+        save(buffer)
+    with phase('write', bytes=buffer.tell()):
+        with open(output, 'wb') as f:
+            f.write(buffer.getbuffer())
+
+
+def _remember(output, fig):
+    """Hand the canvas the PNG at `output` was just encoded from to the visual check's cache"""
+    from PIL import Image
+
+    from . import visual
+
+    visual.remember(output, Image.fromarray(np.asarray(fig.canvas.buffer_rgba())))
+
+
+def save_figure(fig, output, dpi=300, fmt='png'):
+    """Save a finished diagram with the standard print settings"""
+    save_outputs(fig, [(output, dpi, fmt)])
+    return output
+
+
+def _patch(kind, geometry, style):
+    a, b, c, d, e, f = geometry
+    if kind == BOX:
+        return FancyBboxPatch((a, b), c, d, **style)
+    if kind == RECT:
+        return Rectangle((a, b), c, d, **style)
+    if kind == DIAMOND:
+        return Polygon([(a, b + d/2), (a + c/2, b), (a, b - d/2), (a - c/2, b)], **style)
+    if kind == ARC:
+        return Arc((a, b), c, d, theta1=e, theta2=f, **style)
+    return FancyArrowPatch((a, b), (c, d), **style)
+
+
+def _bounds(scene):
+    """Data-space bounding box (x0, y0, x1, y1) of every primitive
+
+    Text extents are unknown before drawing, so text gets an infinite box and
+    is treated as overlapping everything.
+    """
+    kinds, g = scene.kinds, scene.geometry
+    x0, y0 = np.minimum(g[:, 0], g[:, 2]), np.minimum(g[:, 1], g[:, 3])
+    x1, y1 = np.maximum(g[:, 0], g[:, 2]), np.maximum(g[:, 1], g[:, 3])
+    # Boxes and rectangles: corner plus size (boxes get their rounding pad)
+    corner = (kinds == BOX) | (kinds == RECT)
+    pad = np.where(kinds == BOX, 0.1, 0.0)
+    x0 = np.where(corner, g[:, 0] - pad, x0)
+    y0 = np.where(corner, g[:, 1] - pad, y0)
+    x1 = np.where(corner, g[:, 0] + g[:, 2] + pad, x1)
+    y1 = np.where(corner, g[:, 1] + g[:, 3] + pad, y1)
+    # Diamonds and arcs: center plus size
+    centered = (kinds == DIAMOND) | (kinds == ARC)
+    x0 = np.where(centered, g[:, 0] - g[:, 2] / 2, x0)
+    y0 = np.where(centered, g[:, 1] - g[:, 3] / 2, y0)
+    x1 = np.where(centered, g[:, 0] + g[:, 2] / 2, x1)
+    y1 = np.where(centered, g[:, 1] + g[:, 3] / 2, y1)
+    bounds = np.column_stack([x0, y0, x1, y1])
+    bounds[kinds == TEXT] = [-np.inf, -np.inf, np.inf, np.inf]
+    return bounds
+
+
+def _pulled_forward(first, zorders, bounds):
+    """Primitives that their batch would draw before an overlapping, earlier primitive
+
+    `first` is the index each primitive is drawn at: that of the first
+    primitive of its batch. Returns the indices, as a sorted array.
+    """
+    index = np.arange(len(first))
+    # Only a primitive drawn earlier than its own index can jump ahead of another
+    moved = np.flatnonzero(first < index)
+    found = []
+    for z in np.unique(zorders[moved]):
+        cols = moved[zorders[moved] == z]
+        # ... and only ahead of one at its zorder that its batch now follows
+        rows = np.flatnonzero((zorders == z) & (index < cols[-1]) & (first > first[cols].min()))
+        hit = np.zeros(len(cols), dtype=bool)
+        b = bounds[cols]
+        for start in range(0, len(rows), _OVERLAP_BLOCK):
+            block = rows[start:start + _OVERLAP_BLOCK]
+            a = bounds[block]
+            hit |= ((block[:, None] < cols) & (first[block, None] > first[cols])
+                    & (a[:, None, 0] <= b[:, 2]) & (a[:, None, 2] >= b[:, 0])
+                    & (a[:, None, 1] <= b[:, 3]) & (a[:, None, 3] >= b[:, 1])).any(axis=0)
+        found.append(cols[hit])
+    return np.sort(np.concatenate(found)) if found else moved
+
+
+def plan_batches(scene):
+    """Group primitives into draw items, in drawing order
+
+    Returns a list of (kind, style_id, zorder, indices). An item with more than
+    one index becomes a collection. Patches and lines of the same kind and
+    style (and so zorder) share an item, drawn where its first primitive was;
+    an item is cut in two at every primitive that would otherwise be drawn
+    before an overlapping primitive that came earlier at the same zorder.
+    """
+    n = len(scene)
+    if not n:
+        return []
+    kinds = scene.kinds.astype(np.int64)
+    pairs, group = np.unique(np.column_stack([kinds, scene.styles.astype(np.int64)]), axis=0,
+                             return_inverse=True)
+    group = group.reshape(-1)
+    pair_z = np.array([scene.style_table[style].get('zorder', DEFAULT_ZORDER[kind])
+                       for kind, style in pairs.tolist()], dtype=np.float64)
+    zorders = pair_z[group]
+    # Arrows, arcs and text are drawn one by one
+    batched = np.isin(kinds, _PATCH_KINDS + (LINE,))
+    group = np.where(batched, group, len(pairs) + np.arange(n))
+    bounds = _bounds(scene)
+    index = np.arange(n)
+
+    while True:
+        _, group = np.unique(group, return_inverse=True)
+        first = np.full(group.max() + 1, n)
+        np.minimum.at(first, group, index)
+        cuts = _pulled_forward(first[group], zorders, bounds)
+        if not len(cuts):
+            break
+        # Every cut starts a new item holding the rest of its group
+        cut = np.zeros(n, dtype=np.int64)
+        cut[cuts] = 1
+        order = np.argsort(group, kind='stable')
+        counted = np.cumsum(cut[order])
+        starts = np.r_[True, group[order][1:] != group[order][:-1]]
+        segment = np.empty(n, dtype=np.int64)
+        segment[order] = counted - np.maximum.accumulate(np.where(starts, counted - cut[order], 0))
+        group = group * (len(cuts) + 1) + segment
+
+    order = np.lexsort((index, first[group]))
+    ends = np.flatnonzero(np.r_[group[order][1:] != group[order][:-1], True]) + 1
+    items = []
+    for members in np.split(order, ends[:-1]):
+        i = members[0]
+        items.append((int(kinds[i]), int(scene.styles[i]), zorders[i].item(), members.tolist()))
+    return items
+
+
+def draw_scene(ax, scene, batch=None):
+    """Add the scene's artists to `ax`; returns how many artists were added"""
+    if batch is None:
+        batch = BATCH_PRIMITIVES
+    geometry = scene.geometry.tolist()
+    if batch:
+        items = plan_batches(scene)
+    else:
+        items = [(kind, style, None, [i])
+                 for i, (kind, style) in enumerate(zip(scene.kinds.tolist(), scene.styles.tolist()))]
+
+    for kind, style_id, z, indices in items:
+        style = scene.style_table[style_id]
+        if len(indices) > 1 and kind == LINE:
+            segments = [[(geometry[i][0], geometry[i][1]), (geometry[i][2], geometry[i][3])]
+                        for i in indices]
+            style = dict(style)
+            # Match Line2D's defaults, which collections do not share
+            dashed = style.get('linestyle', '-') not in ('-', 'solid')
+            ax.add_collection(LineCollection(
+                segments, colors=style.pop('color', None), linewidths=style.pop('linewidth', None),
+                linestyles=style.pop('linestyle', 'solid'), zorder=style.pop('zorder', z),
+                capstyle='butt' if dashed else 'projecting', joinstyle='round', **style),
+                autolim=False)
+        elif len(indices) > 1:
+            patches = [_patch(kind, geometry[i], style) for i in indices]
+            ax.add_collection(PatchCollection(patches, match_original=True, zorder=z,
+                                              joinstyle='miter'), autolim=False)
+        else:
+            a, b, c, d, e, f = geometry[indices[0]]
+            if kind == LINE:
+                ax.plot([a, c], [b, d], **style)
+            elif kind == TEXT:
+                ax.text(a, b, scene.strings[scene.texts[indices[0]]], **style)
+            else:
+                ax.add_patch(_patch(kind, geometry[indices[0]], style))
+    return len(items)
+
+
+def render_scene(scene, output, dpi=300, fmt='png'):
+    """Draw a scene into a new figure and save it to `output`"""
+    render_scene_outputs(scene, [(output, dpi, fmt)])
+    return output
+
+
+def pinned():
+    """reproducible.pinned() with REPRODUCIBLE set, else a no-op; wraps building and saving figures"""
+    return reproducible.pinned() if REPRODUCIBLE else contextlib.nullcontext()
+
+
+def render_scene_outputs(scene, outputs):
+    """Draw a scene once and save it to every (output, dpi, fmt) in `outputs`"""
+    meta = scene.meta
+    with pinned():
+        with phase('artists') as record:
+            fig, ax = new_figure(meta['figsize'], meta['xlim'], meta['ylim'], meta['dpi'])
+            record['artists'] = draw_scene(ax, scene)
+        return save_outputs(fig, outputs)
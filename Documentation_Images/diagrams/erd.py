@@ -0,0 +1,22 @@
+"""
+Entity Relationship Diagram (ERD) for Student Progress Tracker
+Includes all relationships and tables
+
+Laid out from specs/erd.json.
+"""
+from .spec import render_spec, render_spec_outputs
+
+OUTPUT = 'database_erd.png'
+
+
+def render(output=OUTPUT, dpi=300, fmt='png'):
+    """Draw the database ERD and save it to `output`"""
+    return render_spec('erd', output, dpi=dpi, fmt=fmt)
+
+
+def render_outputs(outputs):
+    """Draw the database ERD once and save it to each of `outputs`
+
+    `outputs` is a list of (output, dpi, fmt) tuples.
+    """
+    return render_spec_outputs('erd', outputs)
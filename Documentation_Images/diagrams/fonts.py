@@ -0,0 +1,320 @@
+"""
+Pinned fonts and a pre-built matplotlib font list
+
+The first time matplotlib's font manager is imported with an empty cache
+directory, matplotlib scans every system font directory (and asks
+fontconfig) to build its font list, then caches the list there. On a fresh
+CI container that costs seconds, and generate_all_diagrams.py pays it in
+every worker it starts, all at once.
+
+The package ships that list pre-built in LIST_DIR, holding only the fonts
+bundled with matplotlib (DejaVu, STIX, Computer Modern and the AFM metrics
+of the PDF core fonts), with their paths relative to mpl-data so the list
+is valid wherever matplotlib is installed. PINS records the matplotlib
+version the list was built for and the size and SHA-256 of every font in
+it.
+
+`install()` runs before anything in the package imports matplotlib's font
+manager (see draw.py). It copies the list into a `diagrams` directory of its
+own under matplotlib's cache directory and points matplotlib there just for
+the import, so matplotlib loads it instead of scanning. The user's
+matplotlibrc, font cache and other caches are left alone, and nothing is
+written into the source tree.
+
+`ensure()` runs once per process before the first render (see
+reproducible.pinned) and checks that the loaded list is the bundled one.
+When it is not (the font manager was imported before install() ran, the
+installed matplotlib reads another font list version, a pinned font file
+changed), it says why on stderr and loads the bundled list into the font
+manager explicitly or, if the list cannot be used, narrows the loaded list
+to the fonts bundled with matplotlib. Either way outputs do not depend on
+the system's fonts.
+
+Usage:
+    python -m diagrams.fonts check    # is the bundled list in use? exit 1 if not
+    python -m diagrams.fonts build    # rebuild the list and pins for the installed matplotlib
+    python -m diagrams.fonts bench    # cold font manager start: bundled list vs a fresh scan
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Directory holding the pre-built font list
+LIST_DIR = os.path.join(PACKAGE_DIR, 'fontlist')
+
+# Version, size and SHA-256 of every font in the list
+PINS = os.path.join(LIST_DIR, 'fonts.json')
+
+# Directory under matplotlib's cache directory the list is copied into
+CACHE_SUBDIR = 'diagrams'
+
+_status = None
+
+
+def load_pins(path=PINS):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _inside(path, directory):
+    return os.path.realpath(path).startswith(directory + os.sep)
+
+
+def _copy_if_changed(source, target):
+    with open(source, 'rb') as f:
+        data = f.read()
+    try:
+        with open(target, 'rb') as f:
+            if f.read() == data:
+                return
+    except OSError:
+        pass
+    with open(f'{target}.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(f'{target}.tmp', target)
+
+
+def install():
+    """Have matplotlib load the bundled font list; call before matplotlib.font_manager is imported"""
+    if 'matplotlib.font_manager' in sys.modules:
+        return
+    import matplotlib as mpl
+
+    lists = glob.glob(os.path.join(LIST_DIR, 'fontlist-v*.json'))
+    if not lists:
+        return
+    cache_dir = os.path.join(mpl.get_cachedir(), CACHE_SUBDIR)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for path in lists:
+            _copy_if_changed(path, os.path.join(cache_dir, os.path.basename(path)))
+    except OSError:
+        return
+    # The font manager reads its list from mpl.get_cachedir() when it is
+    # imported, and nothing else it imports asks for the cache directory
+    get_cachedir = mpl.get_cachedir
+    mpl.get_cachedir = lambda: cache_dir
+    try:
+        from matplotlib import font_manager  # noqa: F401
+    finally:
+        mpl.get_cachedir = get_cachedir
+
+
+def _bundled_problem(pins):
+    """Why the bundled font list cannot be used here, or None"""
+    import matplotlib as mpl
+    from matplotlib import font_manager
+
+    if pins is None:
+        return "no bundled font list (run `python -m diagrams.fonts build`)"
+    if font_manager.FontManager.__version__ != pins['font_list_version']:
+        return (f"the bundled font list is version {pins['font_list_version']} but matplotlib "
+                f"{mpl.__version__} reads version {font_manager.FontManager.__version__} "
+                f"(run `python -m diagrams.fonts build`)")
+    data = mpl.get_data_path()
+    for name, pin in pins['fonts'].items():
+        try:
+            size = os.path.getsize(os.path.join(data, name))
+        except OSError:
+            return f"pinned font {name} is missing from {data}"
+        if size != pin['bytes']:
+            return f"pinned font {name} is {size:,} bytes, not {pin['bytes']:,}"
+    return None
+
+
+def _loaded_fonts():
+    import matplotlib as mpl
+    from matplotlib import font_manager
+
+    data = mpl.get_data_path()
+    manager = font_manager.fontManager
+    return sorted(os.path.relpath(e.fname, data).replace(os.sep, '/') for e in manager.ttflist + manager.afmlist)
+
+
+def status():
+    """(True, description) when matplotlib loaded the bundled font list, else (False, why not)"""
+    pins = load_pins()
+    problem = _bundled_problem(pins)
+    if problem:
+        return False, problem
+    loaded = _loaded_fonts()
+    if loaded != sorted(pins['fonts']):
+        return False, (f"matplotlib loaded another font list ({len(loaded)} fonts) because its font "
+                       f"manager was imported before diagrams.fonts.install()")
+    return True, f"bundled font list: {len(pins['fonts'])} fonts pinned for matplotlib {pins['matplotlib']}"
+
+
+def load_bundled():
+    """Replace the font manager's font list with the bundled one, in place
+
+    text.py and the backends hold on to the fontManager instance they
+    imported, so the instance is updated rather than replaced.
+    """
+    from matplotlib import font_manager
+
+    pins = load_pins()
+    bundled = font_manager.json_load(os.path.join(LIST_DIR, f"fontlist-v{pins['font_list_version']}.json"))
+    vars(font_manager.fontManager).update(vars(bundled))
+    font_manager.FontManager._findfont_cached.cache_clear()
+
+
+def restrict_to_bundled():
+    """Drop every font outside mpl-data from the loaded font list; returns how many were dropped"""
+    import matplotlib as mpl
+    from matplotlib import font_manager
+
+    data = os.path.realpath(mpl.get_data_path())
+    manager = font_manager.fontManager
+    before = len(manager.ttflist) + len(manager.afmlist)
+    manager.ttflist = sorted((e for e in manager.ttflist if _inside(e.fname, data)), key=lambda e: e.fname)
+    manager.afmlist = sorted((e for e in manager.afmlist if _inside(e.fname, data)), key=lambda e: e.fname)
+    font_manager.FontManager._findfont_cached.cache_clear()
+    return before - len(manager.ttflist) - len(manager.afmlist)
+
+
+def ensure():
+    """Check once per process that the bundled font list is in use; report and fall back if not"""
+    global _status
+    if _status is None:
+        ok, detail = status()
+        if not ok:
+            if _bundled_problem(load_pins()) is None:
+                load_bundled()
+                action = 'loaded the bundled font list instead'
+            else:
+                dropped = restrict_to_bundled()
+                action = (f"drawing with the fonts bundled with matplotlib only "
+                          f"({dropped} system font(s) ignored)")
+            print(f"diagrams: font list fallback: {detail}; {action}", file=sys.stderr)
+        _status = ok, detail
+    return _status
+
+
+def build():
+    """Write the font list of matplotlib's bundled fonts, and their pins, into LIST_DIR"""
+    import matplotlib as mpl
+    from matplotlib import font_manager
+
+    from .cache import file_sha256
+
+    # FontManager indexes mpl-data by passing its font directories to
+    # findSystemFonts, and the system by calling it without any
+    scan = font_manager.findSystemFonts
+    font_manager.findSystemFonts = lambda fontpaths=None, fontext='ttf': (
+        scan(fontpaths, fontext) if fontpaths else [])
+    try:
+        manager = font_manager.FontManager()
+    finally:
+        font_manager.findSystemFonts = scan
+    # findSystemFonts returns a set's order; sorted, ties in findfont always go the same way
+    manager.ttflist.sort(key=lambda e: e.fname)
+    manager.afmlist.sort(key=lambda e: e.fname)
+
+    os.makedirs(LIST_DIR, exist_ok=True)
+    for stale in glob.glob(os.path.join(LIST_DIR, 'fontlist-v*.json')):
+        os.remove(stale)
+    list_path = os.path.join(LIST_DIR, f'fontlist-v{font_manager.FontManager.__version__}.json')
+    font_manager.json_dump(manager, list_path)
+
+    data = mpl.get_data_path()
+    fonts = {}
+    for entry in manager.ttflist + manager.afmlist:
+        name = os.path.relpath(entry.fname, data).replace(os.sep, '/')
+        fonts[name] = {'bytes': os.path.getsize(entry.fname), 'sha256': file_sha256(entry.fname)}
+    pins = {'matplotlib': mpl.__version__, 'font_list_version': font_manager.FontManager.__version__,
+            'fonts': dict(sorted(fonts.items()))}
+    with open(f'{PINS}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(pins, f, indent=2)
+        f.write('\n')
+    os.replace(f'{PINS}.tmp', PINS)
+    return list_path, pins
+
+
+def verify_hashes():
+    """Pinned fonts whose contents no longer match their SHA-256"""
+    import matplotlib as mpl
+
+    from .cache import file_sha256
+
+    pins = load_pins() or {'fonts': {}}
+    data = mpl.get_data_path()
+    changed = []
+    for name, pin in pins['fonts'].items():
+        path = os.path.join(data, name)
+        if not os.path.exists(path) or file_sha256(path) != pin['sha256']:
+            changed.append(name)
+    return changed
+
+
+def cold_start(runs=5, bundled=True):
+    """Median seconds for a new interpreter to import matplotlib's font manager
+
+    Every run gets an empty matplotlib cache directory, as on a new CI
+    container. With `bundled` the font manager is imported through
+    install(); otherwise matplotlib scans the system fonts.
+    """
+    code = ('from diagrams import fonts; fonts.install()' if bundled else 'import matplotlib.font_manager')
+    times = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix='mplconfig-') as empty:
+            env = dict(os.environ, MPLCONFIGDIR=empty)
+            env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(PACKAGE_DIR), env.get('PYTHONPATH')]))
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], env=env, check=True)
+            times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.fonts',
+                                     description='Check or rebuild the bundled matplotlib font list.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('check', help='report whether the bundled font list is in use; exit 1 if not')
+    commands.add_parser('build', help='rebuild the font list and pins for the installed matplotlib')
+    bench_cmd = commands.add_parser('bench', help='time a cold font manager start with and without the list')
+    bench_cmd.add_argument('--runs', type=int, default=5, help='interpreters started per case (default: 5)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        list_path, pins = build()
+        print(f"Wrote {list_path} and {PINS}: {len(pins['fonts'])} fonts for matplotlib {pins['matplotlib']}")
+        return 0
+
+    if args.command == 'bench':
+        bundled = cold_start(args.runs)
+        scanned = cold_start(args.runs, bundled=False)
+        print(f"Font manager import with an empty cache, median of {args.runs} new interpreters:")
+        print(f"  bundled font list   {bundled * 1000:7.0f} ms")
+        print(f"  fresh font scan     {scanned * 1000:7.0f} ms   ({(scanned - bundled) * 1000:+.0f} ms)")
+        return 0
+
+    from .reproducible import check_fonts
+
+    install()
+    ok, detail = status()
+    print(f"{'ok' if ok else 'FALLBACK'}: {detail}")
+    changed = verify_hashes()
+    for name in changed:
+        print(f"  changed: {name} (SHA-256 differs from the pin)")
+    try:
+        for variant, path in check_fonts().items():
+            print(f"  {variant:<14} {path}")
+    except RuntimeError as e:
+        print(f"  {e}")
+        return 1
+    return 0 if ok and not changed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
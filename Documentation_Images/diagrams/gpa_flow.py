@@ -0,0 +1,21 @@
+"""
+GPA Calculation Data Flow Diagram (Sequence Diagram)
+
+Laid out from specs/gpa_flow.json.
+"""
+from .spec import render_spec, render_spec_outputs
+
+OUTPUT = 'gpa_calculation_flow.png'
+
+
+def render(output=OUTPUT, dpi=300, fmt='png'):
+    """Draw the GPA calculation sequence diagram and save it to `output`"""
+    return render_spec('gpa_flow', output, dpi=dpi, fmt=fmt)
+
+
+def render_outputs(outputs):
+    """Draw the GPA calculation sequence diagram once and save it to each of `outputs`
+
+    `outputs` is a list of (output, dpi, fmt) tuples.
+    """
+    return render_spec_outputs('gpa_flow', outputs)
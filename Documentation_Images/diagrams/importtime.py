@@ -0,0 +1,115 @@
+"""
+Startup budget report for the diagram modules
+
+Renders each diagram into memory in a fresh interpreter under
+`python -X importtime` and summarises where the startup time goes, grouped
+by top-level package (matplotlib, numpy, PIL, ...) with the heaviest first.
+Importing a diagram module alone would leave matplotlib out, since the
+package only imports it when a render starts; rendering counts every import
+a `python -m diagrams NAME` run pays for.
+
+Usage:
+    python -m diagrams.importtime                  # every diagram
+    python -m diagrams.importtime erd --top 15
+    python -m diagrams.importtime --budget 900     # exit 1 if any import takes longer
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from . import DIAGRAMS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Resolution of the measuring render; it changes the render time, not the imports
+MEASURE_DPI = 72
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into (module, self_us, cumulative_us, depth) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # column header
+        name = fields[2].rstrip()
+        indent = len(name) - len(name.lstrip())
+        # Nested imports are indented by two spaces per level after the first space
+        rows.append((name.strip(), int(fields[0]), int(fields[1]), (indent - 1) // 2))
+    return rows
+
+
+def measure(name, runs=3):
+    """Render diagram `name` in a fresh interpreter and time its imports; best of `runs`"""
+    code = f'import diagrams; diagrams.render_bytes({name!r}, dpi={MEASURE_DPI})'
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              cwd=ROOT, capture_output=True, text=True, check=True)
+        wall_ms = (time.perf_counter() - start) * 1000
+        rows = parse_importtime(proc.stderr)
+        # Self times add up to the whole import cost without double counting
+        packages = {}
+        for module, self_us, _, _ in rows:
+            package = module.split('.')[0]
+            packages[package] = packages.get(package, 0) + self_us
+        import_ms = sum(packages.values()) / 1000
+        if best is None or import_ms < best['import_ms']:
+            best = {
+                'diagram': name,
+                'import_ms': import_ms,
+                'process_ms': wall_ms,
+                'modules': len(rows),
+                'pyplot': any(module == 'matplotlib.pyplot' for module, *_ in rows),
+                'top': sorted(((package, us / 1000) for package, us in packages.items()),
+                              key=lambda item: item[1], reverse=True),
+            }
+    return best
+
+
+def print_report(report, top):
+    """Print one diagram's import cost and its heaviest packages"""
+    print(f"{report['diagram']}: {report['import_ms']:.0f} ms importing "
+          f"{report['modules']} modules ({report['process_ms']:.0f} ms whole process"
+          f"{', pyplot imported' if report['pyplot'] else ''})")
+    for module, ms in report['top'][:top]:
+        share = ms / report['import_ms'] * 100 if report['import_ms'] else 0
+        print(f"  {ms:8.1f} ms  {share:5.1f}%  {module}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.importtime',
+                                     description='Report the import cost of rendering each diagram.')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"diagrams to measure (default: all of {', '.join(DIAGRAMS)})")
+    parser.add_argument('--top', type=int, default=8, help='packages to list (default: 8)')
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreters per diagram (default: 3)')
+    parser.add_argument('--budget', type=float,
+                        help='fail if any render spends longer than this many ms importing')
+    args = parser.parse_args(argv)
+
+    names = args.names or list(DIAGRAMS)
+    unknown = [name for name in names if name not in DIAGRAMS]
+    if unknown:
+        parser.error(f"unknown diagram(s): {', '.join(unknown)}")
+
+    over_budget = []
+    for name in names:
+        report = measure(name, args.runs)
+        print_report(report, args.top)
+        if args.budget is not None and report['import_ms'] > args.budget:
+            over_budget.append(name)
+
+    if over_budget:
+        print(f"Over the {args.budget:g} ms import budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,735 @@
+"""
+Load tests for the Reports endpoints, with latency percentile charts
+
+Drives `GET /api/reports/gpa/{termId}`, `/gpa/{termId}/csv`, `/transcript`
+and `/transcript/csv` (the requests the GPA and CSV-export flow diagrams
+describe) from asyncio workers that share a pool of keep-alive HTTP/1.1
+connections. The request mix, the number of workers and connections, and
+either the duration or the request count are configurable.
+
+By default the run is closed-loop: every worker sends its next request as
+soon as the previous one is answered. With `--rate` requests are instead
+scheduled at a fixed rate and each latency is measured from the time the
+request was due, so a stalled server shows up as latency instead of as
+fewer requests (no coordinated omission).
+
+Latencies go into the log-bucketed histograms diagrams.otel uses (1%
+precision, memory independent of the request count), one per endpoint and
+one per second of the run. The percentile distribution, the p50/p95/p99 per
+endpoint and latency and throughput over time are charted into one image.
+
+Without `--url`, a stand-in server is started in a child process. It serves
+the four endpoints with bodies shaped like ApiResponse<GpaReportDTO>,
+ApiResponse<TranscriptReportDTO> and the ReportService CSVs, for one student
+with `--terms` terms, after an artificial delay of `--delay` ms plus an
+exponentially distributed `--jitter`. It needs no network beyond loopback.
+`serve` runs it on its own.
+
+Usage:
+    python -m diagrams.loadtest run --duration 20 --concurrency 32
+    python -m diagrams.loadtest run --rate 500 --mix gpa=3,transcript-csv=1 --delay 5 --jitter 10
+    python -m diagrams.loadtest run --url http://localhost:5000 --token $JWT --requests 10000
+    python -m diagrams.loadtest serve --port 8080 --delay 20
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+from . import fonts, reproducible
+from .common import REPORT_COLORS
+from .otel import LatencyHistogram, format_duration
+from .phases import phase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Endpoint names used in --mix, and their paths
+ENDPOINTS = {
+    'gpa': '/api/reports/gpa/{term}',
+    'gpa-csv': '/api/reports/gpa/{term}/csv',
+    'transcript': '/api/reports/transcript',
+    'transcript-csv': '/api/reports/transcript/csv',
+}
+
+DEFAULT_MIX = 'gpa=4,gpa-csv=2,transcript=1,transcript-csv=1'
+
+# Percentiles reported per endpoint, and the ones charted as bars
+PERCENTILES = (50, 90, 95, 99, 99.9)
+BAR_PERCENTILES = (50, 95, 99)
+
+# Seconds a request may take before it counts as an error
+DEFAULT_TIMEOUT = 10.0
+
+# Longest response header block accepted
+MAX_HEADER_BYTES = 64 * 1024
+
+OUTPUT = os.path.join(ROOT, 'load_test_latency.png')
+
+# Letter grades the stand-in hands out, and their points (as ReportService maps them)
+STAND_IN_GRADES = [('A', 4.0), ('A-', 3.7), ('B+', 3.3), ('B', 3.0), ('B-', 2.7), ('C+', 2.3), ('C', 2.0)]
+
+STAND_IN_STUDENT = ('Alex Student', 'alex.student@example.edu')
+
+
+# Stand-in server
+
+def _csv_field(text):
+    """ReportService.EscapeCsvField"""
+    if any(c in text for c in ',"\n\r'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _iso(day):
+    return f"{day.isoformat()}T00:00:00"
+
+
+def stand_in_terms(terms, courses, seed=0):
+    """TranscriptTermDTO-shaped dicts (camelCase, as the API serializes them) for one student"""
+    rng = random.Random(seed)
+    result = []
+    for t in range(terms):
+        season = 'Fall' if t % 2 == 0 else 'Spring'
+        term_start = date(2022 + t // 2, 8, 22) if season == 'Fall' else date(2023 + t // 2, 1, 9)
+        term_courses = []
+        for c in range(courses):
+            grade, points = rng.choice(STAND_IN_GRADES)
+            completed = t < terms - 1
+            term_courses.append({
+                'courseTitle': f"{rng.choice(['Intro to', 'Applied', 'Advanced'])} "
+                               f"{rng.choice(['Databases', 'Algorithms', 'Statistics', 'Writing', 'Networks'])}"
+                               f" {100 * (t + 1) + c}",
+                'creditHours': rng.choice([3, 3, 4]),
+                'letterGrade': grade if completed else '',
+                'gradePoints': points if completed else 0.0,
+                'status': 'Completed' if completed else 'InProgress',
+                'percentage': round(rng.uniform(70, 99), 1) if completed else None,
+                'instructorName': f"Dr. Instructor {c + 1}",
+                'instructorEmail': f"instructor{c + 1}@example.edu",
+            })
+        graded = [course for course in term_courses if course['letterGrade']]
+        credits = sum(course['creditHours'] for course in graded)
+        result.append({
+            'termTitle': f"{season} {term_start.year}",
+            'termStartDate': _iso(term_start),
+            'termEndDate': _iso(term_start + timedelta(weeks=16)),
+            'courses': term_courses,
+            'termGPA': round(sum(c['gradePoints'] * c['creditHours'] for c in graded) / credits, 2) if credits else 0.0,
+            'termCreditHours': credits,
+        })
+    return result
+
+
+def _gpa_csv(report):
+    lines = [report['reportTitle'], f"Generated: {report['generatedAt'][:10]} {report['generatedAt'][11:19]} UTC",
+             f"Student: {report['studentName']} ({report['studentEmail']})", f"Term: {report['termTitle']}",
+             f"Term Dates: {report['termStartDate'][:10]} to {report['termEndDate'][:10]}", '',
+             'Course Title,Credit Hours,Letter Grade,Grade Points']
+    lines += [f"{_csv_field(c['courseTitle'])},{c['creditHours']},{c['letterGrade']},{c['gradePoints']:.2f}"
+              for c in report['courses']]
+    lines += ['', f"Total Credit Hours,{report['totalCreditHours']},,Term GPA,{report['termGPA']:.2f}"]
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def _transcript_csv(report):
+    generated = datetime.fromisoformat(report['generatedAt'])
+    lines = ['=====================================', 'STUDENT PROGRESS TRACKER', 'ACADEMIC TRANSCRIPT',
+             f"Generated: {generated:%B %d, %Y} at {generated.hour % 12 or 12}:{generated:%M %p}",
+             f"Student: {report['studentName']}", f"Email: {report['studentEmail']}", '', 'ACADEMIC SUMMARY',
+             f"Total Terms: {len(report['terms'])}",
+             f"Total Courses: {sum(len(term['courses']) for term in report['terms'])}",
+             f"Total Credits Earned: {report['totalCreditHours']}",
+             f"Cumulative GPA: {report['cumulativeGPA']:.2f}", '']
+    for term in report['terms']:
+        start, end = (datetime.fromisoformat(term[key]) for key in ('termStartDate', 'termEndDate'))
+        lines += [f"TERM: {term['termTitle']}", f"Start: {start:%b %d, %Y} | End: {end:%b %d, %Y}",
+                  f"Term GPA: {term['termGPA']:.2f}", 'Course,Status,Credits,Grade,Percentage,Instructor,Email']
+        for c in term['courses']:
+            status = 'In Progress' if c['status'] == 'InProgress' else c['status']
+            percentage = f"{c['percentage']:.0f}%" if c['percentage'] is not None else ''
+            lines.append(f"{_csv_field(c['courseTitle'])},{_csv_field(status)},{c['creditHours']},"
+                         f"{c['letterGrade']},{percentage},{_csv_field(c['instructorName'])},"
+                         f"{_csv_field(c['instructorEmail'])}")
+        lines.append('')
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def stand_in_responses(terms=8, courses=5, seed=0):
+    """Path -> (content type, body) for every endpoint the stand-in serves"""
+    generated = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0).isoformat()
+    name, email = STAND_IN_STUDENT
+    term_list = stand_in_terms(terms, courses, seed)
+    graded = sum(term['termCreditHours'] for term in term_list)
+    transcript = {
+        'reportTitle': 'Academic Transcript', 'generatedAt': generated, 'studentName': name,
+        'studentEmail': email, 'terms': term_list,
+        'cumulativeGPA': round(sum(t['termGPA'] * t['termCreditHours'] for t in term_list) / graded, 2)
+        if graded else 0.0,
+        'totalCreditHours': graded,
+    }
+
+    def envelope(data):
+        return json.dumps({'success': True, 'data': data, 'message': None, 'errors': None}).encode()
+
+    responses = {
+        '/api/reports/transcript': ('application/json; charset=utf-8', envelope(transcript)),
+        '/api/reports/transcript/csv': ('text/csv', _transcript_csv(transcript).encode()),
+    }
+    for term_id, term in enumerate(term_list, 1):
+        report = {
+            'reportTitle': f"GPA Report - {term['termTitle']}", 'generatedAt': generated,
+            'studentName': name, 'studentEmail': email, 'termTitle': term['termTitle'],
+            'termStartDate': term['termStartDate'], 'termEndDate': term['termEndDate'],
+            'courses': [{key: course[key] for key in ('courseTitle', 'creditHours', 'letterGrade', 'gradePoints')}
+                        for course in term['courses']],
+            'totalCreditHours': term['termCreditHours'], 'termGPA': term['termGPA'],
+        }
+        responses[f'/api/reports/gpa/{term_id}'] = ('application/json; charset=utf-8', envelope(report))
+        responses[f'/api/reports/gpa/{term_id}/csv'] = ('text/csv', _gpa_csv(report).encode())
+    return responses
+
+
+def _response(status, reason, content_type, body, keep_alive):
+    head = (f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+class StandInServer:
+    """Serves the Reports endpoints from prebuilt bodies after an artificial delay"""
+
+    def __init__(self, terms=8, courses=5, delay_ms=2.0, jitter_ms=0.0, seed=0):
+        self.responses = stand_in_responses(terms, courses, seed)
+        self.delay = delay_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    def _delay(self):
+        return self.delay + (self.rng.expovariate(1 / self.jitter) if self.jitter else 0.0)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *headers = head.decode('latin-1').split('\r\n')
+                method, _, rest = request_line.partition(' ')
+                path = rest.partition(' ')[0].partition('?')[0]
+                keep_alive = not any(h.lower().replace(' ', '') == 'connection:close' for h in headers)
+                self.requests += 1
+                await asyncio.sleep(self._delay())
+                found = self.responses.get(path.rstrip('/')) if method == 'GET' else None
+                if found:
+                    writer.write(_response(200, 'OK', *found, keep_alive))
+                else:
+                    writer.write(_response(404, 'Not Found', 'text/plain', b'Not found', keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=0, ready=None):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        url = 'http://%s:%d' % server.sockets[0].getsockname()[:2]
+        if ready:
+            ready(url)
+        async with server:
+            await server.serve_forever()
+
+
+def start_stand_in(args):
+    """Start `serve` in a child process; returns the process and the URL it listens on"""
+    command = [sys.executable, '-m', 'diagrams.loadtest', 'serve', '--port', '0', '--terms', str(args.terms),
+               '--courses', str(args.courses), '--delay', str(args.delay), '--jitter', str(args.jitter)]
+    proc = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith('Listening on '):
+        proc.kill()
+        raise RuntimeError("the stand-in server did not start")
+    return proc, line.split()[-1]
+
+
+# Load generator
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+    async def get(self, request):
+        """Send a prepared GET; returns (status, body bytes, whether the connection can be reused)"""
+        self.writer.write(request)
+        await self.writer.drain()
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("response header too long")
+        status_line, *lines = head[:-4].decode('latin-1').split('\r\n')
+        status = int(status_line.split(' ', 2)[1])
+        headers = {}
+        for line in lines:
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip().lower()
+        if headers.get('transfer-encoding') == 'chunked':
+            size = 0
+            while True:
+                length = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(length + 2)
+                size += length
+                if not length:
+                    break
+        elif 'content-length' in headers:
+            size = len(await self.reader.readexactly(int(headers['content-length'])))
+        else:
+            size = len(await self.reader.read())
+            return status, size, False
+        return status, size, headers.get('connection') != 'close'
+
+
+class ConnectionPool:
+    """Up to `size` connections shared by the workers
+
+    A worker that finds none idle waits in line, and a released connection
+    is handed straight to the longest waiting worker, so no worker starves
+    behind newcomers.
+    """
+
+    def __init__(self, host, port, size):
+        self.host, self.port, self.size = host, port, size
+        self.idle = []
+        self.waiters = deque()
+        self.open = 0
+        self.opened = 0
+
+    async def acquire(self):
+        if self.idle:
+            return self.idle.pop()
+        if self.open >= self.size:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            connection = await waiter
+            if connection is not None:
+                return connection
+            # A connection was closed or failed to open; open a new one in its place
+        self.open += 1
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        except BaseException:
+            self._closed()
+            raise
+        self.opened += 1
+        return Connection(reader, writer)
+
+    def _hand_over(self, connection):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(connection)
+                return True
+        return False
+
+    def _closed(self):
+        self.open -= 1
+        self._hand_over(None)
+
+    def release(self, connection, reusable):
+        if not reusable:
+            connection.close()
+            self._closed()
+        elif not self._hand_over(connection):
+            self.idle.append(connection)
+
+    def close(self):
+        while self.idle:
+            self.idle.pop().close()
+
+
+def parse_mix(text):
+    """'gpa=4,transcript-csv=1' -> {'gpa': 4.0, 'transcript-csv': 1.0}"""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r} in --mix (known: {', '.join(ENDPOINTS)})")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"bad weight {weight!r} for {name} in --mix") from None
+        if mix[name] < 0:
+            raise ValueError(f"negative weight for {name} in --mix")
+    if not sum(mix.values()):
+        raise ValueError("--mix has no positive weights")
+    return mix
+
+
+class Results:
+    """Latency histograms and counts per endpoint and per second of the run"""
+
+    def __init__(self, endpoints):
+        self.endpoints = {name: {'histogram': LatencyHistogram(), 'total_ns': 0, 'errors': 0, 'statuses': {},
+                                 'bytes': 0} for name in endpoints}
+        self.seconds = {}   # second of the run -> [histogram, requests, errors]
+        self.elapsed = 0.0
+
+    def record(self, name, second, ns, status, size):
+        endpoint = self.endpoints[name]
+        endpoint['statuses'][status] = endpoint['statuses'].get(status, 0) + 1
+        bucket = self.seconds.setdefault(second, [LatencyHistogram(), 0, 0])
+        bucket[1] += 1
+        if status is None or status >= 400:
+            endpoint['errors'] += 1
+            bucket[2] += 1
+            return
+        endpoint['histogram'].add(ns)
+        endpoint['total_ns'] += ns
+        endpoint['bytes'] += size
+        bucket[0].add(ns)
+
+    def overall(self):
+        histogram = LatencyHistogram()
+        for endpoint in self.endpoints.values():
+            histogram.merge(endpoint['histogram'])
+        return histogram
+
+    def summary(self):
+        def stats(histogram, total_ns, errors, requests):
+            return {
+                'requests': requests, 'errors': errors,
+                'throughput': round(requests / self.elapsed, 1) if self.elapsed else 0.0,
+                'mean_ms': round(total_ns / histogram.count / 1e6, 3) if histogram.count else None,
+                'min_ms': round(histogram.min / 1e6, 3) if histogram.count else None,
+                'max_ms': round(histogram.max / 1e6, 3) if histogram.count else None,
+                'percentiles_ms': {f'p{q:g}': round(histogram.percentile(q) / 1e6, 3) for q in PERCENTILES},
+            }
+
+        endpoints = {}
+        for name, endpoint in self.endpoints.items():
+            requests = sum(endpoint['statuses'].values())
+            if requests:
+                endpoints[name] = stats(endpoint['histogram'], endpoint['total_ns'], endpoint['errors'], requests)
+                endpoints[name]['statuses'] = {str(status or 'failed'): count
+                                               for status, count in endpoint['statuses'].items()}
+                endpoints[name]['bytes'] = endpoint['bytes']
+        total = stats(self.overall(), sum(e['total_ns'] for e in self.endpoints.values()),
+                      sum(e['errors'] for e in self.endpoints.values()),
+                      sum(sum(e['statuses'].values()) for e in self.endpoints.values()))
+        return {'elapsed_s': round(self.elapsed, 3), 'total': total, 'endpoints': endpoints}
+
+
+async def load(url, mix, concurrency=16, connections=None, duration=10.0, requests=None, rate=None,
+               warmup=0.0, terms=8, token=None, timeout=DEFAULT_TIMEOUT, seed=0, progress=None):
+    """Run the load test against `url`; returns Results"""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    if parts.scheme != 'http':
+        raise ValueError(f"only http:// URLs are supported, not {url}")
+    base = parts.path.rstrip('/')
+    auth = f"Authorization: Bearer {token}\r\n" if token else ''
+    prepared = {name: [f"GET {base}{path.format(term=term)} HTTP/1.1\r\nHost: {parts.netloc}\r\n{auth}"
+                       f"Accept: */*\r\nConnection: keep-alive\r\n\r\n".encode()
+                       for term in (range(1, terms + 1) if '{term}' in path else [None])]
+                for name, path in ENDPOINTS.items() if mix.get(name)}
+    names = list(prepared)
+    weights = [mix[name] for name in names]
+    rng = random.Random(seed)
+    pool = ConnectionPool(host, port, connections or concurrency)
+    results = Results(names)
+    clock = time.perf_counter_ns
+    start = clock()
+    measure_from = start + int(warmup * 1e9)
+    stop = start + int((warmup + duration) * 1e9) if requests is None else None
+    issued = 0
+
+    def next_request():
+        nonlocal issued
+        if (requests is not None and issued >= requests) or (stop is not None and clock() >= stop):
+            return None
+        issued += 1
+        name = rng.choices(names, weights)[0]
+        return name, rng.choice(prepared[name])
+
+    async def send(name, request, due):
+        status, size = None, 0
+        try:
+            connection = await pool.acquire()
+            reusable = False
+            try:
+                status, size, reusable = await asyncio.wait_for(connection.get(request), timeout)
+            finally:
+                pool.release(connection, reusable)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            pass
+        now = clock()
+        if due >= measure_from:
+            results.record(name, (due - measure_from) // 1_000_000_000, now - due, status, size)
+
+    async def worker():
+        while (job := next_request()) is not None:
+            await send(*job, clock())
+
+    async def scheduler():
+        """Open loop: start requests at their due times, at most `concurrency` in flight"""
+        interval = 1e9 / rate
+        slots = asyncio.Semaphore(concurrency)
+        tasks = set()
+
+        async def limited(job, due):
+            async with slots:
+                await send(*job, due)
+
+        due = start
+        while (job := next_request()) is not None:
+            delay = (due - clock()) / 1e9
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(limited(job, due))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            due += int(interval)
+        await asyncio.gather(*tasks)
+
+    async def report():
+        while True:
+            await asyncio.sleep(1)
+            progress(issued, (clock() - start) / 1e9)
+
+    reporter = asyncio.create_task(report()) if progress else None
+    try:
+        if rate:
+            await scheduler()
+        else:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if reporter:
+            reporter.cancel()
+        pool.close()
+    results.elapsed = (clock() - measure_from) / 1e9
+    results.connections = pool.opened
+    return results
+
+
+# Charts
+
+def _percentile_axis(histogram, points=200):
+    """x = -log10(1 - p) up to the percentile the sample supports, and the latency (ms) there"""
+    top = min(5.0, math.log10(max(histogram.count, 2)))
+    xs = [top * i / points for i in range(points + 1)]
+    return xs, [histogram.percentile(100 * (1 - 10 ** -x)) / 1e6 for x in xs]
+
+
+def render_charts(results, output=OUTPUT, dpi=150, title='Reports API load test'):
+    """Percentile distribution, percentiles per endpoint and latency over time in one image"""
+    with phase('import'):
+        fonts.install()
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from matplotlib.ticker import FixedLocator, FuncFormatter, LogLocator, MaxNLocator, NullFormatter, NullLocator
+
+    colors = REPORT_COLORS
+    endpoints = [(name, endpoint['histogram']) for name, endpoint in results.endpoints.items()
+                 if endpoint['histogram'].count]
+    if not endpoints:
+        raise ValueError("no successful requests to chart")
+    overall = results.overall()
+    summary = results.summary()
+
+    with reproducible.pinned():
+        with phase('artists'):
+            fig = Figure(figsize=(18, 5.4), dpi=dpi)
+            FigureCanvasAgg(fig)
+            dist, bars, timeline = fig.subplots(1, 3, gridspec_kw={'width_ratios': [1.2, 1, 1.3]})
+
+            for color, (name, histogram) in zip(colors['series'], endpoints):
+                dist.plot(*_percentile_axis(histogram), color=color, linewidth=1.8, label=name)
+            if len(endpoints) > 1:
+                dist.plot(*_percentile_axis(overall), color=colors['text'], linewidth=2.4, linestyle='--', label='all')
+            dist.set_yscale('log')
+            dist.yaxis.set_major_locator(LogLocator(subs=(1, 2, 5)))
+            dist.yaxis.set_major_formatter(FuncFormatter(lambda y, _: f"{y:g}"))
+            dist.yaxis.set_minor_formatter(NullFormatter())
+            ticks = [0, 1, 2, 3, 4, 5]
+            dist.xaxis.set_major_locator(FixedLocator(ticks))
+            dist.xaxis.set_major_formatter(FuncFormatter(
+                lambda x, _: f"{100 * (1 - 10.0 ** -x):.{max(0, int(round(x)) - 2)}f}%"))
+            dist.xaxis.set_minor_locator(NullLocator())
+            dist.set_xlim(0, max(x for x in _percentile_axis(overall, 1)[0]))
+            dist.set_xlabel('percentile')
+            dist.set_ylabel('latency (ms)')
+            dist.legend(fontsize=8, frameon=False)
+            dist.set_title('Latency by percentile', fontsize=12, fontweight='bold', color=colors['text'], loc='left')
+
+            names = [name for name, _ in endpoints]
+            width = 0.8 / len(BAR_PERCENTILES)
+            for k, (color, q) in enumerate(zip(colors['series'], BAR_PERCENTILES)):
+                values = [summary['endpoints'][name]['percentiles_ms'][f'p{q:g}'] for name in names]
+                positions = [i + (k - (len(BAR_PERCENTILES) - 1) / 2) * width for i in range(len(names))]
+                bars.bar(positions, values, width, color=color, label=f'p{q:g}')
+            bars.set_xticks(range(len(names)))
+            bars.set_xticklabels(names, rotation=20, ha='right')
+            bars.set_ylabel('latency (ms)')
+            bars.legend(fontsize=8, frameon=False)
+            bars.set_title('Percentiles by endpoint', fontsize=12, fontweight='bold', color=colors['text'], loc='left')
+
+            seconds = sorted(results.seconds)
+            throughput = timeline.twinx()
+            throughput.bar(seconds, [results.seconds[s][1] for s in seconds], width=0.9, color=colors['grid'],
+                           label='requests/s')
+            errors = [results.seconds[s][2] for s in seconds]
+            if any(errors):
+                throughput.bar(seconds, errors, width=0.9, color=colors['series'][3], label='errors/s')
+            throughput.set_ylabel('requests/s')
+            throughput.set_ylim(0, 1.3 * max(results.seconds[s][1] for s in seconds))
+            timeline.set_zorder(throughput.get_zorder() + 1)
+            timeline.patch.set_visible(False)
+            for color, q in zip((colors['series'][0], colors['series'][1]), (50, 99)):
+                timeline.plot(seconds, [results.seconds[s][0].percentile(q) / 1e6 for s in seconds],
+                              color=color, linewidth=1.8, marker='o', markersize=3, label=f'p{q}')
+            timeline.set_ylim(0, 1.3 * max(results.seconds[s][0].percentile(99) / 1e6 for s in seconds))
+            timeline.xaxis.set_major_locator(MaxNLocator(integer=True))
+            timeline.set_xlabel('second of the run')
+            timeline.set_ylabel('latency (ms)')
+            handles = timeline.get_legend_handles_labels()
+            more = throughput.get_legend_handles_labels()
+            timeline.legend(handles[0] + more[0], handles[1] + more[1], fontsize=8, frameon=False, loc='upper left')
+            timeline.set_title('Latency and throughput over time', fontsize=12, fontweight='bold',
+                               color=colors['text'], loc='left')
+
+            for ax in (dist, bars, timeline):
+                ax.grid(axis='y', color=colors['grid'], linewidth=0.8, which='major')
+                ax.set_axisbelow(True)
+                ax.tick_params(colors=colors['text'], labelsize=9)
+            total = summary['total']
+            fig.suptitle(f"{title}: {total['requests']:,} requests in {results.elapsed:.1f}s "
+                         f"({total['throughput']:,.0f}/s), p50 {format_duration(overall.percentile(50))}, "
+                         f"p99 {format_duration(overall.percentile(99))}, {total['errors']:,} errors",
+                         fontsize=14, fontweight='bold', color=colors['text'])
+        with phase('layout'):
+            fig.tight_layout(rect=(0, 0, 1, 0.95))
+        with phase('save', output=os.fspath(output), dpi=dpi):
+            fmt = os.path.splitext(os.fspath(output))[1].lstrip('.') or 'png'
+            fig.savefig(output, dpi=dpi, format=fmt, facecolor='white',
+                        metadata=reproducible.metadata(fmt))
+    return output
+
+
+def print_summary(summary):
+    columns = ' '.join(f"{f'p{q:g}':>9}" for q in PERCENTILES)
+    print(f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>9} {columns}   (ms)")
+    rows = list(summary['endpoints'].items()) + [('all', summary['total'])]
+    for name, stats in rows:
+        values = ' '.join(f"{stats['percentiles_ms'][f'p{q:g}']:>9.2f}" for q in PERCENTILES)
+        print(f"{name:<16}{stats['requests']:>10,}{stats['errors']:>8,}{stats['throughput']:>9,.0f} {values}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.loadtest',
+                                     description='Load-test the Reports endpoints and chart the latencies.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def stand_in_options(command):
+        command.add_argument('--terms', type=int, default=8, help='terms of the stand-in student (default: 8)')
+        command.add_argument('--courses', type=int, default=5, help='courses per term (default: 5)')
+        command.add_argument('--delay', type=float, default=2.0,
+                             help='stand-in delay before every response, in ms (default: 2)')
+        command.add_argument('--jitter', type=float, default=0.0,
+                             help='mean of an exponential delay added on top, in ms (default: 0)')
+
+    run_cmd = commands.add_parser('run', help='run a load test and chart the latencies')
+    run_cmd.add_argument('--url', help='API base URL (default: start the stand-in server)')
+    run_cmd.add_argument('--token', help='bearer token sent with every request')
+    run_cmd.add_argument('--mix', default=DEFAULT_MIX,
+                         help=f"endpoint weights, from {', '.join(ENDPOINTS)} (default: {DEFAULT_MIX})")
+    run_cmd.add_argument('-c', '--concurrency', type=int, default=16,
+                         help='workers, or requests in flight with --rate (default: 16)')
+    run_cmd.add_argument('--connections', type=int,
+                         help='size of the connection pool (default: one per worker)')
+    length = run_cmd.add_mutually_exclusive_group()
+    length.add_argument('-d', '--duration', type=float, default=10.0, help='seconds to run (default: 10)')
+    length.add_argument('-n', '--requests', type=int, help='run this many requests instead')
+    run_cmd.add_argument('--rate', type=float, help='requests per second, scheduled open-loop')
+    run_cmd.add_argument('--warmup', type=float, default=1.0,
+                         help='seconds run before measuring starts (default: 1)')
+    run_cmd.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                         help=f'seconds before a request counts as failed (default: {DEFAULT_TIMEOUT:g})')
+    run_cmd.add_argument('--seed', type=int, default=0, help='seed of the request mix')
+    run_cmd.add_argument('-o', '--output', default=OUTPUT, help='chart to write (default: load_test_latency.png)')
+    run_cmd.add_argument('--dpi', type=int, default=150)
+    run_cmd.add_argument('--json', metavar='PATH', help='also write the results summary as JSON')
+    stand_in_options(run_cmd)
+
+    serve_cmd = commands.add_parser('serve', help='run the stand-in server only')
+    serve_cmd.add_argument('--host', default='127.0.0.1')
+    serve_cmd.add_argument('--port', type=int, default=8080, help='port to listen on; 0 picks a free one')
+    stand_in_options(serve_cmd)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        server = StandInServer(args.terms, args.courses, args.delay, args.jitter)
+        try:
+            asyncio.run(server.serve(args.host, args.port, ready=lambda url: print(f"Listening on {url}",
+                                                                                 flush=True)))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.concurrency < 1 or (args.connections is not None and args.connections < 1):
+        parser.error('--concurrency and --connections must be at least 1')
+
+    proc = None
+    try:
+        url = args.url
+        if url is None:
+            proc, url = start_stand_in(args)
+            print(f"Stand-in server on {url} (delay {args.delay:g} ms, jitter {args.jitter:g} ms)")
+        results = asyncio.run(load(
+            url, mix, args.concurrency, args.connections, args.duration, args.requests, args.rate,
+            0.0 if args.requests else args.warmup, args.terms, args.token, args.timeout, args.seed,
+            progress=lambda issued, seconds: print(f"  {seconds:5.1f}s  {issued:,} requests", file=sys.stderr)))
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    summary = results.summary()
+    summary['connections'] = results.connections
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'url': args.url or 'stand-in', 'mix': mix, 'concurrency': args.concurrency,
+                       'rate': args.rate, **summary}, f, indent=2)
+            f.write('\n')
+        print(f"Wrote {args.json}")
+    try:
+        render_charts(results, args.output, args.dpi)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(f"Saved {args.output} ({results.connections} connection(s) opened)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
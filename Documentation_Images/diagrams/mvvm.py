@@ -0,0 +1,21 @@
+"""
+MVVM Pattern Diagram for MAUI App
+
+Laid out from specs/mvvm.json.
+"""
+from .spec import render_spec, render_spec_outputs
+
+OUTPUT = 'mvvm_pattern.png'
+
+
+def render(output=OUTPUT, dpi=300, fmt='png'):
+    """Draw the MVVM pattern diagram and save it to `output`"""
+    return render_spec('mvvm', output, dpi=dpi, fmt=fmt)
+
+
+def render_outputs(outputs):
+    """Draw the MVVM pattern diagram once and save it to each of `outputs`
+
+    `outputs` is a list of (output, dpi, fmt) tuples.
+    """
+    return render_spec_outputs('mvvm', outputs)
@@ -0,0 +1,511 @@
+"""
+Sequence diagrams measured from recorded OpenTelemetry traces
+
+Reads spans exported as JSON lines and turns each request flow (the spans
+under one root, such as `GET /api/reports/gpa/{termId}/csv`) into a
+`sequence` spec whose arrows carry latency percentiles. Two line formats are
+understood: OTLP/JSON export requests (`{"resourceSpans": [...]}` per line,
+as the collector's file exporter writes them) and one span object per line.
+Files ending in .gz are decompressed on the fly.
+
+The input is streamed: a line is parsed, its spans are reduced to a few
+fields and buffered under their trace id until the trace's root span
+arrives (roots end, and are exported, last). A trace whose root never
+arrives, such as an API trace whose parent span lives in the app, is
+assembled from what was seen once MAX_PENDING_TRACES newer traces are
+waiting, or at the end of the input. Memory therefore depends on that
+bound and on the number of distinct flows, not on the file size; latencies
+go into log-bucketed histograms instead of lists.
+
+Each trace becomes a call tree. Actors come from the span attributes (the
+database for `db.*` spans, the class in `code.namespace`, otherwise the
+service), and a child span is a message from its parent's actor to its own.
+Consecutive repeats of the same call, or of the same run of up to
+MAX_PATTERN calls (an N+1 query loop), collapse into one message marked
+with its repeat count. Traces of a flow with the same collapsed shape are
+merged, and the most common shape is drawn.
+
+Usage:
+    python -m diagrams.otel traces.jsonl                       # list flows and per-hop latencies
+    python -m diagrams.otel traces.jsonl.gz --flow reports/gpa --spec-dir specs --name gpa_csv_measured
+    python -m diagrams.otel traces.jsonl --flow transcript -o build/transcript_flow.png
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+
+# Latency percentiles printed on the arrows
+PERCENTILES = (50, 95, 99)
+
+# Traces buffered while waiting for their root span; past this, the least
+# recently active one is assembled from the spans seen so far
+MAX_PENDING_TRACES = 10_000
+
+# Spans kept per trace; the rest of a runaway trace is dropped
+MAX_TRACE_SPANS = 5_000
+
+# Longest run of sibling calls recognized as a repeating pattern
+MAX_PATTERN = 4
+
+# Distinct collapsed shapes kept per flow; rarer shapes are only counted
+MAX_SHAPES = 32
+
+# Relative width of the latency histogram buckets (and so of the percentile error)
+HISTOGRAM_PRECISION = 0.01
+
+# Attributes naming the database a span talks to, most specific first
+DB_ATTRIBUTES = ('db.namespace', 'db.name', 'db.system.name', 'db.system')
+
+SERVER_KINDS = (2, 'SPAN_KIND_SERVER')
+
+# Layout of generated specs, in inches (one data unit per inch)
+ACTOR_SPACING = 2.6
+MARGIN = 1.5
+MESSAGE_STEP = 0.8
+MIN_WIDTH = 9
+
+# Longest actor name kept on one line in the actor boxes
+ACTOR_LINE = 13
+
+
+class LatencyHistogram:
+    """Counts of durations in log-spaced buckets HISTOGRAM_PRECISION wide"""
+
+    __slots__ = ('buckets', 'count', 'min', 'max')
+
+    _LOG_BASE = math.log1p(HISTOGRAM_PRECISION)
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.min = math.inf
+        self.max = 0
+
+    def add(self, ns):
+        ns = max(ns, 1)
+        bucket = int(math.log(ns) / self._LOG_BASE)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.min = min(self.min, ns)
+        self.max = max(self.max, ns)
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """The q-th percentile in ns, to within HISTOGRAM_PRECISION"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                value = math.exp((bucket + 0.5) * self._LOG_BASE)
+                return min(max(value, self.min), self.max)
+        return float(self.max)
+
+
+class Span:
+    """The fields of an exported span a sequence diagram needs"""
+
+    __slots__ = ('span_id', 'parent_id', 'actor', 'label', 'start', 'end', 'server')
+
+    def __init__(self, span_id, parent_id, actor, label, start, end, server):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.actor = actor
+        self.label = label
+        self.start = start
+        self.end = end
+        self.server = server
+
+
+class Step:
+    """A message in a collapsed call tree, or (label None) a repeated run of them
+
+    `repeats` is the (fewest, most) consecutive repeats seen; the histogram
+    holds the duration of every call merged into the step.
+    """
+
+    __slots__ = ('source', 'target', 'label', 'histogram', 'repeats', 'children', 'signature')
+
+    def __init__(self, source, target, label, children=(), repeats=(1, 1)):
+        self.source = source
+        self.target = target
+        self.label = label
+        self.histogram = LatencyHistogram()
+        self.repeats = repeats
+        self.children = list(children)
+        # Repeat counts are left out, so loops of any length merge
+        self.signature = (source, target, label, tuple(child.signature for child in self.children))
+
+    def absorb(self, other):
+        """Merge a structurally identical step into this one"""
+        self.histogram.merge(other.histogram)
+        self.repeats = (min(self.repeats[0], other.repeats[0]), max(self.repeats[1], other.repeats[1]))
+        for mine, theirs in zip(self.children, other.children):
+            mine.absorb(theirs)
+
+
+def _attributes(items):
+    """OTLP attributes ([{"key": .., "value": {"stringValue": ..}}]) or a plain mapping, as a dict"""
+    if isinstance(items, dict):
+        return items
+    attributes = {}
+    for item in items or ():
+        value = item.get('value', {})
+        attributes[item.get('key')] = next(iter(value.values()), None) if value else None
+    return attributes
+
+
+def _actor(attributes, service):
+    for key in DB_ATTRIBUTES:
+        if attributes.get(key):
+            return f"Database\n({attributes[key]})"
+    namespace = attributes.get('code.namespace')
+    if namespace:
+        return str(namespace).rsplit('.', 1)[-1]
+    return service
+
+
+def _wrap_actor(name):
+    """Break a long CamelCase name ('ReportsController') over two lines to fit its box"""
+    if len(name) <= ACTOR_LINE or '\n' in name:
+        return name
+    breaks = [i for i in range(1, len(name)) if name[i].isupper() and name[i - 1].islower()]
+    if not breaks:
+        return name
+    middle = min(breaks, key=lambda i: abs(i - len(name) / 2))
+    return f"{name[:middle]}\n{name[middle:]}"
+
+
+def _label(name, attributes):
+    route = attributes.get('http.route')
+    if route and route not in name:
+        method = attributes.get('http.request.method') or attributes.get('http.method') or ''
+        return f"{method} {route}".strip()
+    return name
+
+
+def iter_spans(lines):
+    """Span for every span in an iterable of OTLP/JSON or span-per-line lines
+
+    Blank lines are skipped; a line that is not JSON raises ValueError with
+    its number.
+    """
+    intern = {}
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: not JSON ({e})") from None
+        if 'resourceSpans' in record:
+            groups = [(_attributes(resource.get('resource', {}).get('attributes')).get('service.name', 'service'),
+                       [span for scope in resource.get('scopeSpans', resource.get('instrumentationLibrarySpans', []))
+                        for span in scope.get('spans', [])])
+                      for resource in record['resourceSpans']]
+        else:
+            attributes = _attributes(record.get('resource', {}).get('attributes', record.get('resource')))
+            groups = [(attributes.get('service.name') or record.get('service.name') or 'service', [record])]
+        for service, spans in groups:
+            for span in spans:
+                attributes = _attributes(span.get('attributes'))
+                actor = _actor(attributes, service)
+                label = _label(span.get('name', ''), attributes)
+                yield span.get('traceId'), Span(
+                    span.get('spanId'), span.get('parentSpanId') or None,
+                    intern.setdefault(actor, actor), intern.setdefault(label, label),
+                    int(span.get('startTimeUnixNano', 0)), int(span.get('endTimeUnixNano', 0)),
+                    span.get('kind') in SERVER_KINDS)
+
+
+def call_tree(spans):
+    """The collapsed call tree of one trace: a list of root Steps
+
+    Roots are spans whose parent is not in the trace. Their caller is shown
+    as Client for server spans and User otherwise.
+    """
+    by_id = {span.span_id: span for span in spans}
+    children = {}
+    roots = []
+    for span in spans:
+        if span.parent_id in by_id:
+            children.setdefault(span.parent_id, []).append(span)
+        else:
+            roots.append(span)
+
+    def build(span, caller):
+        kids = sorted(children.get(span.span_id, ()), key=lambda child: child.start)
+        step = Step(caller, span.actor, span.label, collapse([build(kid, span.actor) for kid in kids]))
+        step.histogram.add(span.end - span.start)
+        return step
+
+    return collapse([build(root, 'Client' if root.server else 'User')
+                     for root in sorted(roots, key=lambda root: root.start)])
+
+
+def collapse(steps):
+    """Fold consecutive repeats of a step, or of a run of up to MAX_PATTERN steps, into one"""
+    collapsed = []
+    i = 0
+    while i < len(steps):
+        for width in range(1, MAX_PATTERN + 1):
+            repeats = 1
+            while (i + (repeats + 1) * width <= len(steps)
+                   and all(steps[i + repeats * width + k].signature == steps[i + k].signature
+                           for k in range(width))):
+                repeats += 1
+            if repeats > 1:
+                break
+        if repeats == 1:
+            collapsed.append(steps[i])
+            i += 1
+            continue
+        block = steps[i:i + width]
+        for repeat in range(1, repeats):
+            for k in range(width):
+                block[k].absorb(steps[i + repeat * width + k])
+        if width == 1:
+            block[0].repeats = (repeats, repeats)
+            collapsed.append(block[0])
+        else:
+            collapsed.append(Step(None, None, None, block, (repeats, repeats)))
+        i += repeats * width
+    return collapsed
+
+
+class Flow:
+    """All traces of one request flow, merged by collapsed shape"""
+
+    def __init__(self, name):
+        self.name = name
+        self.traces = 0
+        self.other_shapes = 0
+        # shape signature -> [trace count, root Steps]
+        self.shapes = {}
+
+    def add(self, steps):
+        self.traces += 1
+        signature = tuple(step.signature for step in steps)
+        shape = self.shapes.get(signature)
+        if shape is not None:
+            shape[0] += 1
+            for mine, theirs in zip(shape[1], steps):
+                mine.absorb(theirs)
+        elif len(self.shapes) < MAX_SHAPES:
+            self.shapes[signature] = [1, steps]
+        else:
+            self.other_shapes += 1
+
+    def matches(self, text):
+        """Whether `text` occurs, ignoring case, in the flow's name or any of its calls"""
+        text = text.lower()
+        return text in self.name.lower() or any(text in label.lower()
+                                                for _, _, label, _ in messages(self.common_shape()[1]))
+
+    def common_shape(self):
+        """(trace count, root Steps) of the most frequent shape"""
+        return max(self.shapes.values(), key=lambda shape: shape[0])
+
+
+def read_flows(paths, max_pending=MAX_PENDING_TRACES, progress=None):
+    """Stream the trace files and return ({flow name: Flow}, stats)"""
+    flows = {}
+    pending = OrderedDict()
+    stats = {'spans': 0, 'traces': 0, 'incomplete': 0, 'dropped_spans': 0, 'bytes': 0, 'max_pending': 0}
+
+    def finish(trace_id, spans, complete):
+        steps = call_tree(spans)
+        if not steps:
+            return
+        stats['traces'] += 1
+        stats['incomplete'] += not complete
+        name = steps[0].label if steps[0].label is not None else steps[0].children[0].label
+        flow = flows.get(name)
+        if flow is None:
+            flow = flows[name] = Flow(name)
+        flow.add(steps)
+
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for trace_id, span in iter_spans(f):
+                stats['spans'] += 1
+                spans = pending.get(trace_id)
+                if spans is None:
+                    spans = pending[trace_id] = []
+                else:
+                    pending.move_to_end(trace_id)
+                if len(spans) < MAX_TRACE_SPANS:
+                    spans.append(span)
+                else:
+                    stats['dropped_spans'] += 1
+                if span.parent_id is None:
+                    finish(trace_id, pending.pop(trace_id), True)
+                elif len(pending) > max_pending:
+                    finish(*pending.popitem(last=False), False)
+                stats['max_pending'] = max(stats['max_pending'], len(pending))
+                if progress and stats['spans'] % 1_000_000 == 0:
+                    progress(stats)
+        stats['bytes'] += os.path.getsize(path)
+    while pending:
+        finish(*pending.popitem(last=False), False)
+    return flows, stats
+
+
+def format_duration(ns):
+    if ns < 1e6:
+        return f"{ns / 1e3:.0f} µs"
+    if ns < 1e9:
+        return f"{ns / 1e6:.3g} ms"
+    return f"{ns / 1e9:.3g} s"
+
+
+def _repeat_text(repeats):
+    low, high = repeats
+    if high == 1:
+        return ''
+    return f" ×{low}" if low == high else f" ×{low}–{high}"
+
+
+def latency_text(histogram, percentiles=PERCENTILES):
+    return ' · '.join(f"p{q:g} {format_duration(histogram.percentile(q))}" for q in percentiles)
+
+
+def messages(steps, percentiles=PERCENTILES, loop=''):
+    """(source, target, label text, latency text) for every call, depth first"""
+    for step in steps:
+        if step.label is None:
+            yield from messages(step.children, percentiles, loop or _repeat_text(step.repeats))
+            continue
+        yield (step.source, step.target, f"{step.label}{_repeat_text(step.repeats) or loop}",
+               latency_text(step.histogram, percentiles))
+        yield from messages(step.children, percentiles, loop)
+
+
+def flow_spec(flow, percentiles=PERCENTILES, title=None):
+    """A `sequence` spec of the flow's most common shape, laid out to fit"""
+    traces, steps = flow.common_shape()
+    calls = list(messages(steps, percentiles))
+    actors = []
+    for source, target, _, _ in calls:
+        for actor in (source, target):
+            if actor not in actors:
+                actors.append(actor)
+    ids = {actor: f'a{i}' for i, actor in enumerate(actors)}
+
+    width = max(MIN_WIDTH, 2 * MARGIN + (len(actors) - 1) * ACTOR_SPACING)
+    left = (width - (len(actors) - 1) * ACTOR_SPACING) / 2
+    # The last message sits 0.9 above the bottom, the first 1.0 below the actor boxes
+    top = 0.9 + (len(calls) - 1) * MESSAGE_STEP + 1.0
+    height = top + 1.0
+    return {
+        'kind': 'sequence',
+        'title': title or f"{flow.name} - measured ({traces:,} of {flow.traces:,} traces)",
+        'title_at': [width / 2, height - 0.2],
+        'title_size': 14,
+        'canvas': {'size': [round(width, 2), round(height, 2)],
+                   'xlim': [0, round(width, 2)], 'ylim': [0, round(height, 2)]},
+        'layout': {'left': round(left, 2), 'spacing': ACTOR_SPACING, 'top': round(top, 2),
+                   'lifeline': [round(top - 0.3, 2), 0.4], 'first_message': round(top - 1.0, 2),
+                   'message_step': MESSAGE_STEP},
+        'actors': [{'id': ids[actor], 'label': _wrap_actor(actor)} for actor in actors],
+        'messages': [{'from': ids[source], 'to': ids[target], 'label': f"{i}. {label}\n{latency}"}
+                     for i, (source, target, label, latency) in enumerate(calls, 1)],
+        'measured': {'flow': flow.name, 'traces': flow.traces, 'shape_traces': traces,
+                     'percentiles': list(percentiles)},
+    }
+
+
+def slug(name):
+    """A file-name stem for a flow name: 'GET /api/reports/gpa/{termId}/csv' -> 'get_api_reports_gpa_termid_csv'"""
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_') or 'flow'
+
+
+def print_report(flows, stats, percentiles=PERCENTILES):
+    for flow in sorted(flows.values(), key=lambda flow: -flow.traces):
+        traces, steps = flow.common_shape()
+        shapes = len(flow.shapes) + (flow.other_shapes > 0)
+        print(f"{flow.name}: {flow.traces:,} traces, {shapes} shape(s), most common in {traces:,}")
+        for i, (source, target, label, latency) in enumerate(messages(steps, percentiles), 1):
+            hop = f"{source} -> {target}".replace('\n', ' ')
+            print(f"  {i:>2}. {hop}: {label.replace(chr(10), ' ')}  [{latency}]")
+    print(f"{stats['spans']:,} spans in {stats['traces']:,} traces ({stats['incomplete']:,} without a root "
+          f"span), at most {stats['max_pending']:,} traces buffered")
+    if stats['dropped_spans']:
+        print(f"{stats['dropped_spans']:,} spans dropped from traces over {MAX_TRACE_SPANS:,} spans")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.otel',
+                                     description='Build sequence diagrams from OpenTelemetry JSON-lines traces.')
+    parser.add_argument('traces', nargs='+', help='trace files (.jsonl, or .jsonl.gz)')
+    parser.add_argument('--flow', dest='flows', action='append', default=[], metavar='TEXT',
+                        help='only flows whose root span or any call contains TEXT (ignoring case); repeatable')
+    parser.add_argument('--spec-dir', help='write a sequence spec per flow into this directory')
+    parser.add_argument('--name', help='spec and output name, when one flow is selected')
+    parser.add_argument('-o', '--output', help='render the selected flow to this file (one flow only)')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--percentile', dest='percentiles', action='append', type=float, metavar='Q',
+                        help=f"percentile to show on the arrows; repeatable "
+                             f"(default: {', '.join(str(q) for q in PERCENTILES)})")
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING_TRACES,
+                        help='traces buffered while waiting for their root span '
+                             f'(default: {MAX_PENDING_TRACES:,})')
+    args = parser.parse_args(argv)
+    percentiles = tuple(args.percentiles or PERCENTILES)
+
+    start = time.perf_counter()
+    try:
+        flows, stats = read_flows(args.traces, args.max_pending, progress=lambda stats: print(
+            f"  {stats['spans']:,} spans...", file=sys.stderr))
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    if args.flows:
+        flows = {name: flow for name, flow in flows.items() if any(flow.matches(text) for text in args.flows)}
+    if not flows:
+        print("error: no matching flows", file=sys.stderr)
+        return 1
+    print_report(flows, stats, percentiles)
+    print(f"Read {stats['bytes'] / 1e6:,.1f} MB in {elapsed:.2f}s")
+
+    if (args.name or args.output) and len(flows) > 1:
+        parser.error(f"--name and --output need exactly one flow; {len(flows)} match (narrow them with --flow)")
+    specs = {args.name or slug(name): flow_spec(flow, percentiles) for name, flow in flows.items()}
+    if args.spec_dir:
+        os.makedirs(args.spec_dir, exist_ok=True)
+        for stem, spec in specs.items():
+            path = os.path.join(args.spec_dir, f'{stem}.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(spec, f, indent=2, ensure_ascii=False)
+                f.write('\n')
+            print(f"Wrote {path}")
+    if args.output:
+        from .draw import render_scene
+        from .spec import compile_spec
+
+        spec, = specs.values()
+        fmt = os.path.splitext(args.output)[1].lstrip('.') or 'png'
+        render_scene(compile_spec(spec), args.output, args.dpi, fmt)
+        print(f"Saved {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Per-phase timings of diagram renders, as a JSON summary and a Chrome trace
+
+When recording is enabled, every render is broken into spans:
+
+    render    one diagram, from import to the last output written
+    import    importing the diagram module, or matplotlib with the drawing code
+    scene     loading the compiled scene (compile: compiling it on a cache miss)
+    artists   creating the figure and its artists (args: artists)
+    layout    tight_layout, and measuring the crop box of each output
+    save      one output (args: output, fmt, dpi)
+    draw      the Agg (or vector backend) draw of the figure
+    encode    PNG/SVG/PDF encoding, excluding the draw nested in it
+    write     writing the encoded file (args: bytes)
+
+plus the orchestrator's own plan, worker, optimize and manifest phases.
+Spans nest, so the summary reports each phase's self time: its duration minus
+the spans nested in it. The Chrome trace (the "X" complete events of the
+trace-event format) opens in chrome://tracing or https://ui.perfetto.dev,
+with worker processes on their own rows.
+
+Recording is off unless enabled; a disabled phase() costs about a
+microsecond. Enable it with `--trace FILE` on `python -m diagrams` and
+generate_all_diagrams.py, or for any generator script with the DIAGRAMS_TRACE
+environment variable:
+
+    DIAGRAMS_TRACE=erd_trace.json python generate_erd.py
+
+The summary is written next to the trace, with `.summary` before the
+extension: --trace /tmp/t.json gives /tmp/t.summary.json.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+TRACE_VERSION = 1
+
+# Environment variable naming the trace file to record every render into
+TRACE_ENV = 'DIAGRAMS_TRACE'
+
+# Phases in the order they are listed in the summary table
+PHASES = ['import', 'scene', 'compile', 'artists', 'layout', 'draw', 'encode', 'write', 'thumbnail']
+
+# Recorded events, or None while recording is off
+_events = None
+
+# Wall-clock time of perf_counter's zero, in ns, so that the timestamps of
+# several processes line up in one trace
+_epoch_ns = 0
+
+# Diagram the enclosing render phase is drawing
+_diagram = None
+
+
+def enable():
+    """Start recording phases in this process (keeps any events already recorded)"""
+    global _events, _epoch_ns
+    if _events is None:
+        _events = []
+        _epoch_ns = time.time_ns() - time.perf_counter_ns()
+
+
+def disable():
+    """Stop recording and return the events recorded"""
+    global _events
+    events, _events = _events or [], None
+    return events
+
+
+def enabled():
+    return _events is not None
+
+
+def events():
+    """The events recorded so far"""
+    return list(_events or [])
+
+
+def add(recorded):
+    """Merge events recorded elsewhere, such as in a worker process"""
+    if _events is not None:
+        _events.extend(recorded)
+
+
+@contextmanager
+def phase(name, **args):
+    """Time the block as phase `name`; yields its args dict for the block to fill in
+
+    Phases inside a `render` phase are attributed to its diagram.
+    """
+    global _diagram
+    if _events is None:
+        yield args
+        return
+    outer = _diagram
+    if 'diagram' in args:
+        _diagram = args['diagram']
+    elif _diagram is not None:
+        args['diagram'] = _diagram
+    start = time.perf_counter_ns()
+    try:
+        yield args
+    finally:
+        end = time.perf_counter_ns()
+        _diagram = outer
+        _events.append({'name': name, 'cat': 'diagrams', 'ph': 'X',
+                        'ts': (_epoch_ns + start) / 1000, 'dur': (end - start) / 1000,
+                        'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args})
+
+
+def render_phase(diagram):
+    """phase('render') for `diagram`, unless this is already inside its render"""
+    if _diagram == diagram:
+        return nullcontext({})
+    return phase('render', diagram=diagram)
+
+
+def self_times(recorded):
+    """Each event's duration minus those of the events nested in it, in µs"""
+    own = [event['dur'] for event in recorded]
+    threads = {}
+    for i, event in enumerate(recorded):
+        threads.setdefault((event['pid'], event['tid']), []).append(i)
+    for indices in threads.values():
+        # Parents start no later than their children and outlast them
+        indices.sort(key=lambda i: (recorded[i]['ts'], -recorded[i]['dur']))
+        stack = []
+        for i in indices:
+            start = recorded[i]['ts']
+            while stack and recorded[stack[-1]]['ts'] + recorded[stack[-1]]['dur'] <= start:
+                stack.pop()
+            if stack:
+                own[stack[-1]] -= recorded[i]['dur']
+            stack.append(i)
+    return own
+
+
+def summarize(recorded):
+    """Per-phase and per-diagram totals of the recorded events
+
+    Times are in milliseconds. Each diagram gets the self time of every
+    phase inside its render, its artist and draw counts, and the bytes it
+    wrote to files.
+    """
+    own = self_times(recorded)
+    phases = {}
+    diagrams = {}
+    for event, self_us in zip(recorded, own):
+        name = event['name']
+        totals = phases.setdefault(name, {'count': 0, 'total_ms': 0.0, 'self_ms': 0.0})
+        totals['count'] += 1
+        totals['total_ms'] += event['dur'] / 1000
+        totals['self_ms'] += self_us / 1000
+        diagram = event['args'].get('diagram')
+        if diagram is None:
+            continue
+        entry = diagrams.setdefault(diagram, {'render_ms': 0.0, 'phases': {},
+                                              'artists': 0, 'draws': 0, 'bytes': 0, 'outputs': []})
+        if name == 'render':
+            entry['render_ms'] += event['dur'] / 1000
+        else:
+            entry['phases'][name] = entry['phases'].get(name, 0.0) + self_us / 1000
+        if name == 'artists':
+            entry['artists'] += event['args'].get('artists', 0)
+        elif name == 'draw':
+            entry['draws'] += 1
+        elif name == 'write':
+            entry['bytes'] += event['args'].get('bytes', 0)
+        elif name == 'save':
+            entry['outputs'].append(event['args'].get('output'))
+
+    for totals in phases.values():
+        totals['total_ms'] = round(totals['total_ms'], 3)
+        totals['self_ms'] = round(totals['self_ms'], 3)
+    for entry in diagrams.values():
+        entry['render_ms'] = round(entry['render_ms'], 3)
+        entry['phases'] = {name: round(ms, 3) for name, ms in sorted(entry['phases'].items(), key=_phase_order)}
+    start = min((event['ts'] for event in recorded), default=0)
+    end = max((event['ts'] + event['dur'] for event in recorded), default=0)
+    return {
+        'version': TRACE_VERSION,
+        'wall_ms': round((end - start) / 1000, 3),
+        'processes': len({event['pid'] for event in recorded}),
+        'totals': {counter: sum(entry[counter] for entry in diagrams.values())
+                   for counter in ('artists', 'draws', 'bytes')},
+        'phases': dict(sorted(phases.items(), key=_phase_order)),
+        'diagrams': diagrams,
+    }
+
+
+def _phase_order(item):
+    name = item[0]
+    return (PHASES.index(name) if name in PHASES else len(PHASES), name)
+
+
+def summary_path(trace_path):
+    """Where the JSON summary of `trace_path` is written"""
+    base, ext = os.path.splitext(trace_path)
+    return f'{base}.summary{ext or ".json"}'
+
+
+def save(path, recorded=None):
+    """Write the Chrome trace to `path` and its summary next to it; returns the summary"""
+    recorded = events() if recorded is None else recorded
+    names = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+              'args': {'name': 'main' if pid == os.getpid() else f'worker {pid}'}}
+             for pid in sorted({event['pid'] for event in recorded})]
+    summary = summarize(recorded)
+    for target, data in ((path, {'traceEvents': names + recorded, 'displayTimeUnit': 'ms'}),
+                         (summary_path(path), summary)):
+        directory = os.path.dirname(os.path.abspath(target))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f'{target}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1 if target != path else None)
+            f.write('\n')
+        os.replace(tmp, target)
+    return summary
+
+
+def load(path):
+    """The complete ("X") events of a Chrome trace written by save()"""
+    with open(path) as f:
+        data = json.load(f)
+    return [event for event in data['traceEvents'] if event.get('ph') == 'X']
+
+
+def print_summary(summary):
+    """Print one row per diagram with the self time of each phase"""
+    columns = [name for name in PHASES if any(name in entry['phases'] for entry in summary['diagrams'].values())]
+    print(f"{'diagram':<18} {'total':>8} " + ' '.join(f'{name:>8}' for name in columns)
+          + f" {'artists':>8} {'draws':>6} {'bytes':>10}")
+    for diagram, entry in summary['diagrams'].items():
+        times = ' '.join(f"{entry['phases'].get(name, 0.0):8.1f}" for name in columns)
+        print(f"{diagram:<18} {entry['render_ms']:8.1f} {times} {entry['artists']:8d} "
+              f"{entry['draws']:6d} {entry['bytes']:10,}")
+    other = {name: totals for name, totals in summary['phases'].items() if name not in PHASES + ['render', 'save']}
+    if other:
+        print('  ' + ', '.join(f"{name} {totals['self_ms']:.1f}" for name, totals in other.items()))
+    print(f"(ms of self time; {summary['wall_ms']:.1f} ms wall in {summary['processes']} process(es))")
+
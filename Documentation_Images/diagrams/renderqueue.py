@@ -0,0 +1,518 @@
+"""
+Shared render queue for spreading a diagram build across machines
+
+`enqueue` turns every (diagram, format, resolution) combination into a job
+in a SQLite database: all the diagrams the package knows about, including
+spec-only ones, times every --variant. Jobs are ordered longest first, by
+the render time the build manifest recorded last, so the slow ones do not
+end up on the last worker. With --incremental only outputs that
+cache.stale_reason says are out of date are queued.
+
+Any number of `work` processes, on any number of build agents, then claim
+jobs from it. A claim is a lease of --lease seconds, held under a random
+token and renewed from a background thread while the job renders. A worker
+that dies or loses its agent stops renewing, its lease expires and the job
+goes back to the others. A job that fails is retried after a growing delay,
+up to --attempts times in all. Workers render in their own (warm)
+interpreter, optimize PNGs like generate_all_diagrams.py, write each output
+to a temporary file, and store the manifest entry for it in the queue.
+Before rendering, a worker checks that its own inputs (sources, library
+versions, fonts) fingerprint the same as the enqueued ones, so an agent
+with another toolchain fails the job instead of publishing different bytes.
+A worker exits once nothing is pending or leased; while other workers still
+hold leases it waits, so it can pick up their jobs if the leases expire.
+
+A worker that lost its lease, because it rendered for longer than --timeout
+or its renewals stalled, drops its output. An output is only moved into
+place, and recorded, under the queue's write lock by the worker that still
+holds the job's lease, so a late worker never overwrites the output of the
+one that took the job over.
+
+`merge` writes the results into the build manifest (diagram_manifest.json
+by default) in one go, exactly as generate_all_diagrams.py would have,
+removes the temporary files of workers that died, and fails while jobs are
+unfinished. `status` shows progress per state and worker.
+
+The queue is a single SQLite file, and the outputs go to --output-dir; both
+must be on storage every agent can reach. SQLite runs in its default
+rollback-journal mode, which works over network file systems with working
+locks, unlike WAL. Leases are compared against each agent's wall clock, so
+--lease must be well above the clock skew between agents.
+
+Usage:
+    python -m diagrams.renderqueue enqueue --queue /shared/q.db --variant png --variant png@96 --variant svg
+    python -m diagrams.renderqueue work --queue /shared/q.db --output-dir /shared/out   # on every agent
+    python -m diagrams.renderqueue status --queue /shared/q.db
+    python -m diagrams.renderqueue merge --queue /shared/q.db --output-dir /shared/out
+"""
+import argparse
+import glob
+import json
+import os
+import secrets
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+
+from . import DIAGRAMS, default_output, unique_variants, variant_type
+from . import cache, pngopt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Build manifest the results are merged into, as generate_all_diagrams.py writes it
+MANIFEST = os.path.join(ROOT, 'diagram_manifest.json')
+
+# Seconds a claim is valid without renewal
+DEFAULT_LEASE = 60.0
+
+# Times a job is tried before it is marked failed
+DEFAULT_ATTEMPTS = 3
+
+# Seconds before the first retry of a failed job; doubled for every further attempt
+RETRY_DELAY = 5.0
+
+# Seconds an idle worker waits between looking for claimable jobs
+POLL_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    output TEXT NOT NULL UNIQUE,
+    diagram TEXT NOT NULL,
+    fmt TEXT NOT NULL,
+    dpi INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0,
+    worker TEXT,
+    token TEXT,
+    lease_expires REAL,
+    started REAL,
+    finished REAL,
+    entry TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, id);
+"""
+
+
+class RenderQueue:
+    """Jobs in a SQLite file, claimed under leases
+
+    Every state change is one transaction; claims take the write lock up
+    front (BEGIN IMMEDIATE) so two workers can never lease the same job.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _transaction(self):
+        return _Transaction(self.db)
+
+    def settings(self):
+        return {row['key']: json.loads(row['value']) for row in self.db.execute('SELECT key, value FROM settings')}
+
+    def enqueue(self, jobs, settings, max_attempts=DEFAULT_ATTEMPTS):
+        """Add or reset jobs; returns how many were (re)queued
+
+        `jobs` are dicts with output, diagram, fmt, dpi, fingerprint, reason
+        and priority. A job already in the queue for the same output is
+        reset unless it is done or running with the same fingerprint.
+        """
+        queued = 0
+        with self._transaction():
+            for key, value in settings.items():
+                self.db.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                                (key, json.dumps(value)))
+            for job in jobs:
+                row = self.db.execute('SELECT status, fingerprint FROM jobs WHERE output = ?',
+                                      (job['output'],)).fetchone()
+                if row and row['fingerprint'] == job['fingerprint'] and row['status'] in ('done', 'leased'):
+                    continue
+                self.db.execute('DELETE FROM jobs WHERE output = ?', (job['output'],))
+                self.db.execute('INSERT INTO jobs (output, diagram, fmt, dpi, fingerprint, reason, priority, '
+                                'max_attempts) VALUES (:output, :diagram, :fmt, :dpi, :fingerprint, :reason, '
+                                ':priority, :max_attempts)', dict(job, max_attempts=max_attempts))
+                queued += 1
+        return queued
+
+    def claim(self, worker, lease):
+        """Lease the next runnable job to `worker`; returns its row, or None
+
+        Runnable are pending jobs past their retry delay and leased jobs
+        whose lease expired. An expired job that has used up its attempts is
+        marked failed instead.
+        """
+        now = time.time()
+        with self._transaction():
+            self.db.execute("UPDATE jobs SET status = 'failed', token = NULL, finished = ?, "
+                            "error = 'lease expired on ' || worker || ' after the last attempt' "
+                            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                            (now, now))
+            row = self.db.execute("SELECT id FROM jobs WHERE (status = 'pending' AND not_before <= ?) "
+                                  "OR (status = 'leased' AND lease_expires < ?) "
+                                  "ORDER BY priority DESC, id LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                return None
+            token = secrets.token_hex(8)
+            self.db.execute("UPDATE jobs SET status = 'leased', attempts = attempts + 1, worker = ?, token = ?, "
+                            "lease_expires = ?, started = ?, error = NULL WHERE id = ?",
+                            (worker, token, now + lease, now, row['id']))
+            return self.db.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+
+    def renew(self, job, lease):
+        """Extend a lease; False once it is no longer held under this claim"""
+        with self._transaction():
+            return self.db.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND token = ? "
+                                   "AND status = 'leased'",
+                                   (time.time() + lease, job['id'], job['token'])).rowcount == 1
+
+    def holds(self, job):
+        return self.db.execute("SELECT 1 FROM jobs WHERE id = ? AND token = ? AND status = 'leased'",
+                               (job['id'], job['token'])).fetchone() is not None
+
+    def complete(self, job, entry, tmp, output):
+        """Move a finished job's output from `tmp` into place and record it
+
+        Both happen under the queue's write lock and only while the job is
+        still leased under this claim, so no other worker can take the job
+        over in between. Returns False, and removes `tmp`, when the lease was
+        lost to another worker meanwhile.
+        """
+        with self._transaction():
+            held = self.db.execute("UPDATE jobs SET status = 'done', token = NULL, finished = ?, entry = ? "
+                                   "WHERE id = ? AND token = ? AND status = 'leased'",
+                                   (time.time(), json.dumps(entry), job['id'], job['token'])).rowcount == 1
+            if held:
+                os.replace(tmp, output)
+        if not held:
+            os.remove(tmp)
+        return held
+
+    def fail(self, job, error):
+        """Record a failed attempt: retry later, or mark the job failed after its last attempt"""
+        now = time.time()
+        final = job['attempts'] >= job['max_attempts']
+        with self._transaction():
+            return self.db.execute("UPDATE jobs SET status = ?, token = NULL, not_before = ?, finished = ?, "
+                                   "error = ? WHERE id = ? AND token = ? AND status = 'leased'",
+                                   ('failed' if final else 'pending',
+                                    now + RETRY_DELAY * 2 ** (job['attempts'] - 1), now, error,
+                                    job['id'], job['token'])).rowcount == 1
+
+    def unfinished(self):
+        """Jobs that are pending or leased (including expired leases)"""
+        return self.db.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+    def jobs(self):
+        return self.db.execute('SELECT * FROM jobs ORDER BY priority DESC, id').fetchall()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, or ROLLBACK on an exception"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, kind, value, tb):
+        self.db.execute('ROLLBACK' if kind else 'COMMIT')
+
+
+def plan_jobs(names, variants, optimize=None, manifest=None, incremental=False, output_dir=ROOT):
+    """One job per (diagram, fmt, dpi), or only the stale ones when `incremental`"""
+    outputs = (manifest or {}).get('outputs', {})
+    jobs = []
+    for name in names:
+        previous = [entry.get('render_seconds', 0) for entry in outputs.values()
+                    if entry.get('diagram') == name and entry.get('status') == 'built']
+        for fmt, dpi in unique_variants(variants):
+            output_file = default_output(name, fmt, dpi)
+            inputs = cache.diagram_inputs(name, dpi, fmt, optimize)
+            reason = 'full rebuild'
+            if incremental:
+                reason = cache.stale_reason(outputs.get(output_file), inputs, os.path.join(output_dir, output_file))
+                if not reason:
+                    continue
+            jobs.append({'output': output_file, 'diagram': name, 'fmt': fmt, 'dpi': dpi,
+                         'fingerprint': cache.fingerprint(inputs), 'reason': reason,
+                         'priority': max(previous, default=0)})
+    return jobs
+
+
+class LeaseLost(Exception):
+    """The job was taken over by another worker while this one ran it"""
+
+
+def run_job(job, output_dir, optimize, held=lambda: True):
+    """Render and optimize one job's output into a temporary file next to its output
+
+    Returns (inputs, temporary file, seconds, summary); RenderQueue.complete
+    moves the file into place. `held` is asked after rendering, so a worker
+    that lost its lease skips the optimization and raises LeaseLost.
+    """
+    import diagrams
+
+    inputs = cache.diagram_inputs(job['diagram'], job['dpi'], job['fmt'], optimize)
+    if cache.fingerprint(inputs) != job['fingerprint']:
+        raise RuntimeError('the inputs here (sources, library versions or fonts) differ from the '
+                           'enqueued ones')
+    tmp = f"{os.path.join(output_dir, job['output'])}.{job['token']}.tmp"
+    start = time.perf_counter()
+    try:
+        diagrams.render_outputs(job['diagram'], [(tmp, job['dpi'], job['fmt'])])
+        seconds = time.perf_counter() - start
+        if not held():
+            raise LeaseLost(job['output'])
+        summary = pngopt.optimize_png(tmp, optimize) if optimize and job['fmt'] == 'png' else None
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return inputs, tmp, seconds, summary
+
+
+def _keep_leased(path, job, lease, timeout, stop, lost):
+    """Renew `job`'s lease until `stop` is set, for at most `timeout` seconds"""
+    renewals = RenderQueue(path)
+    deadline = time.monotonic() + timeout
+    try:
+        while not stop.wait(lease / 3):
+            if time.monotonic() > deadline or not renewals.renew(job, lease):
+                lost.set()
+                return
+    finally:
+        renewals.close()
+
+
+def work(path, output_dir=ROOT, worker=None, lease=DEFAULT_LEASE, timeout=None, max_jobs=None):
+    """Claim and run jobs until the queue is drained; returns (done, failed) counts for this worker
+
+    A job that renders for longer than `timeout` seconds stops being renewed,
+    so other workers can take it over once its lease expires.
+    """
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    queue = RenderQueue(path)
+    optimize = queue.settings().get('optimize')
+    os.makedirs(output_dir, exist_ok=True)
+    done = failed = 0
+    try:
+        while max_jobs is None or done + failed < max_jobs:
+            job = queue.claim(worker, lease)
+            if job is None:
+                if not queue.unfinished():
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+            print(f"{worker}: {job['output']} (attempt {job['attempts']}/{job['max_attempts']})", flush=True)
+            stop, lost = threading.Event(), threading.Event()
+            renewer = threading.Thread(target=_keep_leased, daemon=True,
+                                       args=(path, job, lease, timeout or float('inf'), stop, lost))
+            renewer.start()
+            try:
+                inputs, tmp, seconds, summary = run_job(
+                    job, output_dir, optimize, held=lambda: not lost.is_set() or queue.holds(job))
+            except LeaseLost:
+                print(f"{worker}: lost the lease on {job['output']}; dropped the output", flush=True)
+                continue
+            except Exception as e:
+                error = traceback.format_exc().strip()
+                print(f"{worker}: {job['output']} failed: {e}", file=sys.stderr, flush=True)
+                queue.fail(job, error)
+                failed += 1
+                continue
+            finally:
+                stop.set()
+                renewer.join()
+            entry = cache.output_entry(job['diagram'], inputs, tmp, seconds, summary)
+            entry['reason'] = job['reason']
+            entry['worker'] = worker
+            if queue.complete(job, entry, tmp, os.path.join(output_dir, job['output'])):
+                done += 1
+                print(f"{worker}: {job['output']} done in {seconds:.2f}s", flush=True)
+            else:
+                print(f"{worker}: lost the lease on {job['output']}; dropped the output", flush=True)
+    finally:
+        queue.close()
+    return done, failed
+
+
+def merge(path, manifest_path=MANIFEST, output_dir=ROOT):
+    """Write the queue's results into the build manifest; returns the manifest's last_run
+
+    Raises RuntimeError while jobs are unfinished, or when an output a job
+    recorded is missing or differs from what it recorded.
+    """
+    queue = RenderQueue(path)
+    try:
+        settings = queue.settings()
+        jobs = queue.jobs()
+        unfinished = queue.unfinished()
+    finally:
+        queue.close()
+    if unfinished:
+        raise RuntimeError(f"{unfinished} of {len(jobs)} job(s) are not finished yet")
+
+    manifest = cache.load_manifest(manifest_path)
+    by_diagram = {}
+    for job in jobs:
+        if job['status'] == 'done':
+            entry = json.loads(job['entry'])
+            output = os.path.join(output_dir, job['output'])
+            if not os.path.exists(output) or cache.file_sha256(output) != entry['sha256']:
+                raise RuntimeError(f"{output} is missing or differs from what {entry['worker']} recorded")
+        else:
+            error = job['error'].splitlines()[-1] if job['error'] else 'failed'
+            entry = {'diagram': job['diagram'], 'status': 'failed', 'reason': job['reason'], 'error': error}
+        manifest['outputs'][job['output']] = entry
+        # Left behind by workers that died mid-render
+        for leftover in glob.glob(f"{glob.escape(os.path.join(output_dir, job['output']))}.*.tmp"):
+            os.remove(leftover)
+        by_diagram.setdefault(job['diagram'], []).append(job)
+
+    started = [job['started'] for job in jobs if job['started']]
+    finished = [job['finished'] for job in jobs if job['finished']]
+    entries = [json.loads(job['entry']) for job in jobs if job['status'] == 'done']
+    optimized = [entry['optimize'] for entry in entries if 'optimize' in entry]
+    manifest['last_run'] = {
+        'incremental': settings.get('incremental', False),
+        'seconds': round(max(finished) - min(started), 4) if started and finished else 0.0,
+        'built': [name for name, group in by_diagram.items() if all(job['status'] == 'done' for job in group)],
+        'skipped': [name for name in DIAGRAMS if name not in by_diagram],
+        'failed': [name for name, group in by_diagram.items() if any(job['status'] != 'done' for job in group)],
+        'bytes_saved': sum(summary['bytes_saved'] for summary in optimized),
+        'optimize_seconds': round(sum(summary['encode_seconds'] for summary in optimized), 4),
+        'queue': os.path.abspath(path),
+        'workers': sorted({entry['worker'] for entry in entries}),
+    }
+    cache.save_manifest(manifest_path, manifest)
+    return manifest['last_run']
+
+
+def print_status(path):
+    """Print job counts per state and per worker, and the failures"""
+    queue = RenderQueue(path)
+    try:
+        jobs = queue.jobs()
+    finally:
+        queue.close()
+    now = time.time()
+    states = {}
+    workers = {}
+    for job in jobs:
+        state = job['status']
+        if state == 'leased' and job['lease_expires'] < now:
+            state = 'expired'
+        states[state] = states.get(state, 0) + 1
+        if job['status'] == 'done':
+            entry = json.loads(job['entry'])
+            count, seconds = workers.get(entry['worker'], (0, 0.0))
+            workers[entry['worker']] = count + 1, seconds + entry['render_seconds']
+    print(f"{len(jobs)} job(s): " + ', '.join(f"{states.get(state, 0)} {state}" for state in
+                                              ('pending', 'leased', 'expired', 'done', 'failed')))
+    for worker, (count, seconds) in sorted(workers.items()):
+        print(f"  {worker:<32} {count:4d} done  {seconds:8.2f}s rendering")
+    for job in jobs:
+        if job['status'] == 'leased':
+            left = job['lease_expires'] - now
+            print(f"  leased   {job['output']} by {job['worker']} "
+                  f"({'expired' if left < 0 else f'{left:.0f}s left'}, attempt {job['attempts']})")
+        elif job['status'] == 'failed' or job['error']:
+            error = job['error'].splitlines()[-1] if job['error'] else ''
+            print(f"  {job['status']:<8} {job['output']} after {job['attempts']} attempt(s): {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.renderqueue',
+                                     description='Share diagram renders between workers through a queue.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_cmd = commands.add_parser('enqueue', help='queue one job per diagram and output variant')
+    enqueue_cmd.add_argument('names', nargs='*', metavar='name',
+                             help=f"diagrams to queue (default: all of {', '.join(DIAGRAMS)})")
+    enqueue_cmd.add_argument('--variant', dest='variants', action='append', type=variant_type, metavar='FMT[@DPI]',
+                             help='output to build per diagram, e.g. png@96 or svg; repeat for several '
+                                  '(default: png)')
+    enqueue_cmd.add_argument('--optimize', choices=list(pngopt.PRESETS) + ['none'], default='none',
+                             help='lossless PNG post-compression preset, or none (default: none)')
+    enqueue_cmd.add_argument('--incremental', '-i', action='store_true',
+                             help='only queue outputs whose inputs changed since the manifest was written')
+    enqueue_cmd.add_argument('--attempts', type=int, default=DEFAULT_ATTEMPTS,
+                             help=f'tries per job before it is marked failed (default: {DEFAULT_ATTEMPTS})')
+
+    work_cmd = commands.add_parser('work', help='claim and render jobs until the queue is drained')
+    work_cmd.add_argument('--worker', help='name recorded for this worker (default: HOST:PID)')
+    work_cmd.add_argument('--lease', type=float, default=DEFAULT_LEASE,
+                          help=f'seconds a claim lasts without renewal (default: {DEFAULT_LEASE:g})')
+    work_cmd.add_argument('--timeout', type=float,
+                          help='seconds after which a render stops renewing its lease (default: none)')
+    work_cmd.add_argument('--max-jobs', type=int, help='exit after this many jobs')
+
+    commands.add_parser('status', help='show progress per state and worker')
+    merge_cmd = commands.add_parser('merge', help='write the results into the build manifest')
+    for command, verb in ((enqueue_cmd, 'compare with for --incremental'), (merge_cmd, 'update')):
+        command.add_argument('--manifest', default=MANIFEST,
+                             help=f'build manifest to {verb} (default: diagram_manifest.json)')
+
+    for command in commands.choices.values():
+        command.add_argument('--queue', required=True, help='SQLite file shared by all workers')
+        if command in (enqueue_cmd, work_cmd, merge_cmd):
+            command.add_argument('--output-dir', default=ROOT,
+                                 help='directory the outputs are written to, shared by all workers '
+                                      '(default: Documentation_Images)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'enqueue':
+        names = args.names or list(DIAGRAMS)
+        unknown = [name for name in names if name not in DIAGRAMS]
+        if unknown:
+            parser.error(f"unknown diagram(s): {', '.join(unknown)}")
+        optimize = None if args.optimize == 'none' else args.optimize
+        manifest = cache.load_manifest(args.manifest)
+        jobs = plan_jobs(names, args.variants or [('png', 300)], optimize, manifest, args.incremental,
+                         args.output_dir)
+        queue = RenderQueue(args.queue)
+        try:
+            queued = queue.enqueue(jobs, {'optimize': optimize, 'incremental': args.incremental}, args.attempts)
+        finally:
+            queue.close()
+        print(f"Queued {queued} job(s) in {args.queue} ({len(jobs) - queued} already queued or done)")
+        return 0
+
+    if args.command == 'work':
+        done, failed = work(args.queue, args.output_dir, args.worker, args.lease, args.timeout, args.max_jobs)
+        print(f"{done} job(s) done, {failed} failed attempt(s)")
+        return 0
+
+    if args.command == 'status':
+        print_status(args.queue)
+        return 0
+
+    try:
+        run = merge(args.queue, args.manifest, args.output_dir)
+    except RuntimeError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(f"Merged into {args.manifest}: {len(run['built'])} built, {len(run['failed'])} failed, "
+          f"{len(run['skipped'])} not queued, by {len(run['workers'])} worker(s) in {run['seconds']:.2f}s")
+    return 1 if run['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
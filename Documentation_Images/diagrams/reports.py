@@ -0,0 +1,538 @@
+"""
+Dashboard charts from the API's transcript, GPA and financial CSV exports
+
+Reads the CSVs ReportService writes (`/api/reports/transcript/csv` and
+`/api/reports/gpa/{termId}/csv`, one student's or many concatenated) and
+flat income and expense exports with the columns of IncomeDTO and
+ExpenseDTO (Date, Amount, and Category or CategoryId; `--categories` maps
+ids to names). From them it keeps running totals: GPA and credit hours by
+term, credit hours by course status, the grade distribution, and expenses
+by category and month against income by month. A dashboard of charts is
+drawn from the totals.
+
+Files are streamed in chunks of CHUNK_ROWS rows (`.gz` files too). Each
+chunk's columns become NumPy arrays: grades are mapped to points through
+their unique values, amounts are converted in one go, and the sums are
+added into the totals with bincount and add.at. Nothing else is kept per
+row, so memory stays flat however large the export is; it grows only with
+the number of terms, categories and months.
+
+Usage:
+    python -m diagrams.reports --transcript transcript.csv -o report_dashboard.png
+    python -m diagrams.reports --transcript exports/*.csv.gz --expenses expenses.csv \\
+        --income income.csv --categories categories.csv -o build/dashboard.png --json
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+
+from . import fonts, reproducible
+from .common import REPORT_COLORS
+from .phases import phase
+
+# Rows read and aggregated at a time
+CHUNK_ROWS = 65536
+
+# Letter grade -> grade points, as ReportService.ConvertLetterToPoints maps them
+GRADE_POINTS = {'A+': 4.0, 'A': 4.0, 'A-': 3.7, 'B+': 3.3, 'B': 3.0, 'B-': 2.7, 'C+': 2.3, 'C': 2.0,
+                'C-': 1.7, 'D+': 1.3, 'D': 1.0, 'D-': 0.7, 'F': 0.0}
+
+# Grades in the order the distribution chart shows them
+GRADES = list(GRADE_POINTS)
+
+# Column headers of the course tables in the two report formats
+TRANSCRIPT_HEADER = ['Course', 'Status', 'Credits', 'Grade', 'Percentage', 'Instructor', 'Email']
+GPA_HEADER = ['Course Title', 'Credit Hours', 'Letter Grade', 'Grade Points']
+
+# Expense categories charted by name; the rest are summed as "Other"
+TOP_CATEGORIES = 8
+
+# Date formats accepted in financial exports, tried in order
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%d.%m.%Y']
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8-sig', newline='')
+    return open(path, encoding='utf-8-sig', newline='')
+
+
+def _chunks(rows, size):
+    """Lists of up to `size` rows"""
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _grow(array, shape):
+    """`array` zero-padded to at least `shape`"""
+    pad = [(0, max(0, want - have)) for have, want in zip(array.shape, shape)]
+    return np.pad(array, pad) if any(after for _, after in pad) else array
+
+
+def _numbers(values, source):
+    """Float array from CSV strings; '$', ',' and '%' are ignored and blanks are 0"""
+    array = np.char.strip(np.char.replace(np.char.replace(np.asarray(values, dtype=str), '$', ''), ',', ''))
+    array = np.char.rstrip(array, '%')
+    array[array == ''] = '0'
+    try:
+        return array.astype(np.float64)
+    except ValueError as e:
+        raise ValueError(f"{source}: {e}") from None
+
+
+class TranscriptTotals:
+    """Running totals over the course rows of transcript and GPA exports"""
+
+    def __init__(self):
+        self.terms = []          # titles, in order of first appearance
+        self.starts = []         # earliest start date of each term (ISO), '' if unknown
+        self._term_index = {}
+        self.statuses = []
+        self._status_index = {}
+        self.quality_points = np.zeros(0)   # grade points x credits of graded courses, per term
+        self.graded_credits = np.zeros(0)
+        self.credits = np.zeros((0, 0))     # credits per term and status
+        self.courses = np.zeros(0, dtype=np.int64)
+        self.grade_counts = np.zeros(len(GRADES), dtype=np.int64)
+        self.rows = 0
+
+    def term(self, title, start=''):
+        """Index of a term, added on first sight; keeps the earliest start seen"""
+        index = self._term_index.get(title)
+        if index is None:
+            index = self._term_index[title] = len(self.terms)
+            self.terms.append(title)
+            self.starts.append(start)
+        elif start and (not self.starts[index] or start < self.starts[index]):
+            self.starts[index] = start
+        return index
+
+    def _status(self, name):
+        index = self._status_index.get(name)
+        if index is None:
+            index = self._status_index[name] = len(self.statuses)
+            self.statuses.append(name)
+        return index
+
+    def add(self, terms, credits, grades, statuses, source):
+        """Add one chunk of course rows (parallel lists of term index and strings)"""
+        if not terms:
+            return
+        terms = np.asarray(terms, dtype=np.int64)
+        credits = _numbers(credits, source)
+        unique_grades, grade_of = np.unique(np.char.upper(np.char.strip(np.asarray(grades, dtype=str))),
+                                            return_inverse=True)
+        points = np.array([GRADE_POINTS.get(grade, np.nan) for grade in unique_grades])[grade_of]
+        graded = ~np.isnan(points)
+        unique_statuses, status_of = np.unique(np.asarray(statuses, dtype=str), return_inverse=True)
+        status_ids = np.array([self._status(status) for status in unique_statuses.tolist()])[status_of]
+
+        n_terms, n_statuses = len(self.terms), len(self.statuses)
+        self.quality_points = _grow(self.quality_points, (n_terms,))
+        self.graded_credits = _grow(self.graded_credits, (n_terms,))
+        self.courses = _grow(self.courses, (n_terms,))
+        self.credits = _grow(self.credits, (n_terms, n_statuses))
+        self.quality_points += np.bincount(terms[graded], weights=points[graded] * credits[graded],
+                                           minlength=n_terms)
+        self.graded_credits += np.bincount(terms[graded], weights=credits[graded], minlength=n_terms)
+        self.courses += np.bincount(terms, minlength=n_terms)
+        np.add.at(self.credits, (terms, status_ids), credits)
+        grade_ids = np.array([GRADES.index(grade) if grade in GRADE_POINTS else -1
+                              for grade in unique_grades])[grade_of]
+        self.grade_counts += np.bincount(grade_ids[grade_ids >= 0], minlength=len(GRADES))
+        self.rows += len(terms)
+
+    def order(self):
+        """Term indices by start date, terms without one last in order of appearance"""
+        return sorted(range(len(self.terms)), key=lambda i: (self.starts[i] == '', self.starts[i], i))
+
+    def summary(self):
+        order = self.order()
+        gpa = np.divide(self.quality_points, self.graded_credits, out=np.full(len(self.terms), np.nan),
+                        where=self.graded_credits > 0)
+        cumulative_points = np.cumsum(self.quality_points[order]) if order else np.zeros(0)
+        cumulative_credits = np.cumsum(self.graded_credits[order]) if order else np.zeros(0)
+        cumulative = np.divide(cumulative_points, cumulative_credits, out=np.full(len(order), np.nan),
+                               where=cumulative_credits > 0)
+        return {
+            'rows': int(self.rows),
+            'terms': [{
+                'term': self.terms[i],
+                'start': self.starts[i] or None,
+                'courses': int(self.courses[i]),
+                'gpa': None if math.isnan(gpa[i]) else round(float(gpa[i]), 3),
+                'cumulative_gpa': None if math.isnan(cumulative[k]) else round(float(cumulative[k]), 3),
+                'credits': {status: float(self.credits[i, j]) for j, status in enumerate(self.statuses)
+                            if self.credits[i, j]},
+            } for k, i in enumerate(order)],
+            'grades': {grade: int(count) for grade, count in zip(GRADES, self.grade_counts) if count},
+        }
+
+
+def _term_start(row):
+    """ISO start date from a transcript "Start: Aug 26, 2024 | End: ..." or GPA "Term Dates:" line"""
+    text = ','.join(row)
+    try:
+        if text.startswith('Start: '):
+            return datetime.strptime(text[7:].split('|')[0].strip(), '%b %d, %Y').date().isoformat()
+        if text.startswith('Term Dates: '):
+            return datetime.strptime(text[12:22], '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        pass
+    return ''
+
+
+def read_transcripts(paths, totals=None, chunk_rows=CHUNK_ROWS):
+    """Add the course rows of transcript and GPA CSV exports to `totals`
+
+    Both formats are recognized from their "TERM:"/"Term:" lines and course
+    table headers, so files of either kind, or several reports concatenated
+    into one file, can be mixed. Returns the totals.
+    """
+    totals = TranscriptTotals() if totals is None else totals
+    for path in paths:
+        with _open(path) as f, phase('read', file=os.path.basename(path)):
+            term = None
+            columns = None   # (credits, grade, status) positions in the current course table
+            for chunk in _chunks(csv.reader(f), chunk_rows):
+                terms, credits, grades, statuses = [], [], [], []
+                for row in chunk:
+                    if not row or not any(row):
+                        columns = None
+                        continue
+                    first = row[0]
+                    if columns is not None:
+                        if len(row) >= 3 and first != 'Total Credit Hours':
+                            terms.append(term)
+                            credits.append(row[columns[0]])
+                            grade = row[columns[1]]
+                            grades.append(grade)
+                            statuses.append(row[columns[2]] if columns[2] is not None
+                                            else 'Completed' if grade else 'In Progress')
+                            continue
+                        columns = None
+                    if first.startswith(('TERM: ', 'Term: ')) and len(row) == 1:
+                        term = totals.term(first[6:].strip())
+                    elif first.startswith(('Start: ', 'Term Dates: ')) and term is not None:
+                        totals.term(totals.terms[term], _term_start(row))
+                    elif row == TRANSCRIPT_HEADER or row == GPA_HEADER:
+                        if term is None:
+                            term = totals.term('(no term)')
+                        columns = (2, 3, 1) if row == TRANSCRIPT_HEADER else (1, 2, None)
+                totals.add(terms, credits, grades, statuses, path)
+    return totals
+
+
+class FinanceTotals:
+    """Running totals of expenses by category and month, and income by month"""
+
+    def __init__(self, category_names=None):
+        self.category_names = category_names or {}
+        self.categories = []
+        self._category_index = {}
+        self.months = []
+        self._month_index = {}
+        self.expenses = np.zeros((0, 0))   # amount per category and month
+        self.income = np.zeros(0)          # amount per month
+        self.expense_rows = 0
+        self.income_rows = 0
+
+    def _index(self, values, names, index):
+        ids = []
+        for value in values:
+            position = index.get(value)
+            if position is None:
+                position = index[value] = len(names)
+                names.append(value)
+            ids.append(position)
+        return np.array(ids, dtype=np.int64)
+
+    def _months(self, dates, source):
+        """Month index of every date, parsing each distinct date once"""
+        unique_dates, date_of = np.unique(np.char.strip(np.asarray(dates, dtype=str)), return_inverse=True)
+        keys = []
+        for text in unique_dates.tolist():
+            for fmt in DATE_FORMATS:
+                try:
+                    keys.append(datetime.strptime(text[:10], fmt).strftime('%Y-%m'))
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"{source}: unrecognized date {text!r}")
+        return self._index(keys, self.months, self._month_index)[date_of]
+
+    def add_expenses(self, dates, amounts, categories, source):
+        if not dates:
+            return
+        months = self._months(dates, source)
+        unique_categories, category_of = np.unique(np.char.strip(np.asarray(categories, dtype=str)),
+                                                   return_inverse=True)
+        names = [self.category_names.get(value, value) or 'Uncategorized' for value in unique_categories.tolist()]
+        categories = self._index(names, self.categories, self._category_index)[category_of]
+        self.expenses = _grow(self.expenses, (len(self.categories), len(self.months)))
+        np.add.at(self.expenses, (categories, months), _numbers(amounts, source))
+        self.expense_rows += len(dates)
+
+    def add_income(self, dates, amounts, source):
+        if not dates:
+            return
+        months = self._months(dates, source)
+        self.income = _grow(self.income, (len(self.months),))
+        self.income += np.bincount(months, weights=_numbers(amounts, source), minlength=len(self.months))
+        self.income_rows += len(dates)
+
+    def summary(self):
+        order = np.argsort(self.months, kind='stable') if self.months else np.zeros(0, dtype=np.int64)
+        expenses = _grow(self.expenses, (len(self.categories), len(self.months)))
+        income = _grow(self.income, (len(self.months),))
+        by_category = expenses.sum(axis=1)
+        return {
+            'expense_rows': int(self.expense_rows),
+            'income_rows': int(self.income_rows),
+            'months': [{'month': self.months[i], 'income': round(float(income[i]), 2),
+                        'expenses': round(float(expenses[:, i].sum()), 2)} for i in order],
+            'categories': {self.categories[i]: round(float(by_category[i]), 2)
+                           for i in np.argsort(-by_category, kind='stable')},
+        }
+
+
+def read_categories(path):
+    """Category id -> name from a CSV with Id and Name columns"""
+    with _open(path) as f:
+        reader = csv.reader(f)
+        header = [column.strip().lower() for column in next(reader, [])]
+        try:
+            id_column, name_column = header.index('id'), header.index('name')
+        except ValueError:
+            raise ValueError(f"{path}: needs Id and Name columns") from None
+        return {row[id_column].strip(): row[name_column].strip() for row in reader if len(row) > name_column}
+
+
+def _columns(header, path, *wanted):
+    """Positions of the first header matching each group of alternative names"""
+    header = [column.strip().lower() for column in header]
+    positions = []
+    for names in wanted:
+        position = next((header.index(name) for name in names if name in header), None)
+        if position is None:
+            raise ValueError(f"{path}: no {' or '.join(names)} column (header: {', '.join(header)})")
+        positions.append(position)
+    return positions
+
+
+def read_finances(expense_paths=(), income_paths=(), totals=None, chunk_rows=CHUNK_ROWS):
+    """Add flat expense and income exports to `totals`; returns the totals"""
+    totals = FinanceTotals() if totals is None else totals
+    for paths, kind in ((expense_paths, 'expenses'), (income_paths, 'income')):
+        for path in paths:
+            with _open(path) as f, phase('read', file=os.path.basename(path)):
+                reader = csv.reader(f)
+                header = next(reader, [])
+                if kind == 'expenses':
+                    date, amount, category = _columns(header, path, ['date'], ['amount'],
+                                                      ['category', 'categoryname', 'categoryid'])
+                else:
+                    date, amount = _columns(header, path, ['date'], ['amount'])
+                width = max(date, amount, category if kind == 'expenses' else 0) + 1
+                for chunk in _chunks(reader, chunk_rows):
+                    rows = [row for row in chunk if len(row) >= width]
+                    dates = [row[date] for row in rows]
+                    amounts = [row[amount] for row in rows]
+                    if kind == 'expenses':
+                        totals.add_expenses(dates, amounts, [row[category] for row in rows], path)
+                    else:
+                        totals.add_income(dates, amounts, path)
+    return totals
+
+
+def _style(ax, title, colors):
+    ax.set_title(title, fontsize=12, fontweight='bold', color=colors['text'], loc='left')
+    ax.grid(axis='y', color=colors['grid'], linewidth=0.8)
+    ax.set_axisbelow(True)
+    for side in ('top', 'right'):
+        ax.spines[side].set_visible(False)
+    ax.tick_params(colors=colors['text'], labelsize=9)
+
+
+def _tick_labels(ax, labels, rotate):
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=45 if rotate else 0, ha='right' if rotate else 'center')
+
+
+def _gpa_chart(ax, summary, colors):
+    terms = summary['terms']
+    names = [term['term'] for term in terms]
+    gpa = [term['gpa'] if term['gpa'] is not None else np.nan for term in terms]
+    cumulative = [term['cumulative_gpa'] if term['cumulative_gpa'] is not None else np.nan for term in terms]
+    ax.bar(range(len(names)), gpa, color=colors['gpa'], label='Term GPA')
+    ax.plot(range(len(names)), cumulative, color=colors['cumulative'], marker='o', linewidth=2,
+            label='Cumulative GPA')
+    ax.set_ylim(0, 4.2)
+    _tick_labels(ax, names, len(names) > 4)
+    ax.legend(fontsize=8, frameon=False, loc='lower right')
+    _style(ax, 'GPA by term', colors)
+
+
+def _credits_chart(ax, summary, colors):
+    terms = summary['terms']
+    statuses = list(dict.fromkeys(status for term in terms for status in term['credits']))
+    bottom = np.zeros(len(terms))
+    for color, status in zip(colors['series'], statuses):
+        values = np.array([term['credits'].get(status, 0.0) for term in terms])
+        ax.bar(range(len(terms)), values, bottom=bottom, color=color, label=status)
+        bottom += values
+    _tick_labels(ax, [term['term'] for term in terms], len(terms) > 4)
+    ax.legend(fontsize=8, frameon=False)
+    _style(ax, 'Credit hours by term', colors)
+
+
+def _grades_chart(ax, summary, colors):
+    grades = [grade for grade in GRADES if grade in summary['grades']]
+    ax.bar(range(len(grades)), [summary['grades'][grade] for grade in grades], color=colors['gpa'])
+    _tick_labels(ax, grades, False)
+    _style(ax, 'Grade distribution (courses)', colors)
+
+
+def _categories(summary):
+    """Top categories by total, then "Other" for the rest"""
+    names = list(summary['categories'])
+    return names[:TOP_CATEGORIES], names[TOP_CATEGORIES:]
+
+
+def _category_chart(ax, summary, colors):
+    top, rest = _categories(summary)
+    labels = top + (['Other'] if rest else [])
+    values = [summary['categories'][name] for name in top]
+    if rest:
+        values.append(sum(summary['categories'][name] for name in rest))
+    positions = np.arange(len(labels))[::-1]
+    ax.barh(positions, values,
+            color=colors['series'][:len(top)] + ([colors['series'][-1]] if rest else []))
+    ax.set_yticks(positions)
+    ax.set_yticklabels(labels)
+    ax.grid(axis='x', color=colors['grid'], linewidth=0.8)
+    _style(ax, 'Expenses by category', colors)
+    ax.grid(axis='y', visible=False)
+
+
+def _monthly_chart(ax, finance, summary, colors):
+    months = sorted(finance.months)
+    order = [finance._month_index[month] for month in months]
+    expenses = _grow(finance.expenses, (len(finance.categories), len(finance.months)))[:, order]
+    top, rest = _categories(summary)
+    bottom = np.zeros(len(months))
+    for color, name in zip(colors['series'], top):
+        values = expenses[finance._category_index[name]]
+        ax.bar(range(len(months)), values, bottom=bottom, color=color, label=name)
+        bottom += values
+    if rest:
+        values = expenses[[finance._category_index[name] for name in rest]].sum(axis=0)
+        ax.bar(range(len(months)), values, bottom=bottom, color=colors['series'][-1], label='Other')
+    if finance.income_rows:
+        income = _grow(finance.income, (len(finance.months),))[order]
+        ax.plot(range(len(months)), income, color=colors['income'], marker='o', markeredgecolor='white',
+                linewidth=2.5, label='Income')
+    step = max(1, len(months) // 12)
+    ax.set_xticks(range(0, len(months), step))
+    ax.set_xticklabels(months[::step], rotation=45, ha='right')
+    ax.legend(fontsize=7, frameon=False, ncol=2)
+    _style(ax, 'Expenses by month' + (' vs. income' if finance.income_rows else ''), colors)
+
+
+def render_dashboard(transcript=None, finance=None, output='report_dashboard.png', dpi=150, fmt=None,
+                     title='Student Progress Tracker - Reports'):
+    """Draw the charts the totals support into one figure and save it to `output`"""
+    with phase('import'):
+        fonts.install()
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+    colors = REPORT_COLORS
+    panels = []
+    if transcript is not None and transcript.rows:
+        summary = transcript.summary()
+        panels += [lambda ax, s=summary: _gpa_chart(ax, s, colors),
+                   lambda ax, s=summary: _credits_chart(ax, s, colors),
+                   lambda ax, s=summary: _grades_chart(ax, s, colors)]
+    if finance is not None and (finance.expense_rows or finance.income_rows):
+        summary = finance.summary()
+        if finance.expense_rows:
+            panels.append(lambda ax, s=summary: _category_chart(ax, s, colors))
+        panels.append(lambda ax, s=summary: _monthly_chart(ax, finance, s, colors))
+    if not panels:
+        raise ValueError("no course, expense or income rows to chart")
+
+    columns = min(3, len(panels))
+    rows = math.ceil(len(panels) / columns)
+    with reproducible.pinned():
+        with phase('artists'):
+            fig = Figure(figsize=(6 * columns, 4.5 * rows + 0.6), dpi=dpi)
+            FigureCanvasAgg(fig)
+            for i, draw in enumerate(panels):
+                draw(fig.add_subplot(rows, columns, i + 1))
+            fig.suptitle(title, fontsize=16, fontweight='bold', color=colors['text'])
+        with phase('layout'):
+            fig.tight_layout(rect=(0, 0, 1, 0.97))
+        with phase('save', output=os.fspath(output), dpi=dpi):
+            fmt = fmt or os.path.splitext(os.fspath(output))[1].lstrip('.') or 'png'
+            fig.savefig(output, dpi=dpi, format=fmt, facecolor='white',
+                        metadata=reproducible.metadata(fmt))
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.reports',
+                                     description='Chart transcript, GPA and financial CSV exports.')
+    parser.add_argument('--transcript', nargs='+', default=[], metavar='CSV',
+                        help='transcript or GPA report exports (.csv or .csv.gz)')
+    parser.add_argument('--expenses', nargs='+', default=[], metavar='CSV',
+                        help='expense exports with Date, Amount and Category or CategoryId columns')
+    parser.add_argument('--income', nargs='+', default=[], metavar='CSV',
+                        help='income exports with Date and Amount columns')
+    parser.add_argument('--categories', metavar='CSV', help='Id,Name map for CategoryId columns')
+    parser.add_argument('-o', '--output', default='report_dashboard.png', help='chart file to write')
+    parser.add_argument('--dpi', type=int, default=150, help='output resolution (default: 150)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS,
+                        help=f'rows aggregated at a time (default: {CHUNK_ROWS})')
+    parser.add_argument('--json', action='store_true', help='also print the aggregated totals as JSON')
+    args = parser.parse_args(argv)
+    if not (args.transcript or args.expenses or args.income):
+        parser.error('give at least one of --transcript, --expenses or --income')
+
+    start = time.perf_counter()
+    try:
+        transcript = read_transcripts(args.transcript, chunk_rows=args.chunk_rows) if args.transcript else None
+        names = read_categories(args.categories) if args.categories else None
+        finance = (read_finances(args.expenses, args.income, FinanceTotals(names), args.chunk_rows)
+                   if args.expenses or args.income else None)
+        read_seconds = time.perf_counter() - start
+        render_dashboard(transcript, finance, args.output, args.dpi)
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    rows = (transcript.rows if transcript else 0) + (finance.expense_rows + finance.income_rows if finance else 0)
+    if args.json:
+        print(json.dumps({'transcript': transcript.summary() if transcript else None,
+                          'finance': finance.summary() if finance else None}, indent=2))
+    print(f"{rows:,} rows aggregated in {read_seconds:.2f}s; dashboard saved as {args.output} "
+          f"({time.perf_counter() - start:.2f}s total)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""
+Byte-reproducible diagram outputs
+
+Rendering the same diagram twice should give the same file, byte for byte,
+so that content-addressed caches, CDN caches and git only see a change when
+the picture changes. Left alone, matplotlib does not guarantee that:
+
+- PNGs carry a `Software` text chunk with the matplotlib version
+- PDFs carry `Creator`, `Producer` and a `CreationDate` of the moment they
+  were saved; PostScript a `CreationDate` too
+- SVG element ids are salted with a random UUID, and the file is dated
+- a matplotlibrc or style on the rendering machine changes fonts, line
+  widths and anything else it sets
+- a font family resolves to whatever font the machine has first
+
+While a diagram is rendered (see draw.render_scene_outputs), `pinned()`
+resets every rcParam to matplotlib's built-in defaults, whatever the local
+matplotlibrc says, then applies RC: the bundled DejaVu Sans, and a fixed
+SVG hash salt. `metadata(fmt)` gives savefig the metadata that drops the
+version and date stamps. SOURCE_DATE_EPOCH is pinned while saving, which
+fixes the PostScript date. The fonts are checked to resolve to the files
+bundled with matplotlib, not to system copies.
+
+What is left then are the inputs the build manifest already fingerprints:
+the sources, the library versions (including zlib, which pngopt compresses
+with) and the fonts. Identical inputs give identical bytes, and `verify`
+proves it: it renders the diagrams in several fresh interpreters that each
+run in a different environment (fresh matplotlib config and font cache, a
+hostile matplotlibrc, another time zone, locale, hash seed, working
+directory and SOURCE_DATE_EPOCH), then compares the files. With
+`--committed` it also compares them with the PNGs in the repository.
+
+Usage:
+    python -m diagrams.reproducible env                 # what the bytes depend on here
+    python -m diagrams.reproducible verify              # every diagram: png, svg and pdf
+    python -m diagrams.reproducible verify erd --variant png@96 --runs 3
+    python -m diagrams.reproducible verify --committed  # and match the committed PNGs
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from . import DEFAULT_DPI, DIAGRAMS, default_output, fonts, phases, variant_type
+from .cache import file_sha256, fonts_digest, library_versions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# rcParams applied on top of matplotlib's built-in defaults
+RC = {
+    'font.family': ['sans-serif'],
+    'font.sans-serif': ['DejaVu Sans'],
+    'mathtext.fontset': 'dejavusans',
+    'svg.hashsalt': 'student-progress-tracker-diagrams',
+}
+
+# savefig metadata per format; None drops an entry matplotlib would add.
+# PostScript cannot drop its Creator, so it gets one without a version.
+METADATA = {
+    'png': {'Software': None},
+    'pdf': {'Creator': None, 'Producer': None, 'CreationDate': None},
+    'svg': {'Creator': None, 'Date': None},
+    'svgz': {'Creator': None, 'Date': None},
+    'ps': {'Creator': 'Matplotlib'},
+    'eps': {'Creator': 'Matplotlib'},
+}
+
+# Timestamp written where a format insists on one (PostScript CreationDate)
+SOURCE_DATE_EPOCH = '0'
+
+# Font variants the diagrams draw with, as (weight, style)
+FONT_VARIANTS = [('normal', 'normal'), ('bold', 'normal'), ('normal', 'italic'), ('bold', 'italic')]
+
+# Outputs verify compares by default
+DEFAULT_VARIANTS = [('png', DEFAULT_DPI), ('svg', DEFAULT_DPI), ('pdf', DEFAULT_DPI)]
+
+# Settings a machine might have that must not reach the outputs; written as
+# the matplotlibrc of one verify run
+HOSTILE_RC = """\
+font.family: serif
+font.serif: DejaVu Serif
+font.size: 14
+lines.linewidth: 3.5
+patch.linewidth: 2.5
+text.color: red
+text.hinting: no_hinting
+svg.hashsalt: None
+axes.unicode_minus: False
+path.simplify_threshold: 0.5
+"""
+
+# Environment of the verify runs after the first: each row is applied to one run
+PERTURBATIONS = [
+    {'TZ': 'Pacific/Kiritimati', 'LC_ALL': 'C', 'PYTHONHASHSEED': '1', 'SOURCE_DATE_EPOCH': '1700000000'},
+    {'TZ': 'America/St_Johns', 'LC_ALL': 'C.UTF-8', 'PYTHONHASHSEED': '4242', 'SOURCE_DATE_EPOCH': ''},
+]
+
+_fonts_checked = False
+
+
+def metadata(fmt):
+    """savefig metadata for `fmt` without version or date stamps"""
+    return dict(METADATA.get(fmt, {}))
+
+
+def check_fonts():
+    """Resolve the pinned font variants; returns {variant: font file}
+
+    Raises RuntimeError when one resolves to a font outside matplotlib's own
+    mpl-data, such as a system DejaVu Sans of another version, or to a
+    fallback font.
+    """
+    import matplotlib as mpl
+    from matplotlib import font_manager
+
+    bundled = os.path.realpath(os.path.join(mpl.get_data_path(), 'fonts'))
+    resolved = {}
+    for weight, style in FONT_VARIANTS:
+        props = font_manager.FontProperties(family=RC['font.sans-serif'], weight=weight, style=style)
+        try:
+            path = font_manager.findfont(props, fallback_to_default=False)
+        except ValueError:
+            path = None
+        if path is None or not os.path.realpath(path).startswith(bundled + os.sep):
+            raise RuntimeError(f"{RC['font.sans-serif'][0]} ({weight}, {style}) resolves to {path}, "
+                               f"not to the copy bundled with matplotlib in {bundled}")
+        resolved[f'{weight}/{style}'] = path
+    return resolved
+
+
+@contextmanager
+def source_date_epoch():
+    """SOURCE_DATE_EPOCH pinned for the duration, for backends that read it"""
+    previous = os.environ.get('SOURCE_DATE_EPOCH')
+    os.environ['SOURCE_DATE_EPOCH'] = SOURCE_DATE_EPOCH
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ['SOURCE_DATE_EPOCH']
+        else:
+            os.environ['SOURCE_DATE_EPOCH'] = previous
+
+
+@contextmanager
+def pinned():
+    """matplotlib's built-in rcParams plus RC, whatever the local configuration says"""
+    global _fonts_checked
+    import matplotlib as mpl
+
+    with mpl.rc_context():
+        mpl.rcdefaults()
+        mpl.rcParams.update(RC)
+        if not _fonts_checked:
+            fonts.ensure()
+            check_fonts()
+            _fonts_checked = True
+        with source_date_epoch():
+            yield
+
+
+def environment():
+    """Everything besides the sources that the output bytes depend on"""
+    import matplotlib as mpl
+    from matplotlib import ft2font
+
+    fonts = check_fonts()
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        **library_versions(),
+        'freetype': ft2font.__freetype_version__,
+        'matplotlib_data': mpl.get_data_path(),
+        'fonts': {variant: {'file': os.path.basename(path), 'sha256': file_sha256(path)}
+                  for variant, path in fonts.items()},
+        'fonts_digest': fonts_digest(),
+    }
+
+
+def _run_env(index, config_dir):
+    """Environment of verify run `index`: a fresh matplotlib config dir, perturbed after the first"""
+    env = dict(os.environ)
+    env.pop(phases.TRACE_ENV, None)
+    env['MPLCONFIGDIR'] = config_dir
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    if index:
+        with open(os.path.join(config_dir, 'matplotlibrc'), 'w', encoding='utf-8') as f:
+            f.write(HOSTILE_RC)
+        for key, value in PERTURBATIONS[(index - 1) % len(PERTURBATIONS)].items():
+            if value:
+                env[key] = value
+            else:
+                env.pop(key, None)
+    return env
+
+
+def render_runs(names, variants, runs, optimize, workdir):
+    """Render `names` `runs` times into workdir/run<N>; returns [(output dir, seconds)]"""
+    results = []
+    for index in range(runs):
+        out_dir = os.path.join(workdir, f'run{index}')
+        config_dir = os.path.join(workdir, f'mplconfig{index}')
+        cwd = os.path.join(workdir, f'cwd{index}')
+        for path in (out_dir, config_dir, cwd):
+            os.makedirs(path, exist_ok=True)
+        command = [sys.executable, '-m', 'diagrams', *names, '--output-dir', out_dir]
+        for fmt, dpi in variants:
+            command += ['--variant', f'{fmt}@{dpi}']
+        if optimize:
+            command += ['--optimize', optimize]
+        start = time.perf_counter()
+        proc = subprocess.run(command, cwd=cwd, env=_run_env(index, config_dir), capture_output=True, text=True)
+        if proc.returncode:
+            raise RuntimeError(f"run {index + 1} failed:\n{proc.stderr.strip()}")
+        results.append((out_dir, time.perf_counter() - start))
+    return results
+
+
+def describe_difference(path_a, path_b):
+    """Where two files differ, in a few words"""
+    with open(path_a, 'rb') as f:
+        a = f.read()
+    with open(path_b, 'rb') as f:
+        b = f.read()
+    if path_a.endswith('.png'):
+        from .pngopt import read_chunks
+
+        try:
+            chunks_a, chunks_b = read_chunks(a), read_chunks(b)
+        except ValueError as e:
+            return str(e)
+        kinds = sorted({kind.decode() for kind, payload in set(chunks_a) ^ set(chunks_b)})
+        text = f"chunks differ: {', '.join(kinds)}"
+        if 'IDAT' in kinds:
+            text += '; ' + _pixel_difference(a, b)
+        return text
+    position = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+    line = a[:position].count(b'\n') + 1
+    return f"{len(a):,} vs {len(b):,} bytes, first difference at byte {position:,} (line {line})"
+
+
+def _pixel_difference(a, b):
+    import numpy as np
+    from PIL import Image
+
+    pixels_a = np.asarray(Image.open(io.BytesIO(a)).convert('RGBA'))
+    pixels_b = np.asarray(Image.open(io.BytesIO(b)).convert('RGBA'))
+    if pixels_a.shape != pixels_b.shape:
+        return f"size {pixels_a.shape[1]}x{pixels_a.shape[0]} vs {pixels_b.shape[1]}x{pixels_b.shape[0]}"
+    changed = int((pixels_a != pixels_b).any(axis=2).sum())
+    return f"{changed:,} pixels differ" if changed else "same pixels, different encoding"
+
+
+def compare(files, dirs):
+    """{file: None if identical in every dir, else a description of the first difference}"""
+    results = {}
+    for name in files:
+        paths = [os.path.join(directory, name) for directory in dirs]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            results[name] = f"missing in {', '.join(os.path.dirname(path) for path in missing)}"
+            continue
+        digests = [file_sha256(path) for path in paths]
+        odd = next((i for i, digest in enumerate(digests) if digest != digests[0]), None)
+        results[name] = None if odd is None else f"run {odd + 1}: {describe_difference(paths[0], paths[odd])}"
+    return results
+
+
+def verify(names, variants, runs=3, optimize=None, committed=False, keep=None):
+    """Render `runs` times and compare; returns (ok, report lines)"""
+    from . import variant_outputs
+
+    workdir = keep or tempfile.mkdtemp(prefix='diagrams-verify-')
+    lines = []
+    try:
+        timings = render_runs(names, variants, runs, optimize, workdir)
+        files = [os.path.basename(output) for name in names
+                 for output, _, _ in variant_outputs(name, variants, '')]
+        results = compare(files, [directory for directory, _ in timings])
+        for name in files:
+            digest = file_sha256(os.path.join(timings[0][0], name)) if os.path.exists(
+                os.path.join(timings[0][0], name)) else ''
+            lines.append(f"  {'ok  ' if results[name] is None else 'DIFF'} {name:<40} {digest[:16]}"
+                         + (f"  {results[name]}" if results[name] else ''))
+        ok = all(result is None for result in results.values())
+        lines.append(f"{sum(r is None for r in results.values())} of {len(files)} output(s) identical across "
+                     f"{runs} runs ({', '.join(f'{seconds:.1f}s' for _, seconds in timings)})")
+
+        if committed:
+            pngs = [default_output(name, 'png') for name in names
+                    if ('png', DEFAULT_DPI) in variants and os.path.exists(os.path.join(ROOT, default_output(name, 'png')))]
+            matches = compare(pngs, [timings[0][0], ROOT])
+            for name in pngs:
+                lines.append(f"  {'ok  ' if matches[name] is None else 'DIFF'} committed {name}"
+                             + (f"  {matches[name]}" if matches[name] else ''))
+            stale = [name for name in pngs if matches[name] is not None]
+            if stale:
+                lines.append(f"{len(stale)} committed PNG(s) differ from a fresh render here; if the toolchain "
+                             f"matches theirs (see `env`), rebuild them with generate_all_diagrams.py")
+            ok = ok and not stale
+        return ok, lines
+    finally:
+        if keep is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.reproducible',
+                                     description='Check that rendered diagrams are byte-reproducible.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    env_cmd = commands.add_parser('env', help='print what the output bytes depend on besides the sources')
+    env_cmd.add_argument('--json', action='store_true', help='print it as JSON')
+
+    verify_cmd = commands.add_parser('verify', help='render in several environments and compare the bytes')
+    verify_cmd.add_argument('names', nargs='*', metavar='name',
+                            help=f"diagrams to check (default: all of {', '.join(DIAGRAMS)})")
+    verify_cmd.add_argument('--variant', dest='variants', action='append', type=variant_type, metavar='FMT[@DPI]',
+                            help='output to compare; repeatable (default: png, svg and pdf)')
+    verify_cmd.add_argument('--runs', type=int, default=3, help='renders to compare (default: 3)')
+    verify_cmd.add_argument('--optimize', default='balanced',
+                            help="PNG optimization preset, as the build uses ('none' to skip; default: balanced)")
+    verify_cmd.add_argument('--committed', action='store_true',
+                            help='also compare the PNGs with the ones in the repository')
+    verify_cmd.add_argument('--keep', metavar='DIR', help='render into DIR and keep the files')
+    args = parser.parse_args(argv)
+
+    if args.command == 'env':
+        try:
+            env = environment()
+        except RuntimeError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+        if args.json:
+            print(json.dumps(env, indent=2))
+        else:
+            for key, value in env.items():
+                if key == 'fonts':
+                    for variant, font in value.items():
+                        print(f"{'font ' + variant:<20} {font['file']} {font['sha256'][:16]}")
+                else:
+                    print(f"{key:<20} {value}")
+        return 0
+
+    names = args.names or list(DIAGRAMS)
+    unknown = [name for name in names if name not in DIAGRAMS]
+    if unknown:
+        parser.error(f"unknown diagram(s): {', '.join(unknown)}")
+    if args.runs < 2:
+        parser.error('--runs must be at least 2')
+    optimize = None if args.optimize == 'none' else args.optimize
+    try:
+        ok, lines = verify(names, args.variants or DEFAULT_VARIANTS, args.runs, optimize, args.committed, args.keep)
+    except RuntimeError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print('\n'.join(lines))
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Compact scene representation of a diagram
+
+A scene is the output of laying a diagram out: a flat, ordered list of
+drawing primitives (boxes, rectangles, diamonds, arcs, lines, arrows and
+text) in data coordinates. Geometry is held in one float array, each
+primitive's style is an index into a de-duplicated table of matplotlib
+keyword arguments, and strings live in their own table. A scene can be saved
+to and loaded from a single .npz file without pickling, and drawn at any
+size, DPI or output format without going back to the spec it came from.
+"""
+import json
+
+import numpy as np
+
+# Primitive kinds
+BOX = 0       # FancyBboxPatch: x, y (lower left), width, height
+RECT = 1      # Rectangle: x, y (lower left), width, height
+DIAMOND = 2   # Polygon: center x, center y, width, height
+ARC = 3       # Arc: center x, center y, width, height, theta1, theta2
+LINE = 4      # Line2D: x0, y0, x1, y1
+ARROW = 5     # FancyArrowPatch: x0, y0 (tail), x1, y1 (head)
+TEXT = 6      # Text: x, y
+
+KIND_NAMES = ['box', 'rect', 'diamond', 'arc', 'line', 'arrow', 'text']
+
+GEOMETRY_COLUMNS = 6
+
+SCENE_FORMAT = 1
+
+
+class Scene:
+    """An immutable, array-backed list of drawing primitives"""
+
+    def __init__(self, kinds, geometry, styles, texts, style_table, strings, meta):
+        self.kinds = kinds            # uint8 (n,)
+        self.geometry = geometry      # float64 (n, GEOMETRY_COLUMNS)
+        self.styles = styles          # uint32 (n,) index into style_table
+        self.texts = texts            # int32 (n,) index into strings, -1 if none
+        self.style_table = style_table
+        self.strings = strings
+        self.meta = meta              # figsize, xlim, ylim, dpi
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def counts(self):
+        """Number of primitives of each kind"""
+        found = np.bincount(self.kinds, minlength=len(KIND_NAMES))
+        return {name: int(count) for name, count in zip(KIND_NAMES, found) if count}
+
+    def save(self, path):
+        """Write the scene to an .npz file"""
+        with open(path, 'wb') as f:
+            np.savez(f, kinds=self.kinds, geometry=self.geometry, styles=self.styles,
+                     texts=self.texts, strings=np.array(self.strings, dtype=str),
+                     style_table=np.array(json.dumps(self.style_table)),
+                     meta=np.array(json.dumps(dict(self.meta, format=SCENE_FORMAT))))
+
+    @classmethod
+    def load(cls, path):
+        """Read a scene written by `save`; raises ValueError for other formats"""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.pop('format', None) != SCENE_FORMAT:
+                raise ValueError(f'{path} was written by a different scene format')
+            return cls(data['kinds'], data['geometry'], data['styles'], data['texts'],
+                       json.loads(str(data['style_table'])), data['strings'].tolist(), meta)
+
+
+class SceneBuilder:
+    """Collects primitives in drawing order and packs them into a Scene
+
+    Style keyword arguments are passed straight through to the matplotlib
+    artist when the scene is drawn, so the builder methods mirror the artist
+    constructors they stand in for.
+    """
+
+    def __init__(self, figsize, xlim, ylim, dpi=150):
+        self.meta = {'figsize': list(figsize), 'xlim': list(xlim), 'ylim': list(ylim), 'dpi': dpi}
+        self._kinds = []
+        self._geometry = []
+        self._styles = []
+        self._texts = []
+        self._style_index = {}
+        self._string_index = {}
+
+    def _add(self, kind, geometry, style, text=None):
+        key = json.dumps(style, sort_keys=True)
+        style_id = self._style_index.setdefault(key, len(self._style_index))
+        if text is None:
+            text_id = -1
+        else:
+            text_id = self._string_index.setdefault(text, len(self._string_index))
+        self._kinds.append(kind)
+        self._geometry.append(tuple(geometry) + (0.0,) * (GEOMETRY_COLUMNS - len(geometry)))
+        self._styles.append(style_id)
+        self._texts.append(text_id)
+
+    def box(self, x, y, width, height, **style):
+        """Rounded box (FancyBboxPatch) with its lower left corner at x, y"""
+        self._add(BOX, (x, y, width, height), style)
+
+    def rect(self, x, y, width, height, **style):
+        """Plain rectangle with its lower left corner at x, y"""
+        self._add(RECT, (x, y, width, height), style)
+
+    def diamond(self, x, y, width, height, **style):
+        """Diamond centered on x, y"""
+        self._add(DIAMOND, (x, y, width, height), style)
+
+    def arc(self, x, y, width, height, theta1, theta2, **style):
+        """Elliptical arc centered on x, y"""
+        self._add(ARC, (x, y, width, height, theta1, theta2), style)
+
+    def line(self, x0, y0, x1, y1, **style):
+        """Straight line segment"""
+        self._add(LINE, (x0, y0, x1, y1), style)
+
+    def arrow(self, x0, y0, x1, y1, **style):
+        """Arrow from the tail at x0, y0 to the head at x1, y1"""
+        self._add(ARROW, (x0, y0, x1, y1), style)
+
+    def text(self, x, y, text, **style):
+        """Text anchored at x, y"""
+        self._add(TEXT, (x, y), style, text)
+
+    def build(self):
+        """Pack everything added so far into a Scene"""
+        style_table = [None] * len(self._style_index)
+        for key, index in self._style_index.items():
+            style_table[index] = json.loads(key)
+        strings = [None] * len(self._string_index)
+        for text, index in self._string_index.items():
+            strings[index] = text
+        return Scene(np.array(self._kinds, dtype=np.uint8),
+                     np.array(self._geometry, dtype=np.float64).reshape(-1, GEOMETRY_COLUMNS),
+                     np.array(self._styles, dtype=np.uint32),
+                     np.array(self._texts, dtype=np.int32),
+                     style_table, strings, dict(self.meta))
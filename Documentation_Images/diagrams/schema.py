@@ -0,0 +1,502 @@
+"""
+Database schema extracted from the API's Entity Framework Core models
+
+Reads the entity classes in StudentLifeTracker.API/Models/*.cs and the
+DbContext in Data/*.cs and works out the tables the ERD shows: their columns,
+primary and foreign keys, and the one-to-many relationships between them. The
+DbContext decides which classes are tables (its DbSet properties, plus the
+Identity user) and supplies relationships configured in OnModelCreating;
+navigation properties and EF naming conventions fill in the rest.
+
+This is a pattern-based reader for the subset of C# that entity classes use,
+not a C# parser. Each file's parse result is cached in .schema_cache.json keyed
+by modification time, size and content hash, so a warm run only stats the
+files and re-parses the ones that changed.
+
+Usage:
+    python -m diagrams.schema                          # print the schema as JSON
+    python -m diagrams.schema ../StudentLifeTracker.API --summary
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_API_DIR = os.path.join(os.path.dirname(ROOT), 'StudentLifeTracker.API')
+CACHE_PATH = os.path.join(ROOT, '.schema_cache.json')
+
+# Bump when the parser changes so cached parse results are discarded
+PARSER_VERSION = 1
+
+SOURCE_DIRS = ['Models', 'Data']
+
+# Columns IdentityUser contributes that are worth showing. The rest (normalized
+# names, security and concurrency stamps, lockout and two-factor state) are
+# left out to keep the table readable.
+IDENTITY_USER_COLUMNS = [
+    {'name': 'Id', 'type': 'string', 'nullable': False},
+    {'name': 'Email', 'type': 'string', 'nullable': True},
+    {'name': 'UserName', 'type': 'string', 'nullable': True},
+    {'name': 'PasswordHash', 'type': 'string', 'nullable': True},
+]
+
+IDENTITY_USER_BASES = {'IdentityUser', 'IdentityUser<string>'}
+
+COLLECTION_TYPES = {'ICollection', 'IList', 'List', 'IEnumerable', 'HashSet', 'ISet',
+                    'IReadOnlyCollection', 'IReadOnlyList'}
+
+_COMMENTS = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', re.DOTALL)
+_CLASS = re.compile(
+    r'(?P<attributes>(?:\[[^\]]*\]\s*)*)'
+    r'(?P<modifiers>(?:\b(?:public|internal|abstract|sealed|partial|static)\s+)*)'
+    r'class\s+(?P<name>\w+)(?:<[^>{]*>)?\s*(?::\s*(?P<bases>[^{]+))?\{')
+_PROPERTY = re.compile(
+    r'(?P<attributes>(?:\[[^\]]*\]\s*)*)'
+    r'public\s+(?:(?:virtual|required|override|new)\s+)*'
+    r'(?P<type>[\w.]+(?:<[^;{}()=]*?>)?\??(?:\[\])?)\s+(?P<name>\w+)\s*\{[^}]*\bget\b')
+_ATTRIBUTE = re.compile(r'(\w+)(?:\(([^)]*)\))?')
+_DBSET = re.compile(r'DbSet<(\w+)>\s+(\w+)\s*\{')
+_ENTITY_CONFIG = re.compile(r'\w+\.Entity<(\w+)>\(\)(.*?);', re.DOTALL)
+_LAMBDA_CALL = re.compile(r'\.(\w+)\(\s*(?:\w+\s*=>\s*\w+\.(\w+)|new\s*\{([^}]*)\}\s*|"(\w+)"|'
+                          r'DeleteBehavior\.(\w+))?\s*\)')
+
+
+def _strip_comments(text):
+    return _COMMENTS.sub(lambda m: m.group(1) or '', text)
+
+
+def _class_body(text, start):
+    """Text between the brace opening at `start` - 1 and its matching close"""
+    depth = 1
+    for i in range(start, len(text)):
+        if text[i] == '{':
+            depth += 1
+        elif text[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i]
+    return text[start:]
+
+
+def _parse_attributes(block):
+    attributes = {}
+    for group in re.findall(r'\[([^\]]*)\]', block):
+        for name, args in _ATTRIBUTE.findall(group):
+            attributes[name.removesuffix('Attribute')] = args.strip().strip('"')
+    return attributes
+
+
+def _parse_entity_config(chain):
+    """One `builder.Entity<T>()...;` statement as a list of (method, argument) calls"""
+    calls = []
+    for method, member, anonymous, literal, behavior in _LAMBDA_CALL.findall(chain):
+        if anonymous:
+            argument = [part.split('.')[-1].strip() for part in anonymous.split(',') if part.strip()]
+        else:
+            argument = member or literal or behavior or None
+        calls.append((method, argument))
+    return calls
+
+
+def parse_source(text):
+    """Classes, properties and DbContext configuration found in one C# file"""
+    text = _strip_comments(text)
+    classes = []
+    for match in _CLASS.finditer(text):
+        body = _class_body(text, match.end())
+        attributes = _parse_attributes(match.group('attributes'))
+        bases = [base.strip() for base in re.split(r',(?![^<]*>)', match.group('bases') or '')
+                 if base.strip()]
+        properties = []
+        for prop in _PROPERTY.finditer(body):
+            properties.append({
+                'name': prop.group('name'),
+                'type': prop.group('type'),
+                'attributes': _parse_attributes(prop.group('attributes')),
+            })
+        entry = {
+            'name': match.group('name'),
+            'abstract': 'abstract' in match.group('modifiers'),
+            'bases': bases,
+            'properties': properties,
+        }
+        if 'Table' in attributes:
+            entry['table'] = attributes['Table'].split(',')[0].strip().strip('"')
+        if any(base.split('<')[0].endswith('DbContext') for base in bases):
+            entry['dbsets'] = [{'entity': entity, 'name': name}
+                               for entity, name in _DBSET.findall(body)]
+            entry['entity_configs'] = [{'entity': entity, 'calls': _parse_entity_config(chain)}
+                                       for entity, chain in _ENTITY_CONFIG.findall(body)]
+        classes.append(entry)
+    return {'classes': classes}
+
+
+def source_files(api_dir):
+    """C# files the schema is read from, sorted"""
+    files = []
+    for sub in SOURCE_DIRS:
+        directory = os.path.join(api_dir, sub)
+        if os.path.isdir(directory):
+            files.extend(entry.path for entry in os.scandir(directory)
+                         if entry.is_file() and entry.name.endswith('.cs'))
+    return sorted(files)
+
+
+def _load_cache(path, version=PARSER_VERSION):
+    try:
+        with open(path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {'version': version, 'files': {}}
+    if cache.get('version') != version:
+        return {'version': version, 'files': {}}
+    return cache
+
+
+def _save_cache(path, cache):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def parse_files(files, cache_path=CACHE_PATH, stats=None, parse=None, version=PARSER_VERSION):
+    """Parse results for `files`, re-parsing only the ones that changed
+
+    A file is reused from the cache when its mtime and size are unchanged, or
+    failing that when its content hash is. `stats`, if given, is filled in
+    with how many files were reused, re-hashed and parsed. Other readers
+    (appindex.py) pass their own `parse(text, path)`, `version` and cache.
+    """
+    cache = _load_cache(cache_path, version) if cache_path else {'version': version, 'files': {}}
+    entries = cache['files']
+    counts = {'reused': 0, 'rehashed': 0, 'parsed': 0}
+    results = {}
+    dirty = False
+    for path in files:
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        entry = entries.get(key)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            counts['reused'] += 1
+            results[path] = entry
+            continue
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if entry and entry['sha256'] == digest:
+            counts['rehashed'] += 1
+        else:
+            counts['parsed'] += 1
+            text = raw.decode('utf-8-sig')
+            entry = {'sha256': digest, 'result': parse(text, path) if parse else parse_source(text)}
+        entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+        entries[key] = results[path] = entry
+        dirty = True
+
+    # Forget files that were deleted from the directories being scanned
+    current = {os.path.abspath(path) for path in files}
+    scanned = {os.path.dirname(key) for key in current}
+    for key in [key for key in entries if key not in current and os.path.dirname(key) in scanned
+                and not os.path.exists(key)]:
+        del entries[key]
+        dirty = True
+
+    if dirty and cache_path:
+        _save_cache(cache_path, cache)
+    if stats is not None:
+        stats.update(counts)
+    return results
+
+
+def sources_digest(api_dir, cache_path=CACHE_PATH):
+    """Hash over the contents of every schema source file, via the parse cache"""
+    digest = hashlib.sha256()
+    for path, entry in parse_files(source_files(api_dir), cache_path).items():
+        digest.update(f"{os.path.basename(path)}:{entry['sha256']}\n".encode())
+    return digest.hexdigest()
+
+
+def _element_type(type_name):
+    """(collection?, entity type name) for a property type"""
+    type_name = type_name.rstrip('?')
+    match = re.fullmatch(r'([\w.]+)<\s*([\w.]+)\s*>', type_name)
+    if match and match.group(1).split('.')[-1] in COLLECTION_TYPES:
+        return True, match.group(2).split('.')[-1]
+    return False, type_name.split('.')[-1]
+
+
+def build_schema(parsed):
+    """Tables and relationships from the per-file parse results
+
+    Returns {'tables': [...], 'relationships': [...]}; each table has a name,
+    the entity class it maps, and columns flagged as primary/foreign keys.
+    Relationships name the table on the "one" side, the table on the "many"
+    side, the foreign key columns and the delete behavior when configured.
+    """
+    classes = {}
+    contexts = []
+    for result in parsed:
+        for cls in result['classes']:
+            if 'dbsets' in cls:
+                contexts.append(cls)
+            else:
+                classes[cls['name']] = cls
+
+    # Which classes are tables, and what they are called
+    table_names = {}
+    identity_user = None
+    for context in contexts:
+        for base in context['bases']:
+            match = re.fullmatch(r'IdentityDbContext<\s*(\w+)[^>]*>', base.strip())
+            if match:
+                identity_user = match.group(1)
+                table_names[identity_user] = 'AspNetUsers'
+        for dbset in context['dbsets']:
+            table_names.setdefault(dbset['entity'], dbset['name'])
+    for context in contexts:
+        for config in context['entity_configs']:
+            for method, argument in config['calls']:
+                if method == 'ToTable' and argument:
+                    table_names[config['entity']] = argument
+    for name, cls in classes.items():
+        if 'table' in cls:
+            table_names[name] = cls['table']
+    if not contexts:
+        # No DbContext: every concrete class with an Id is a table
+        for name, cls in classes.items():
+            if not cls['abstract'] and any(p['name'] in ('Id', f'{name}Id')
+                                           for p in _all_properties(name, classes)):
+                table_names.setdefault(name, name)
+
+    # Fluent configuration, grouped per entity
+    keys = {}
+    fluent = []
+    ignored = set()
+    for context in contexts:
+        for config in context['entity_configs']:
+            entity = config['entity']
+            current = None
+            for method, argument in config['calls']:
+                if method == 'HasKey':
+                    keys[entity] = argument if isinstance(argument, list) else [argument]
+                elif method == 'Ignore':
+                    ignored.add((entity, argument))
+                elif method in ('HasOne', 'HasMany'):
+                    current = {'entity': entity, 'method': method, 'navigation': argument}
+                    fluent.append(current)
+                elif current is not None and method in ('WithMany', 'WithOne'):
+                    current['inverse'] = argument
+                    current['inverse_method'] = method
+                elif current is not None and method == 'HasForeignKey':
+                    current['foreign_key'] = argument if isinstance(argument, list) else [argument]
+                elif current is not None and method == 'OnDelete':
+                    current['on_delete'] = argument
+
+    tables = {}
+    navigations = {}
+    for entity, table in table_names.items():
+        columns = []
+        if identity_user == entity or _inherits_identity_user(entity, classes):
+            columns.extend(dict(column) for column in IDENTITY_USER_COLUMNS)
+        entity_navigations = []
+        for prop in _all_properties(entity, classes):
+            if 'NotMapped' in prop['attributes'] or (entity, prop['name']) in ignored:
+                continue
+            collection, target = _element_type(prop['type'])
+            if target in table_names:
+                entity_navigations.append({'name': prop['name'], 'target': target,
+                                           'collection': collection,
+                                           'foreign_key': prop['attributes'].get('ForeignKey')})
+                continue
+            if collection:
+                continue
+            if any(column['name'] == prop['name'] for column in columns):
+                continue
+            columns.append({'name': prop['name'], 'type': prop['type'].rstrip('?'),
+                            'nullable': prop['type'].endswith('?')})
+        primary = keys.get(entity) or [prop['name'] for prop in _all_properties(entity, classes)
+                                       if 'Key' in prop['attributes']]
+        if not primary:
+            primary = [name for name in ('Id', f'{entity}Id')
+                       if any(column['name'] == name for column in columns)][:1]
+        for column in columns:
+            column['pk'] = column['name'] in primary
+            column['fk'] = False
+        tables[entity] = {'name': table, 'entity': entity, 'columns': columns}
+        navigations[entity] = entity_navigations
+
+    relationships = []
+    seen = set()
+
+    def add(one, many, foreign_key, on_delete=None):
+        if one not in tables or many not in tables:
+            return
+        key = (one, many, tuple(foreign_key))
+        if key in seen:
+            return
+        seen.add(key)
+        columns = {column['name']: column for column in tables[many]['columns']}
+        for name in foreign_key:
+            if name in columns:
+                columns[name]['fk'] = True
+        relationships.append({'one': tables[one]['name'], 'many': tables[many]['name'],
+                              'foreign_key': list(foreign_key), 'on_delete': on_delete})
+
+    # Relationships configured in OnModelCreating win over conventions
+    claimed = set()
+    for config in fluent:
+        entity = config['entity']
+        nav = _find_navigation(navigations.get(entity, []), config['navigation'])
+        if config['method'] == 'HasOne' and config.get('inverse_method', 'WithMany') == 'WithMany':
+            if nav is None:
+                continue
+            principal, dependent = nav['target'], entity
+            claimed.add((entity, nav['name']))
+            if config.get('inverse'):
+                claimed.add((principal, config['inverse']))
+        elif config['method'] == 'HasMany':
+            if nav is None:
+                continue
+            principal, dependent = entity, nav['target']
+            claimed.add((entity, nav['name']))
+            if config.get('inverse'):
+                claimed.add((dependent, config['inverse']))
+        else:
+            continue  # one-to-one; the ERD only draws one-to-many
+        foreign_key = config.get('foreign_key') or _conventional_key(
+            dependent, tables, principal, nav['name'] if config['method'] == 'HasOne' else None)
+        add(principal, dependent, foreign_key, config.get('on_delete'))
+
+    # Conventions: reference navigations with a matching <Navigation>Id property,
+    # then collection navigations whose element has a key back to this entity
+    for entity, entity_navigations in navigations.items():
+        for nav in entity_navigations:
+            if nav['collection'] or (entity, nav['name']) in claimed:
+                continue
+            foreign_key = ([nav['foreign_key']] if nav['foreign_key']
+                           else _conventional_key(entity, tables, nav['target'], nav['name']))
+            if foreign_key:
+                add(nav['target'], entity, foreign_key)
+                claimed.add((entity, nav['name']))
+                for inverse in navigations.get(nav['target'], []):
+                    if inverse['collection'] and inverse['target'] == entity:
+                        claimed.add((nav['target'], inverse['name']))
+    for entity, entity_navigations in navigations.items():
+        for nav in entity_navigations:
+            if not nav['collection'] or (entity, nav['name']) in claimed:
+                continue
+            foreign_key = _conventional_key(nav['target'], tables, entity, None)
+            if foreign_key:
+                add(entity, nav['target'], foreign_key)
+
+    ordered = sorted(tables.values(), key=lambda table: table['name'])
+    return {'tables': ordered, 'relationships': relationships}
+
+
+def _all_properties(name, classes, seen=None):
+    """Properties of a class and its parsed base classes, base class first"""
+    cls = classes.get(name)
+    if cls is None:
+        return []
+    seen = seen or set()
+    seen.add(name)
+    inherited = []
+    for base in cls['bases']:
+        base = base.split('<')[0].strip()
+        if base in classes and base not in seen:
+            inherited = _all_properties(base, classes, seen)
+            break
+    own = {prop['name'] for prop in cls['properties']}
+    return [prop for prop in inherited if prop['name'] not in own] + cls['properties']
+
+
+def _inherits_identity_user(name, classes, seen=None):
+    cls = classes.get(name)
+    if cls is None:
+        return False
+    seen = seen or set()
+    seen.add(name)
+    for base in cls['bases']:
+        base = base.strip()
+        if base in IDENTITY_USER_BASES:
+            return True
+        if base in classes and base not in seen and _inherits_identity_user(base, classes, seen):
+            return True
+    return False
+
+
+def _find_navigation(navigations, name):
+    for nav in navigations:
+        if nav['name'] == name:
+            return nav
+    return None
+
+
+def _conventional_key(dependent, tables, principal, navigation):
+    """EF's foreign key naming conventions: <Navigation>Id, <Principal>Id"""
+    columns = {column['name'] for column in tables[dependent]['columns']}
+    candidates = ([f'{navigation}Id'] if navigation else []) + [f'{principal}Id']
+    for candidate in candidates:
+        if candidate in columns:
+            return [candidate]
+    return []
+
+
+def extract_schema(api_dir=DEFAULT_API_DIR, cache_path=CACHE_PATH, stats=None):
+    """Schema of the EF Core models under `api_dir`
+
+    The result also carries 'sources', a digest of the files it was read from.
+    """
+    files = source_files(api_dir)
+    if not files:
+        raise ValueError(f"No C# model sources found under {api_dir}")
+    parsed = parse_files(files, cache_path, stats)
+    schema = build_schema([parsed[path]['result'] for path in files])
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(f"{os.path.basename(path)}:{parsed[path]['sha256']}\n".encode())
+    schema['sources'] = digest.hexdigest()
+    return schema
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.schema',
+                                     description='Extract the database schema from the EF Core models.')
+    parser.add_argument('api_dir', nargs='?', default=DEFAULT_API_DIR,
+                        help='API project directory (default: ../StudentLifeTracker.API)')
+    parser.add_argument('--summary', action='store_true', help='print one line per table instead of JSON')
+    parser.add_argument('--no-cache', action='store_true', help='parse every file')
+    args = parser.parse_args(argv)
+
+    stats = {}
+    start = time.perf_counter()
+    try:
+        schema = extract_schema(args.api_dir, None if args.no_cache else CACHE_PATH, stats)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if not args.summary:
+        print(json.dumps(schema, indent=2))
+        return 0
+    for table in schema['tables']:
+        keys = [('PK ' if column['pk'] else 'FK ' if column['fk'] else '') + column['name']
+                for column in table['columns']]
+        print(f"{table['name']:<16} {', '.join(keys)}")
+    for rel in schema['relationships']:
+        print(f"{rel['one']} 1:M {rel['many']} ({', '.join(rel['foreign_key'])}"
+              f"{', ' + rel['on_delete'] if rel['on_delete'] else ''})")
+    print(f"{len(schema['tables'])} tables, {len(schema['relationships'])} relationships in "
+          f"{elapsed:.1f} ms ({stats['parsed']} parsed, {stats['rehashed']} re-hashed, "
+          f"{stats['reused']} reused)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
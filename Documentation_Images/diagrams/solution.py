@@ -0,0 +1,327 @@
+"""
+Project and component graph of the Visual Studio solution
+
+Reads StudentProgressTracker.sln for its projects, each .csproj for its SDK,
+target frameworks, project and package references, and the C# sources of
+each project for the components the architecture diagram shows: controllers,
+services, the DbContext and its tables, pages, ViewModels, models and DTOs.
+Each project gets a role (client, api, library or test) from its SDK,
+properties and packages, and its project references are resolved to the
+projects they name.
+
+Resolution is one pass over the projects with a path -> project lookup, so
+it grows linearly with the size of the solution. Per-file results are kept
+in .solution_cache.json keyed by modification time, size and content hash
+(schema.parse_files), and the resolved graph in .solution_graph.json keyed
+by a digest of every source, so a warm run only stats the files.
+
+Usage:
+    python -m diagrams.solution                   # one line per project
+    python -m diagrams.solution ../StudentProgressTracker.sln --json
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+
+from .schema import _CLASS, _class_body, _strip_comments, parse_files
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SOLUTION = os.path.join(os.path.dirname(ROOT), 'StudentProgressTracker.sln')
+CACHE_PATH = os.path.join(ROOT, '.solution_cache.json')
+GRAPH_PATH = os.path.join(ROOT, '.solution_graph.json')
+
+# Bump when the readers or the graph change so cached results are discarded
+GRAPH_VERSION = 1
+
+# Project type GUID of solution folders, which are not projects
+SOLUTION_FOLDER = '2150E333-8FDC-42A3-9474-1A3956D46DE8'
+
+# Directories never scanned for sources
+SKIP_DIRS = {'bin', 'obj', 'node_modules', 'packages', 'TestResults'}
+
+# EF Core provider package -> database named in the diagram
+DATABASE_PROVIDERS = {
+    'Microsoft.EntityFrameworkCore.SqlServer': 'SQL Server',
+    'Npgsql.EntityFrameworkCore.PostgreSQL': 'PostgreSQL',
+    'Microsoft.EntityFrameworkCore.Sqlite': 'SQLite',
+    'Pomelo.EntityFrameworkCore.MySql': 'MySQL',
+    'Microsoft.EntityFrameworkCore.Cosmos': 'Cosmos DB',
+}
+
+# Table ASP.NET Core Identity adds for an IdentityDbContext
+IDENTITY_USERS_TABLE = 'AspNetUsers'
+
+_PROJECT = re.compile(r'^Project\("\{(?P<type>[^}]+)\}"\)\s*=\s*"(?P<name>[^"]+)",\s*"(?P<path>[^"]+)"',
+                      re.MULTILINE)
+_DBSET = re.compile(r'DbSet<\w+>\s+(\w+)\s*\{')
+
+
+def parse_solution(text):
+    """[(name, relative path)] of the projects in a .sln, solution folders excluded"""
+    return [(match.group('name'), match.group('path').replace('\\', '/'))
+            for match in _PROJECT.finditer(text) if match.group('type').upper() != SOLUTION_FOLDER]
+
+
+def parse_project(text):
+    """SDK, properties and references of a .csproj"""
+    try:
+        root = ElementTree.fromstring(text)
+    except ElementTree.ParseError as e:
+        raise ValueError(f"invalid project file: {e}") from None
+    properties = {}
+    references = []
+    packages = []
+    for element in root.iter():
+        tag = element.tag.rsplit('}', 1)[-1]
+        if tag == 'ProjectReference' and element.get('Include'):
+            references.append(element.get('Include').replace('\\', '/'))
+        elif tag == 'PackageReference' and element.get('Include'):
+            packages.append(element.get('Include'))
+        elif len(element) == 0 and element.text and element.text.strip() and tag not in properties:
+            properties[tag] = element.text.strip()
+    frameworks = properties.get('TargetFrameworks') or properties.get('TargetFramework') or ''
+    return {
+        'kind': 'project',
+        'sdk': root.get('Sdk', ''),
+        'frameworks': [framework for framework in frameworks.split(';') if framework],
+        'output_type': properties.get('OutputType', 'Library'),
+        'use_maui': properties.get('UseMaui', '').lower() == 'true',
+        'is_test': properties.get('IsTestProject', '').lower() == 'true',
+        'references': references,
+        'packages': packages,
+    }
+
+
+def parse_source(text):
+    """Classes of a C# file with their bases and, for a DbContext, its DbSet names"""
+    text = _strip_comments(text)
+    classes = []
+    for match in _CLASS.finditer(text):
+        bases = [base.strip() for base in (match.group('bases') or '').split(',') if base.strip()]
+        entry = {'name': match.group('name'), 'bases': bases}
+        if any('DbContext' in base for base in bases):
+            entry['dbsets'] = _DBSET.findall(_class_body(text, match.end()))
+        classes.append(entry)
+    return {'kind': 'source', 'classes': classes}
+
+
+def parse_solution_file(text, path):
+    return parse_project(text) if path.endswith('.csproj') else parse_source(text)
+
+
+def _project_role(project):
+    if project['is_test'] or 'Microsoft.NET.Test.Sdk' in project['packages']:
+        return 'test'
+    if project['use_maui'] or any(package.startswith('Microsoft.Maui') for package in project['packages']):
+        return 'client'
+    if project['sdk'] == 'Microsoft.NET.Sdk.Web':
+        return 'api'
+    return 'library'
+
+
+def _components(classes):
+    """Diagram components of one project from its (directory, class) pairs"""
+    components = {'controllers': set(), 'services': set(), 'dbcontexts': [], 'pages': set(),
+                  'viewmodels': set(), 'models': set(), 'dtos': set()}
+    for directory, cls in classes:
+        name, bases = cls['name'], cls['bases']
+        if name.endswith('Controller') and any(base.endswith(('Controller', 'ControllerBase')) for base in bases):
+            components['controllers'].add(name[:-len('Controller')])
+        elif 'dbsets' in cls:
+            tables = list(cls['dbsets'])
+            if any(base.startswith('IdentityDbContext') for base in bases):
+                tables.insert(0, IDENTITY_USERS_TABLE)
+            components['dbcontexts'].append({'name': name, 'tables': tables})
+        elif name.endswith('ViewModel'):
+            components['viewmodels'].add(name)
+        elif name.endswith('Page') and directory == 'Views':
+            components['pages'].add(name)
+        elif name.endswith('Service'):
+            components['services'].add(name)
+        elif name.upper().endswith('DTO') or directory == 'DTOs':
+            components['dtos'].add(name)
+        elif directory == 'Models':
+            components['models'].add(name)
+    return {key: sorted(value) if isinstance(value, set) else value for key, value in components.items()}
+
+
+def _source_files(directory, skip):
+    """C# files under a project directory, leaving out other projects' directories"""
+    files = []
+    for current, dirs, names in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith('.')
+                         and os.path.join(current, d) not in skip)
+        files.extend(os.path.join(current, name) for name in sorted(names) if name.endswith('.cs'))
+    return files
+
+
+def source_files(solution_path):
+    """The solution, its project files and their C# sources"""
+    solution_dir = os.path.dirname(os.path.abspath(solution_path))
+    with open(solution_path, encoding='utf-8-sig') as f:
+        entries = parse_solution(f.read())
+    projects = [os.path.normpath(os.path.join(solution_dir, path)) for _, path in entries]
+    directories = {os.path.dirname(path) for path in projects}
+    files = [os.path.abspath(solution_path)]
+    for path in projects:
+        files.append(path)
+        directory = os.path.dirname(path)
+        # A walk never reaches its own top directory, so `directories` only skips nested projects
+        files.extend(_source_files(directory, directories))
+    return files
+
+
+def build_graph(solution_path, entries, parsed):
+    """Projects with their role, references and components
+
+    `entries` are the (name, path) pairs of the .sln and `parsed` the
+    per-file results by absolute path. References that name no project of
+    the solution are listed under 'unresolved'.
+    """
+    solution_dir = os.path.dirname(os.path.abspath(solution_path))
+    paths = {os.path.normpath(os.path.join(solution_dir, path)): name for name, path in entries}
+    directories = {os.path.dirname(path): name for path, name in paths.items()}
+
+    classes = {name: [] for name in paths.values()}
+    for path, result in parsed.items():
+        if result['kind'] != 'source':
+            continue
+        # The nearest enclosing project directory owns the file
+        directory = os.path.dirname(path)
+        owner = directories.get(directory)
+        while owner is None and os.path.dirname(directory) != directory:
+            directory = os.path.dirname(directory)
+            owner = directories.get(directory)
+        if owner is not None:
+            folder = os.path.basename(os.path.dirname(path))
+            classes[owner].extend((folder, cls) for cls in result['classes'])
+
+    projects = {}
+    unresolved = []
+    for path, name in paths.items():
+        project = parsed.get(path)
+        if project is None:
+            unresolved.append({'project': name, 'reference': os.path.relpath(path, solution_dir)})
+            continue
+        references = []
+        for reference in project['references']:
+            target = paths.get(os.path.normpath(os.path.join(os.path.dirname(path), reference)))
+            if target is None:
+                unresolved.append({'project': name, 'reference': reference})
+            else:
+                references.append(target)
+        providers = [DATABASE_PROVIDERS[package] for package in project['packages']
+                     if package in DATABASE_PROVIDERS]
+        projects[name] = {
+            'path': os.path.relpath(path, solution_dir),
+            'role': _project_role(project),
+            'sdk': project['sdk'],
+            'frameworks': project['frameworks'],
+            'references': references,
+            'packages': project['packages'],
+            'database': providers[0] if providers else None,
+            'components': _components(classes[name]),
+        }
+    for project in projects.values():
+        project['referenced_by'] = []
+    for name, project in projects.items():
+        for target in project['references']:
+            projects[target]['referenced_by'].append(name)
+    return {'projects': projects, 'unresolved': unresolved}
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def resolve_solution(solution_path=DEFAULT_SOLUTION, cache_path=CACHE_PATH, graph_path=GRAPH_PATH,
+                     stats=None):
+    """Project graph of the solution, from the cached graph when no source changed
+
+    The result also carries 'sources', a digest of the files it was read from.
+    """
+    if not os.path.isfile(solution_path):
+        raise ValueError(f"No solution file at {solution_path}")
+    solution_dir = os.path.dirname(os.path.abspath(solution_path))
+    with open(solution_path, 'rb') as f:
+        raw = f.read()
+    entries = parse_solution(raw.decode('utf-8-sig'))
+    files = source_files(solution_path)[1:]
+    parsed = parse_files(files, cache_path, stats, parse=parse_solution_file, version=GRAPH_VERSION)
+
+    digest = hashlib.sha256(hashlib.sha256(raw).hexdigest().encode())
+    for path in files:
+        digest.update(f"{os.path.relpath(path, solution_dir)}:{parsed[path]['sha256']}\n".encode())
+    sources = digest.hexdigest()
+
+    cached = _read_json(graph_path) if graph_path else None
+    if cached and cached.get('version') == GRAPH_VERSION and cached.get('sources') == sources:
+        if stats is not None:
+            stats['graph'] = 'reused'
+        return cached['graph']
+
+    graph = build_graph(solution_path, entries,
+                        {os.path.abspath(path): parsed[path]['result'] for path in files})
+    graph['sources'] = sources
+    if stats is not None:
+        stats['graph'] = 'resolved'
+    if graph_path:
+        tmp = f'{graph_path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': GRAPH_VERSION, 'sources': sources, 'graph': graph}, f,
+                      separators=(',', ':'))
+        os.replace(tmp, graph_path)
+    return graph
+
+
+def sources_digest(solution_path, cache_path=CACHE_PATH):
+    """Hash over the solution, its project files and their sources, via the caches"""
+    return resolve_solution(solution_path, cache_path)['sources']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.solution',
+                                     description="Resolve the solution's project and component graph.")
+    parser.add_argument('solution', nargs='?', default=DEFAULT_SOLUTION,
+                        help='solution file (default: ../StudentProgressTracker.sln)')
+    parser.add_argument('--json', action='store_true', help='print the whole graph as JSON')
+    parser.add_argument('--no-cache', action='store_true', help='read every file and resolve again')
+    args = parser.parse_args(argv)
+
+    stats = {}
+    start = time.perf_counter()
+    try:
+        if args.no_cache:
+            graph = resolve_solution(args.solution, None, None, stats)
+        else:
+            graph = resolve_solution(args.solution, stats=stats)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if args.json:
+        print(json.dumps(graph, indent=2))
+        return 0
+    for name, project in graph['projects'].items():
+        counts = ', '.join(f'{len(items)} {key}' for key, items in project['components'].items() if items)
+        references = f" -> {', '.join(project['references'])}" if project['references'] else ''
+        print(f"{name:<32} {project['role']:<8} {';'.join(project['frameworks']):<28} {counts}{references}")
+    for entry in graph['unresolved']:
+        print(f"unresolved: {entry['project']} -> {entry['reference']}")
+    print(f"{len(graph['projects'])} projects in {elapsed:.1f} ms ({stats['parsed']} parsed, "
+          f"{stats['rehashed']} re-hashed, {stats['reused']} reused; graph {stats['graph']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,901 @@
+"""
+Declarative diagram specs
+
+A spec is a JSON, TOML or YAML document describing one diagram: its kind,
+canvas, title and content (tables and relationships, actors and messages,
+flowchart nodes and edges, or layers and components). `compile_spec` lays a
+spec out into a Scene; compiled scenes are cached on disk keyed by the spec's
+bytes, the compiler source and the files the spec reads, so re-rendering at
+another DPI or in another format skips parsing and layout entirely. The key
+is worked out from file stats: the spec's hash and the inputs it names come
+from a parse cache like schema.py's, and the inputs' digests from theirs, so
+a warm load neither parses the spec nor extracts the schema, app or
+solution.
+
+Spec kinds:
+    erd        tables (name, at, fields, pk, fk) and one-to-many relationships,
+               or a "schema" path to read them from the API's EF Core models
+    sequence   actors and the messages between them, top to bottom
+    flowchart  start/end, process and decision nodes on a grid, plus edges
+    layered    stacked layers holding component boxes, connectors and notes, or
+               an "app" path to lay out the MAUI app's pages and ViewModels, or
+               a "solution" path to lay out tiers from its projects
+
+Usage:
+    python -m diagrams.spec compile specs/erd.json
+    python -m diagrams.spec render specs/erd.json -o erd.svg --format svg
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+from .appindex import API_SERVICE, extract_app
+from .appindex import sources_digest as app_digest
+from .common import (PALETTES, draw_arrow, draw_decision, draw_process, draw_relationship,
+                     draw_start_end, draw_table, table_size)
+from .phases import phase, render_phase
+from .scene import Scene, SceneBuilder
+from .schema import extract_schema, parse_files
+from .schema import sources_digest as schema_digest
+from .solution import resolve_solution
+from .solution import sources_digest as solution_digest
+from .specfile import ROOT, SPECS_DIR, find_spec_file, list_specs, parse_spec
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, '.scene_cache')
+
+# Hash, mtime and size of every spec, and the inputs it names (see parse_files)
+SPEC_INDEX = os.path.join(CACHE_DIR, 'specs.json')
+
+# Bump when the spec index entries change
+SPEC_INDEX_VERSION = 1
+
+# Spec keys naming other inputs, and the digest of the files behind each
+SPEC_INPUTS = {'schema': schema_digest, 'app': app_digest, 'solution': solution_digest}
+
+# Sources whose changes invalidate every cached scene
+COMPILER_SOURCES = ['spec.py', 'specfile.py', 'scene.py', 'common.py', 'schema.py', 'layout.py',
+                    'appindex.py', 'solution.py']
+
+# Inches per data unit, and the narrowest canvas in data units, for
+# automatically sized canvases
+AUTO_SCALE = 1.2
+AUTO_MIN_WIDTH = 12
+
+# Width in data units of one page/ViewModel column, and the commands listed
+# per ViewModel before the rest are counted, in specs laid out from an app
+APP_COLUMN_WIDTH = 1.7
+APP_MAX_COMMANDS = 5
+
+_compiler_digest = None
+
+
+def _palette(spec, default):
+    colors = dict(PALETTES[spec.get('palette', default)])
+    colors.update(spec.get('colors', {}))
+    return colors
+
+
+def _color(colors, value):
+    """A palette entry by name, or the value itself if it is a literal color"""
+    return colors.get(value, value)
+
+
+def _builder(spec):
+    canvas = spec['canvas']
+    return SceneBuilder(canvas['size'], canvas.get('xlim', [0, 10]), canvas.get('ylim', [0, 10]),
+                        canvas.get('dpi', 150))
+
+
+def _title(scene, spec, colors):
+    if spec.get('title'):
+        x, y = spec['title_at']
+        scene.text(x, y, spec['title'], ha='center', va='top',
+                   fontsize=spec.get('title_size', 16), fontweight='bold', color=colors['text'])
+
+
+def _border_point(box, toward):
+    """Where the line from a box's center toward a point leaves the box"""
+    x, y, width, height = box
+    dx, dy = toward[0] - x, toward[1] - y
+    limits = [(width / 2) / abs(dx) if dx else float('inf'),
+              (height / 2) / abs(dy) if dy else float('inf')]
+    scale = min(limits)
+    if scale == float('inf'):
+        return x, y
+    return x + dx * scale, y + dy * scale
+
+
+def _erd_content(spec):
+    """Tables and relationships, from the spec or from the EF models it names
+
+    With "schema", tables, columns, keys and relationships all come from the
+    models; entries under "tables" and "relationships" then only place tables
+    ("at") and attach lines ("one_offset", "many_offset").
+    """
+    if 'schema' not in spec:
+        return ([dict(table) for table in spec['tables']],
+                [dict(rel) for rel in spec.get('relationships', [])])
+
+    schema = extract_schema(spec['schema'])
+    hints = {table['name']: table for table in spec.get('tables', [])}
+    order = {name: i for i, name in enumerate(hints)}
+    tables = []
+    for table in sorted(schema['tables'], key=lambda t: (order.get(t['name'], len(order)), t['name'])):
+        columns = table['columns']
+        tables.append({
+            'name': table['name'],
+            'at': hints.get(table['name'], {}).get('at'),
+            'fields': [column['name'] for column in columns],
+            'pk': [column['name'] for column in columns if column['pk']],
+            'fk': [column['name'] for column in columns if column['fk']],
+        })
+
+    offsets = {(rel['one'], rel['many']): rel for rel in spec.get('relationships', [])}
+    relationships = [dict(offsets.get((rel['one'], rel['many']), {}), one=rel['one'], many=rel['many'])
+                     for rel in schema['relationships']]
+    return tables, relationships
+
+
+def _layout_erd(spec, tables, relationships):
+    """Place every table with the layered layout and size the canvas to fit
+
+    Returns a copy of the spec with the computed canvas, title and legend
+    positions; the tables get their "at" filled in and hand-tuned line
+    offsets are dropped.
+    """
+    import numpy as np
+
+    from .layout import layered_layout
+
+    index = {table['name']: i for i, table in enumerate(tables)}
+    sizes = np.array([table_size(table['fields'], table['name']) for table in tables])
+    edges = [(index[rel['one']], index[rel['many']]) for rel in relationships]
+    centers, _ = layered_layout(sizes, edges)
+    for table, center in zip(tables, centers.tolist()):
+        table['at'] = center
+    for rel in relationships:
+        rel.pop('one_offset', None)
+        rel.pop('many_offset', None)
+
+    left = float((centers[:, 0] - sizes[:, 0] / 2).min()) - 1
+    right = float((centers[:, 0] + sizes[:, 0] / 2).max()) + 1
+    if right - left < AUTO_MIN_WIDTH:
+        pad = (AUTO_MIN_WIDTH - (right - left)) / 2
+        left, right = left - pad, right + pad
+    top = float((centers[:, 1] + sizes[:, 1] / 2).max()) + 1.8  # room for the title
+    bottom = float((centers[:, 1] - sizes[:, 1] / 2).min()) - 1
+
+    spec = dict(spec)
+    legend = spec.get('legend')
+    if legend:
+        step = legend.get('step', 0.3)
+        legend_y = bottom + 0.2
+        bottom -= 0.6 + (len(legend['items']) - 1) * step
+        spec['legend'] = dict(legend, at=legend.get('at', [left + 0.5, legend_y]))
+    spec['canvas'] = dict(spec.get('canvas', {}), xlim=[left, right], ylim=[bottom, top],
+                          size=[(right - left) * AUTO_SCALE, (top - bottom) * AUTO_SCALE])
+    spec.setdefault('title_at', [(left + right) / 2, top - 0.4])
+    return spec
+
+
+def compile_erd(spec):
+    """Tables with PK/FK fields and crow's foot relationships
+
+    With "layout": "layered", or when any table has no "at", every table is
+    placed automatically and the canvas is sized to the result.
+    """
+    colors = _palette(spec, 'erd')
+    spec_tables, spec_relationships = _erd_content(spec)
+    if spec.get('layout') == 'layered' or any(table.get('at') is None for table in spec_tables):
+        spec = _layout_erd(spec, spec_tables, spec_relationships)
+    scene = _builder(spec)
+
+    tables = {}
+    for table in spec_tables:
+        x, y = table['at']
+        draw_table(scene, x, y, table['name'], table['fields'], table.get('pk', []),
+                   table.get('fk', []), colors=colors)
+        tables[table['name']] = (x, y) + table_size(table['fields'], table['name'])
+
+    for rel in spec_relationships:
+        one, many = tables[rel['one']], tables[rel['many']]
+        if 'one_offset' in rel:
+            from_x, from_y = one[0] + rel['one_offset'][0], one[1] + rel['one_offset'][1]
+        else:
+            from_x, from_y = _border_point(one, many[:2])
+        if 'many_offset' in rel:
+            to_x, to_y = many[0] + rel['many_offset'][0], many[1] + rel['many_offset'][1]
+        else:
+            to_x, to_y = _border_point(many, one[:2])
+        draw_relationship(scene, from_x, from_y, to_x, to_y, rel.get('label', '1:M'),
+                          colors=colors)
+
+    legend = spec.get('legend')
+    if legend:
+        legend_x, legend_y = legend['at']
+        step = legend.get('step', 0.3)
+        for i, text in enumerate(legend['items']):
+            scene.text(legend_x, legend_y - i*step, text, ha='left', va='center',
+                       fontsize=9, color=colors['text'])
+
+    _title(scene, spec, colors)
+    return scene.build()
+
+
+def compile_sequence(spec):
+    """Actors with lifelines and the messages passed between them"""
+    colors = _palette(spec, 'sequence')
+    scene = _builder(spec)
+    layout = spec.get('layout', {})
+    left = layout.get('left', 1.5)
+    spacing = layout.get('spacing', 2.0)
+    top = layout.get('top', 9.5)
+    lifeline_top, lifeline_bottom = layout.get('lifeline', [top - 0.5, 0.5])
+    first = layout.get('first_message', top - 1.0)
+    step = layout.get('message_step', 1.0)
+
+    actor_x = {}
+    for i, actor in enumerate(spec['actors']):
+        x = left + i * spacing
+        actor_x[actor['id']] = x
+        # Actor box
+        scene.box(x-0.6, top-0.3, 1.2, 0.6,
+                  boxstyle="round,pad=0.05",
+                  edgecolor=colors['text'],
+                  facecolor='white',
+                  linewidth=2)
+        scene.text(x, top, actor['label'], ha='center', va='center', fontsize=9,
+                   fontweight='bold', color=colors['text'])
+        # Lifeline
+        scene.line(x, lifeline_top, x, lifeline_bottom,
+                   linestyle='--', color=colors['line'], linewidth=1.5, alpha=0.5)
+
+    label_style = dict(fontsize=8,
+                       bbox=dict(boxstyle='round,pad=0.3', facecolor='white',
+                                 edgecolor=colors['text'], linewidth=1, alpha=0.9))
+    for i, message in enumerate(spec['messages']):
+        from_x, to_x = actor_x[message['from']], actor_x[message['to']]
+        y = message.get('y', first - i * step)
+        if from_x != to_x:
+            scene.arrow(from_x, y, to_x, y,
+                        arrowstyle='->', mutation_scale=15,
+                        linewidth=2, color=colors['text'],
+                        zorder=3)
+            # Label above arrow
+            scene.text((from_x + to_x) / 2, y + 0.15, message['label'],
+                       ha='center', va='bottom', **label_style)
+        else:
+            # Self-call (loop)
+            scene.arc(from_x, y, 0.8, 0.4, 0, 180,
+                      angle=0, linewidth=2, color=colors['text'])
+            scene.arrow(from_x-0.4, y, from_x-0.35, y-0.05,
+                        arrowstyle='->', mutation_scale=10,
+                        linewidth=2, color=colors['text'])
+            scene.text(from_x + 0.5, y + 0.15, message['label'],
+                       ha='left', va='bottom', **label_style)
+
+    _title(scene, spec, colors)
+    return scene.build()
+
+
+FLOWCHART_SHAPES = {
+    # shape: (draw function, default width, default height)
+    'process': (draw_process, 2, 0.6),
+    'decision': (draw_decision, 1.8, 1.2),
+    'start_end': (draw_start_end, 2.2, 0.6),
+}
+
+
+def _port(node, side):
+    x, y, width, height = node
+    return {
+        'top': (x, y + height/2),
+        'bottom': (x, y - height/2),
+        'left': (x - width/2, y),
+        'right': (x + width/2, y),
+    }[side]
+
+
+def compile_flowchart(spec):
+    """Start/end, process and decision nodes joined by arrows"""
+    colors = _palette(spec, 'flowchart')
+    scene = _builder(spec)
+    grid = spec.get('grid', {})
+    top = grid.get('top', 0)
+    row_height = grid.get('row_height', 0.9)
+
+    nodes = {}
+    for node in spec['nodes']:
+        draw, width, height = FLOWCHART_SHAPES[node['shape']]
+        width, height = node.get('size', (width, height))
+        x = node['x']
+        y = node['y'] if 'y' in node else top - row_height * node['row']
+        draw(scene, x, y, node['text'], width, height, colors=colors)
+        nodes[node['id']] = (x, y, width, height)
+
+    for edge in spec.get('edges', []):
+        from_side = edge.get('from_side', 'bottom')
+        x1, y1 = _port(nodes[edge['from']], from_side)
+        x2, y2 = _port(nodes[edge['to']], edge.get('to_side', 'top'))
+        draw_arrow(scene, x1, y1, x2, y2, edge.get('label'), edge.get('label_pos', 'right'),
+                   colors=colors)
+        if edge.get('tag'):
+            # Bold branch marker next to where the edge leaves its node
+            ha, offset = ('right', -0.3) if from_side == 'left' else ('left', 0.3)
+            scene.text(x1 + offset, y1, edge['tag'], ha=ha, va='center', fontsize=8,
+                       fontweight='bold', color=_color(colors, edge.get('tag_color', 'text')))
+
+    _title(scene, spec, colors)
+
+    legend = spec.get('legend')
+    if legend:
+        legend_x, legend_y = legend['at']
+        step = legend.get('step', 0.4)
+        for i, item in enumerate(legend['items']):
+            y = legend_y - i*step
+            color = colors[item['shape']]
+            if item['shape'] == 'start_end':
+                scene.box(legend_x, y, 0.3, 0.15,
+                          boxstyle="round,pad=0.05",
+                          facecolor=color, edgecolor=colors['text'],
+                          linewidth=1, alpha=0.3)
+            elif item['shape'] == 'process':
+                scene.box(legend_x, y, 0.3, 0.15,
+                          boxstyle="round,pad=0.05",
+                          facecolor='white', edgecolor=color, linewidth=1.5)
+            else:
+                scene.diamond(legend_x + 0.15, y, 0.3, 0.15,
+                              facecolor='white', edgecolor=color, linewidth=1.5)
+            scene.text(legend_x + 0.4, y, item['text'],
+                       ha='left', va='center', fontsize=8, color=colors['text'])
+
+    return scene.build()
+
+
+def _text_style(colors, item, default_color):
+    """matplotlib text keywords for a note or connector label"""
+    color = _color(colors, item.get('color', default_color))
+    style = dict(ha=item.get('ha', 'center'), va=item.get('va', 'center'),
+                 fontsize=item.get('fontsize', 9), color=color)
+    if item.get('bold'):
+        style['fontweight'] = 'bold'
+    if item.get('italic'):
+        style['fontstyle'] = 'italic'
+    if item.get('rotation'):
+        style['rotation'] = item['rotation']
+    if item.get('boxed'):
+        style['bbox'] = dict(boxstyle='round,pad=0.3', facecolor='white',
+                             edgecolor=color, linewidth=1.5)
+    return style
+
+
+def _text_height(lines, fontsize):
+    """Height in data units of `lines` lines of text on an automatically sized canvas"""
+    return lines * fontsize * 1.35 / 72 / AUTO_SCALE
+
+
+def _layout_app(spec):
+    """Layers, components and connectors from the MAUI app the spec names
+
+    One column per page and the ViewModel it binds to, then a service layer
+    with an arrow from every ViewModel to each service injected into it. Pages
+    sharing a ViewModel sit side by side, with the ViewModel centered under
+    them. The service layer's label goes under its boxes, clear of the arrows
+    coming in from above. The spec's title, palette and legend are kept; the
+    canvas is sized to fit.
+    """
+    app = extract_app(spec['app'])
+    max_commands = spec.get('max_commands', APP_MAX_COMMANDS)
+    # Group pages by ViewModel, in the order each ViewModel first appears
+    groups = {}
+    for i, pair in enumerate(app['pairs']):
+        groups.setdefault(pair['viewmodel'] or i, []).append(pair)
+    pairs = [pair for group in groups.values() for pair in group]
+    services = sorted((name for name, service in app['services'].items() if service['used_by']),
+                      key=lambda name: (name != API_SERVICE, -len(app['services'][name]['used_by']), name))
+    if not pairs:
+        raise ValueError(f"no ViewModels found under {spec['app']}")
+
+    def viewmodel_text(name):
+        viewmodel = app['viewmodels'][name]
+        commands = viewmodel['commands']
+        lines = [name] + [f'• {command}' for command in commands[:max_commands]]
+        if len(commands) > max_commands:
+            lines.append(f'+{len(commands) - max_commands} more')
+        lines.append(f"API calls: {len(viewmodel['api_calls'])}")
+        return '\n'.join(lines)
+
+    def service_text(name):
+        if name == API_SERVICE:
+            endpoints = set().union(*(vm['api_calls'] for vm in app['viewmodels'].values()))
+            return f'{name}\n(HTTP, {len(endpoints)}\nendpoints used)'
+        calls = app['services'][name]['api_calls']
+        return f'{name}\n(calls {API_SERVICE}: {len(calls)})' if calls else name
+
+    column = APP_COLUMN_WIDTH
+    width = max(len(pairs), len(services) * 1.25) * column
+    left, right = -1.0, width + 1.0
+    if right - left < AUTO_MIN_WIDTH:
+        pad = (AUTO_MIN_WIDTH - (right - left)) / 2
+        left, right = left - pad, right + pad
+    center = (left + right) / 2
+    box_width = column - 0.15
+
+    def layer(label, color, top, texts, fontsize, prefix, xs, label_below=False):
+        """`xs` maps each of `texts`' keys to the x of its box"""
+        lines = max(text.count('\n') + 1 for text in texts.values())
+        height = _text_height(lines, fontsize) + 0.2
+        if label_below:
+            row_y = top - 0.3 - height / 2
+            label_y = row_y - height / 2 - 0.3
+            bottom = label_y - 0.3
+        else:
+            label_y = top - 0.3
+            row_y = top - 0.6 - height / 2
+            bottom = row_y - height / 2 - 0.3
+        return bottom, {
+            'label': label, 'label_at': [center, label_y], 'label_size': 12,
+            'color': color, 'box': [left + 0.3, bottom, right - left - 0.6, top - bottom], 'alpha': 0.15,
+            'component_size': [box_width, height], 'component_fontsize': fontsize,
+            'components': [{'text': text, 'at': [xs[name], row_y], 'id': f'{prefix}:{name}'}
+                           for name, text in texts.items()],
+        }
+
+    def mean_xs(key):
+        """x of every distinct page or ViewModel: the mean of the columns it appears in"""
+        columns = {}
+        for pair, x in zip(pairs, xs):
+            if pair[key]:
+                columns.setdefault(pair[key], []).append(x)
+        return {name: sum(column_xs) / len(column_xs) for name, column_xs in columns.items()}
+
+    xs = [(i + 0.5) * column + (width - len(pairs) * column) / 2 for i in range(len(pairs))]
+    pages = {pair['page']: f"{pair['page']}\n({' + '.join(pair['wiring']) or 'no binding'})"
+             for pair in pairs if pair['page']}
+    viewmodels = {pair['viewmodel']: viewmodel_text(pair['viewmodel']) for pair in pairs if pair['viewmodel']}
+    service_column = width / max(len(services), 1)
+    service_xs = {name: (i + 0.5) * service_column for i, name in enumerate(services)}
+
+    top = 0.0
+    layers = []
+    bottom, view_layer = layer('View Layer (XAML Pages)', 'view', top - 1.2,
+                               pages or {'-': 'no pages'}, 8, 'page', mean_xs('page') or {'-': center})
+    layers.append(view_layer)
+    bottom, viewmodel_layer = layer('ViewModel Layer (Commands & Observable Properties)', 'viewmodel',
+                                    bottom - 0.5, viewmodels, 7, 'vm', mean_xs('viewmodel'))
+    layers.append(viewmodel_layer)
+    if services:
+        bottom, service_layer = layer('Service Layer (injected into ViewModels)', 'model', bottom - 0.7,
+                                      {name: service_text(name) for name in services}, 8, 'service',
+                                      service_xs, label_below=True)
+        layers.append(service_layer)
+
+    connectors = [{'from': f"page:{pair['page']}", 'to': f"vm:{pair['viewmodel']}", 'style': '<->',
+                   'color': 'binding', 'width': 2, 'mutation_scale': 12}
+                  for pair in pairs if pair['page'] and pair['viewmodel']]
+    connectors += [{'from': f'vm:{name}', 'to': f'service:{service}', 'color': 'arrow', 'width': 0.8,
+                    'mutation_scale': 10}
+                   for name in viewmodels for service in app['viewmodels'][name]['services']
+                   if service in services]
+
+    spec = dict(spec, layers=layers, connectors=connectors, notes=spec.get('notes', []))
+    legend = spec.get('legend')
+    if legend:
+        step = legend.get('step', 0.25)
+        spec['legend'] = dict(legend, at=legend.get('at', [left + 0.5, bottom - 0.4]))
+        bottom -= 0.6 + len(legend['items']) * step
+    else:
+        bottom -= 0.3
+    spec['canvas'] = dict(spec.get('canvas', {}), xlim=[left, right], ylim=[bottom, top],
+                          size=[(right - left) * AUTO_SCALE, (top - bottom) * AUTO_SCALE])
+    spec.setdefault('title_at', [center, top - 0.35])
+    return spec
+
+
+def _wrap_names(names, per_line=3):
+    """Names joined with commas, `per_line` to a line"""
+    return ',\n'.join(', '.join(names[i:i + per_line]) for i in range(0, len(names), per_line))
+
+
+def _tier_components(projects):
+    """(text, size) of the component boxes of one tier's projects"""
+    items = []
+    for name, project in projects:
+        parts = project['components']
+        prefix = f'{name}\n' if len(projects) > 1 else ''
+        if parts['pages']:
+            items.append(f"{prefix}Views\n({len(parts['pages'])} XAML pages)")
+        if parts['viewmodels']:
+            items.append(f"{prefix}ViewModels\n({len(parts['viewmodels'])}, MVVM pattern)")
+        if parts['controllers']:
+            items.append(f"{prefix}Controllers\n({_wrap_names(parts['controllers'])})")
+        if parts['services']:
+            services = [service.removesuffix('Service') or service for service in parts['services']]
+            items.append(f"{prefix}Services\n({_wrap_names(services)})")
+        if parts['models'] and not parts['pages']:
+            items.append(f"{prefix}Models\n({_wrap_names(parts['models'])})")
+        for context in parts['dbcontexts']:
+            items.append(f"{prefix}DbContext\n({context['name']},\nEntity Framework Core)")
+        if parts['dtos']:
+            items.append(f"{prefix}DTOs\n({len(parts['dtos'])} request/response types)")
+        if not any(parts.values()):
+            items.append(f"{name}\n({', '.join(project['frameworks'])})")
+    return items
+
+
+def _component_size(text, fontsize):
+    lines = text.split('\n')
+    width = max(len(line) for line in lines) * fontsize * 0.62 / 72 / AUTO_SCALE + 0.4
+    return [max(width, 1.8), _text_height(len(lines), fontsize) + 0.3]
+
+
+def _layout_solution(spec):
+    """Client, API and database tiers from the solution the spec names
+
+    Client (MAUI) and API (ASP.NET Core) projects each get a tier of their
+    components; the database tier lists the tables of the API's DbContexts.
+    Libraries the tiers reference sit in a column on the right, and test
+    projects are listed in a note. Tier labels and link labels come from
+    "tiers".
+    """
+    graph = resolve_solution(spec['solution'])
+    tiers = spec.get('tiers', {})
+    by_role = {}
+    for name, project in graph['projects'].items():
+        by_role.setdefault(project['role'], []).append((name, project))
+    fontsize = spec.get('component_fontsize', 10)
+
+    rows = []
+    for role in ('client', 'api'):
+        if by_role.get(role):
+            names = ', '.join(name for name, _ in by_role[role])
+            label = tiers.get(role, {}).get('label', names)
+            rows.append((role, label, _tier_components(by_role[role])))
+    contexts = [context for _, project in by_role.get('api', []) for context in project['components']['dbcontexts']]
+    if contexts:
+        providers = {project['database'] for _, project in by_role['api'] if project['database']}
+        label = tiers.get('database', {}).get('label', f"{' / '.join(sorted(providers)) or 'Relational'} Database")
+        tables = list(dict.fromkeys(table for context in contexts for table in context['tables']))
+        rows.append(('database', label, [f'Tables:\n{_wrap_names(tables, 4)}']))
+    if not rows:
+        raise ValueError(f"no client or API projects in {spec['solution']}")
+
+    sizes = [[_component_size(text, fontsize) for text in items] for _, _, items in rows]
+    gap = 0.5
+    width = max(sum(size[0] for size in row) + gap * (len(row) - 1) for row in sizes) + 1.2
+    libraries = [(name, project) for name, project in by_role.get('library', [])
+                 if any(name in project_['references'] for role in ('client', 'api')
+                        for _, project_ in by_role.get(role, []))]
+    library_items = _tier_components(libraries) if libraries else []
+    library_sizes = [_component_size(text, fontsize) for text in library_items]
+    library_width = max((size[0] for size in library_sizes), default=0) + 0.8
+
+    left = 0.0
+    right = width + (library_width + 0.8 if libraries else 0)
+    top = 0.0
+    y = top - 1.3
+    layers = []
+    connectors = []
+    notes = []
+    tier_boxes = {}
+    for (role, label, items), row_sizes in zip(rows, sizes):
+        height = max(size[1] for size in row_sizes) + 1.0
+        bottom = y - height
+        if layers:
+            link = tiers.get(role, {}).get('link')
+            connectors.append({'from': [width / 2, y + 0.6], 'to': [width / 2, y], 'color': 'connection',
+                               'width': 2.5})
+            if link:
+                connectors[-1]['label'] = {'text': link, 'at': [width / 2 + 0.3, y + 0.3], 'ha': 'left',
+                                           'fontsize': 10, 'bold': True, 'boxed': True}
+        total = sum(size[0] for size in row_sizes) + gap * (len(row_sizes) - 1)
+        x = (width - total) / 2
+        components = []
+        for text, size in zip(items, row_sizes):
+            components.append({'text': text, 'at': [x + size[0] / 2, bottom + (height - 0.6) / 2],
+                               'size': size})
+            x += size[0] + gap
+        layers.append({'label': label, 'label_at': [width / 2, y - 0.3], 'label_size': 14,
+                       'color': role, 'box': [0, bottom, width, height], 'alpha': 0.2,
+                       'component_fontsize': fontsize, 'components': components})
+        tier_boxes[role] = (y, bottom)
+        y = bottom - 0.6
+    bottom = y + 0.6
+
+    if libraries:
+        x = width + 0.8
+        span_top = max(box[0] for role, box in tier_boxes.items() if role != 'database')
+        span_bottom = min(box[1] for role, box in tier_boxes.items() if role != 'database')
+        label = tiers.get('library', {}).get('label', 'Shared Libraries')
+        names = '\n'.join(name for name, _ in libraries)
+        components = []
+        stack = sum(size[1] for size in library_sizes) + gap * (len(library_sizes) - 1)
+        cy = (span_top - 0.6 * len(libraries) + span_bottom) / 2 + stack / 2
+        for text, size in zip(library_items, library_sizes):
+            components.append({'text': text, 'at': [x + library_width / 2, cy - size[1] / 2], 'size': size})
+            cy -= size[1] + gap
+        layers.append({'label': f'{label}\n{names}', 'label_at': [x + library_width / 2, span_top - 0.5],
+                       'label_size': 11, 'color': 'library', 'box': [x, span_bottom, library_width,
+                                                                      span_top - span_bottom],
+                       'alpha': 0.2, 'component_fontsize': fontsize, 'components': components})
+        for role in ('client', 'api'):
+            if role in tier_boxes and any(name in project['references'] for name, _ in libraries
+                                          for _, project in by_role.get(role, [])):
+                mid = sum(tier_boxes[role]) / 2
+                connectors.append({'from': [width, mid], 'to': [x, mid], 'color': 'library',
+                                   'width': 1.5, 'linestyle': '--',
+                                   'label': {'text': 'project\nreference', 'at': [width + 0.4, mid + 0.3],
+                                             'fontsize': 8, 'italic': True, 'color': 'library'}})
+
+    tests = by_role.get('test', [])
+    if tests:
+        lines = [f"{name} → {', '.join(project['references']) or 'no project references'}"
+                 for name, project in tests]
+        notes.append({'text': 'Test projects:\n' + '\n'.join(lines), 'at': [0.2, bottom - 0.3],
+                      'ha': 'left', 'va': 'top', 'fontsize': 9, 'italic': True})
+        bottom -= 0.4 + _text_height(len(lines) + 1, 9)
+    bottom -= 0.4
+
+    spec = dict(spec, layers=layers, connectors=connectors + spec.get('connectors', []),
+                notes=notes + spec.get('notes', []))
+    spec['canvas'] = dict(spec.get('canvas', {}), xlim=[left - 0.4, right + 0.4], ylim=[bottom, top],
+                          size=[(right - left + 0.8) * AUTO_SCALE, (top - bottom) * AUTO_SCALE])
+    spec.setdefault('title_at', [(left + right) / 2, top - 0.35])
+    return spec
+
+
+def compile_layered(spec):
+    """Stacked layers of component boxes with connectors between them
+
+    With "app", the layers are laid out from the MAUI app's Views,
+    ViewModels and services (see appindex.py); with "solution", from the
+    projects of a Visual Studio solution (see solution.py).
+    """
+    colors = _palette(spec, 'architecture')
+    if 'app' in spec:
+        spec = _layout_app(spec)
+    elif 'solution' in spec:
+        spec = _layout_solution(spec)
+    scene = _builder(spec)
+
+    components = {}
+    for layer in spec['layers']:
+        color = _color(colors, layer['color'])
+        x, y, width, height = layer['box']
+        scene.box(x, y, width, height,
+                  boxstyle="round,pad=0.1",
+                  edgecolor=color,
+                  facecolor=color,
+                  linewidth=2, alpha=layer.get('alpha', 0.2))
+        label_x, label_y = layer.get('label_at', (x + width/2, y + height - 0.3))
+        scene.text(label_x, label_y, layer['label'],
+                   ha='center', va='center', fontsize=layer.get('label_size', 14),
+                   fontweight='bold', color=colors['text'])
+
+        items = layer.get('components', [])
+        default_size = layer.get('component_size', [1.6, 0.6])
+        default_y = layer.get('component_y', y + height * 0.45)
+        for i, component in enumerate(items):
+            comp_width, comp_height = component.get('size', default_size)
+            comp_x, comp_y = component.get('at', (x + width * (i + 0.5) / len(items), default_y))
+            scene.box(comp_x - comp_width/2, comp_y - comp_height/2, comp_width, comp_height,
+                      boxstyle="round,pad=0.05",
+                      edgecolor=color,
+                      facecolor='white',
+                      linewidth=1.5)
+            scene.text(comp_x, comp_y, component['text'], ha='center', va='center',
+                       fontsize=component.get('fontsize', layer.get('component_fontsize', 10)),
+                       color=colors['text'])
+            if 'id' in component:
+                components[component['id']] = (comp_x, comp_y, comp_width, comp_height)
+
+    for connector in spec.get('connectors', []):
+        start, end = connector['from'], connector['to']
+        # Component ids connect bottom-center to top-center
+        x1, y1 = _port(components[start], 'bottom') if isinstance(start, str) else start
+        x2, y2 = _port(components[end], 'top') if isinstance(end, str) else end
+        color = _color(colors, connector.get('color', 'text'))
+        style = dict(arrowstyle=connector.get('style', '->'),
+                     mutation_scale=connector.get('mutation_scale', 20),
+                     linewidth=connector.get('width', 2), color=color, zorder=3)
+        if 'linestyle' in connector:
+            style['linestyle'] = connector['linestyle']
+        scene.arrow(x1, y1, x2, y2, **style)
+        label = connector.get('label')
+        if label:
+            label_x, label_y = label['at']
+            scene.text(label_x, label_y, label['text'],
+                       **_text_style(colors, label, connector.get('color', 'text')))
+
+    for note in spec.get('notes', []):
+        note_x, note_y = note['at']
+        scene.text(note_x, note_y, note['text'], **_text_style(colors, note, 'text'))
+
+    _title(scene, spec, colors)
+
+    legend = spec.get('legend')
+    if legend:
+        legend_x, legend_y = legend['at']
+        step = legend.get('step', 0.25)
+        for i, item in enumerate(legend['items']):
+            scene.rect(legend_x, legend_y - i*step, 0.2, 0.15,
+                       facecolor=_color(colors, item['color']), edgecolor=colors['text'],
+                       linewidth=1)
+            scene.text(legend_x + 0.3, legend_y - i*step + 0.075, item['text'],
+                       ha='left', va='center', fontsize=8, color=colors['text'])
+
+    return scene.build()
+
+
+COMPILERS = {
+    'erd': compile_erd,
+    'sequence': compile_sequence,
+    'flowchart': compile_flowchart,
+    'layered': compile_layered,
+}
+
+
+def compile_spec(spec, source='<spec>'):
+    """Lay a parsed spec out into a Scene"""
+    kind = spec.get('kind')
+    if kind not in COMPILERS:
+        raise ValueError(f"{source}: unknown spec kind {kind!r} "
+                         f"(expected one of: {', '.join(COMPILERS)})")
+    try:
+        return COMPILERS[kind](spec)
+    except KeyError as e:
+        raise ValueError(f"{source}: missing or unknown reference {e}") from None
+
+
+def compiler_digest():
+    """Hash of the code that turns specs into scenes"""
+    global _compiler_digest
+    if _compiler_digest is None:
+        digest = hashlib.sha256()
+        for source in COMPILER_SOURCES:
+            with open(os.path.join(PACKAGE_DIR, source), 'rb') as f:
+                digest.update(f.read())
+        _compiler_digest = digest.hexdigest()
+    return _compiler_digest
+
+
+def _resolve(name_or_path):
+    if os.path.exists(name_or_path):
+        return name_or_path
+    path = find_spec_file(name_or_path)
+    if path is None:
+        raise ValueError(f"No spec named '{name_or_path}' in {SPECS_DIR}")
+    return path
+
+
+def _spec_inputs(text, path):
+    """The inputs a spec names, as recorded in the spec index"""
+    spec = parse_spec(text.encode('utf-8'), path)
+    return {key: spec[key] for key in SPEC_INPUTS if key in spec}
+
+
+def scene_key(path, use_cache=True):
+    """Cache key of the scene compiled from the spec at `path`
+
+    Covers the spec's bytes, the compiler source and the digest of every
+    input the spec names (scenes laid out from the EF models go stale when
+    any model file changes). Unchanged files are only stat'ed.
+    """
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+    entry = parse_files([path], SPEC_INDEX if use_cache else None, parse=_spec_inputs,
+                        version=SPEC_INDEX_VERSION)[path]
+    key_data = (entry['sha256'] + compiler_digest()).encode()
+    for name, inputs in sorted(entry['result'].items()):
+        key_data += SPEC_INPUTS[name](inputs).encode()
+    return hashlib.sha256(key_data).hexdigest()[:16]
+
+
+def load_scene(name_or_path, use_cache=True):
+    """Compiled scene for a spec name or path, from the on-disk cache when possible"""
+    path = _resolve(name_or_path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cached = os.path.join(CACHE_DIR, f'{stem}-{scene_key(path, use_cache)}.npz')
+
+    if use_cache and os.path.exists(cached):
+        try:
+            return Scene.load(cached)
+        except (OSError, ValueError):
+            pass  # unreadable or stale format; recompile below
+
+    with open(path, 'rb') as f:
+        spec = parse_spec(f.read(), path)
+    with phase('compile', spec=stem):
+        scene = compile_spec(spec, path)
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Drop scenes compiled from older versions of this spec
+        for entry in os.listdir(CACHE_DIR):
+            if entry.startswith(f'{stem}-') and entry.endswith('.npz') and len(entry) == len(stem) + 21:
+                os.remove(os.path.join(CACHE_DIR, entry))
+        tmp = f'{cached}.{os.getpid()}.tmp'
+        scene.save(tmp)
+        os.replace(tmp, cached)
+    return scene
+
+
+def render_spec(name_or_path, output, dpi=300, fmt='png'):
+    """Render a spec (by name in specs/ or by path) to `output`"""
+    return render_spec_outputs(name_or_path, [(output, dpi, fmt)])[0]
+
+
+def render_spec_outputs(name_or_path, outputs):
+    """Render a spec once to every (output, dpi, fmt) in `outputs`"""
+    with render_phase(_diagram_name(name_or_path)):
+        with phase('import', module=f'{__package__}.draw'):
+            from .draw import render_scene_outputs
+        with phase('scene'):
+            scene = load_scene(name_or_path)
+        return render_scene_outputs(scene, outputs)
+
+
+def _diagram_name(name_or_path):
+    return os.path.splitext(os.path.basename(name_or_path))[0]
+
+
+class SpecDiagram:
+    """A diagram defined only by a spec file, with the same render() as a diagram module"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def render(self, output, dpi=300, fmt='png'):
+        return render_spec(self.name, output, dpi=dpi, fmt=fmt)
+
+    def render_outputs(self, outputs):
+        return render_spec_outputs(self.name, outputs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.spec',
+                                     description='Compile and render diagram specs.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    compile_cmd = commands.add_parser('compile', help='compile specs and report the scene sizes')
+    compile_cmd.add_argument('specs', nargs='*', help='spec names or paths (default: all in specs/)')
+    compile_cmd.add_argument('--no-cache', action='store_true', help='always recompile')
+    render_cmd = commands.add_parser('render', help='render one spec')
+    render_cmd.add_argument('spec', help='spec name or path')
+    render_cmd.add_argument('-o', '--output', required=True)
+    render_cmd.add_argument('--dpi', type=int, default=300)
+    render_cmd.add_argument('--format', dest='fmt', default=None,
+                            help='output format (default: from the output extension)')
+    args = parser.parse_args(argv)
+
+    try:
+        return _run(args)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+def _run(args):
+    if args.command == 'render':
+        fmt = args.fmt or os.path.splitext(args.output)[1].lstrip('.') or 'png'
+        from .draw import STATS
+
+        draws = STATS['draws']
+        render_spec(args.spec, args.output, args.dpi, fmt)
+        draws = STATS['draws'] - draws
+        print(f"{args.spec} saved as {args.output} ({draws} draw{'s' if draws != 1 else ''})")
+        return 0
+
+    for name in args.specs or list_specs():
+        start = time.perf_counter()
+        scene = load_scene(name, use_cache=not args.no_cache)
+        elapsed = (time.perf_counter() - start) * 1000
+        counts = ', '.join(f'{count} {kind}' for kind, count in scene.counts().items())
+        print(f"{name}: {len(scene)} primitives ({counts}), {len(scene.style_table)} styles, "
+              f"{len(scene.strings)} strings in {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Locating and parsing spec files
+
+Kept apart from spec.py so the build cache can read a spec's inputs without
+importing the scene compiler (and numpy with it).
+"""
+import json
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPECS_DIR = os.path.join(ROOT, 'specs')
+
+SPEC_EXTENSIONS = ('.json', '.toml', '.yaml', '.yml')
+
+
+def find_spec_file(name):
+    """Path of the spec for diagram `name` in specs/, or None"""
+    for ext in SPEC_EXTENSIONS:
+        path = os.path.join(SPECS_DIR, name + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def list_specs():
+    """Names of all specs in specs/, sorted"""
+    if not os.path.isdir(SPECS_DIR):
+        return []
+    return sorted(os.path.splitext(entry)[0] for entry in os.listdir(SPECS_DIR)
+                  if entry.endswith(SPEC_EXTENSIONS))
+
+
+def parse_spec(raw, path):
+    """Parse spec bytes according to the file extension of `path`
+
+    Paths inside the spec that name other inputs (such as "schema", "app" and
+    "solution") are resolved against the directory the spec lives in.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        spec = json.loads(raw)
+    elif ext == '.toml':
+        import tomllib
+        spec = tomllib.loads(raw.decode('utf-8'))
+    elif ext in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"{path}: YAML specs need PyYAML (pip install pyyaml)")
+        spec = yaml.safe_load(raw)
+    else:
+        raise ValueError(f"{path}: unsupported spec format '{ext}'")
+    if not isinstance(spec, dict):
+        raise ValueError(f"{path}: a spec must be a mapping")
+    for key in ('schema', 'app', 'solution'):
+        if key in spec:
+            spec[key] = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(path)), spec[key]))
+    return spec
+
+
+def read_spec(path):
+    """Raw bytes and parsed contents of a spec file"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return raw, parse_spec(raw, path)
@@ -0,0 +1,445 @@
+"""
+Tiled rendering and deep-zoom tile pyramids
+
+A full 300 DPI raster of a large diagram needs width x height x 4 bytes at
+once (about 160 MB for the ERD, several GB for a schema poster). Here the
+figure is built and laid out once and then rasterized one tile at a time:
+each tile is saved through its own crop box, so Agg only ever allocates a
+tile-sized canvas, and artists entirely outside the tile are hidden while it
+is drawn. Peak memory is tied to the tile size, not the canvas size.
+
+The tiles are written as a Deep Zoom pyramid (`<stem>.dzi` plus
+`<stem>_files/<level>/<col>_<row>.png`, readable by OpenSeadragon and other
+Deep Zoom viewers), with a small self-contained HTML viewer next to it.
+Level `max` holds the full-resolution tiles; each level below is half the
+size of the one above and is built by averaging 2x2 blocks of its four child
+tiles, read back from disk, so no level is ever held in memory. A stitched
+PNG of the full image can be streamed out as well, one row of tiles at a
+time.
+
+Tiles match a single full render except where Agg clips dashed lines at the
+tile edge, which restarts their dash pattern there. Each tile is drawn with
+a TILE_MARGIN border that is cropped away, so solid lines and arrows that
+cross the edge join up exactly.
+
+Usage:
+    python -m diagrams.tiles erd -o build/erd_tiles
+    python -m diagrams.tiles erd -o build/erd_tiles --tile-size 512 --stitch build/database_erd.png
+    python -m diagrams.tiles erd -o build/erd_tiles --dpi 600 --memory-limit 64   # tile size to fit
+"""
+import argparse
+import io
+import math
+import os
+import struct
+import sys
+import time
+import zlib
+
+DEFAULT_TILE_SIZE = 256
+
+# Smallest tile a memory limit may pick; below this the per-tile overhead
+# of laying out and saving the figure dominates
+MIN_TILE_SIZE = 16
+
+# Extra pixels drawn around every tile and cropped away, so strokes that
+# Agg clips at the canvas edge are cut outside the kept area
+TILE_MARGIN = 16
+
+DZI_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{tile}" Overlap="0" Format="png">
+  <Size Width="{width}" Height="{height}"/>
+</Image>
+'''
+
+VIEWER_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>html, body {{ margin: 0; height: 100%; overflow: hidden; background: #fff; }}
+canvas {{ display: block; cursor: grab; }}</style>
+</head>
+<body>
+<canvas id="view"></canvas>
+<script>
+const W = {width}, H = {height}, TILE = {tile}, MAX = {max_level}, DIR = "{stem}_files";
+const canvas = document.getElementById("view"), ctx = canvas.getContext("2d");
+const tiles = new Map();
+let scale, x, y;  // screen position = (image position - [x, y]) * scale
+
+function fit() {{
+  canvas.width = innerWidth;
+  canvas.height = innerHeight;
+  scale = Math.min(canvas.width / W, canvas.height / H);
+  x = (W - canvas.width / scale) / 2;
+  y = (H - canvas.height / scale) / 2;
+}}
+
+function tile(level, col, row) {{
+  const key = level + "/" + col + "_" + row;
+  let img = tiles.get(key);
+  if (!img) {{
+    img = new Image();
+    img.onload = draw;
+    img.src = DIR + "/" + key + ".png";
+    tiles.set(key, img);
+  }}
+  return img;
+}}
+
+function draw() {{
+  ctx.fillStyle = "#fff";
+  ctx.fillRect(0, 0, canvas.width, canvas.height);
+  // The coarsest level that still has at least one pixel per screen pixel
+  const level = Math.max(0, Math.min(MAX, MAX + Math.ceil(Math.log2(scale))));
+  const factor = Math.pow(2, MAX - level), span = TILE * factor;
+  const c0 = Math.max(0, Math.floor(x / span)), r0 = Math.max(0, Math.floor(y / span));
+  const c1 = Math.min(Math.ceil(W / span), Math.ceil((x + canvas.width / scale) / span));
+  const r1 = Math.min(Math.ceil(H / span), Math.ceil((y + canvas.height / scale) / span));
+  for (let r = r0; r < r1; r++) {{
+    for (let c = c0; c < c1; c++) {{
+      const img = tile(level, c, r);
+      if (img.complete && img.naturalWidth) {{
+        ctx.drawImage(img, (c * span - x) * scale, (r * span - y) * scale,
+                      img.naturalWidth * factor * scale, img.naturalHeight * factor * scale);
+      }}
+    }}
+  }}
+}}
+
+let drag = null;
+canvas.onmousedown = e => {{ drag = [e.clientX, e.clientY]; }};
+onmouseup = () => {{ drag = null; }};
+onmousemove = e => {{
+  if (!drag) return;
+  x -= (e.clientX - drag[0]) / scale;
+  y -= (e.clientY - drag[1]) / scale;
+  drag = [e.clientX, e.clientY];
+  draw();
+}};
+canvas.onwheel = e => {{
+  e.preventDefault();
+  const px = x + e.clientX / scale, py = y + e.clientY / scale;
+  scale *= Math.exp(-e.deltaY * 0.002);
+  x = px - e.clientX / scale;
+  y = py - e.clientY / scale;
+  draw();
+}};
+onresize = () => {{ fit(); draw(); }};
+fit();
+draw();
+</script>
+</body>
+</html>
+'''
+
+
+class TiledRender:
+    """A laid-out diagram that can be rasterized tile by tile
+
+    `width` and `height` are the pixel size of the full image, the same as
+    a single render at `dpi` would produce.
+    """
+
+    def __init__(self, scene, dpi=300):
+        from . import draw
+
+        meta = scene.meta
+        self.dpi = dpi
+        with draw.pinned():
+            self._build(scene, meta, dpi)
+
+    def _build(self, scene, meta, dpi):
+        import numpy as np
+        from matplotlib.text import Text
+
+        from . import draw
+
+        self.fig, ax = draw.new_figure(meta['figsize'], meta['xlim'], meta['ylim'], meta['dpi'])
+        draw.draw_scene(ax, scene)
+        draw.tight_layout(self.fig, ax)
+        self.crop = draw.tight_bbox(self.fig, ax, dpi)
+        # Agg truncates fractional pixels, except within 1e-8 of the next one
+        self.width = int(self.crop.width * dpi + 1e-8)
+        self.height = int(self.crop.height * dpi + 1e-8)
+
+        # Figure-inch extents of every artist, for skipping those outside a tile
+        layout_dpi = self.fig.dpi
+        self.fig.dpi = dpi
+        renderer = draw.measuring_renderer(dpi)
+        self.artists = [*ax.texts, *ax.patches, *ax.lines, *ax.collections]
+        extents = []
+        for artist in self.artists:
+            if isinstance(artist, Text):
+                extent = draw.text_extent(artist, dpi).extents
+                # The box behind a label reaches past the text
+                pad = artist.get_fontsize() * dpi / 72 if artist.get_bbox_patch() else 0
+            else:
+                extent = artist.get_window_extent(renderer).extents
+                linewidth = artist.get_linewidth()
+                pad = (linewidth if np.ndim(linewidth) == 0 else max(linewidth, default=0)) * dpi / 72
+            extents.append(extent + [-pad - 2, -pad - 2, pad + 2, pad + 2])
+        self.fig.dpi = layout_dpi
+        self.extents = np.array(extents).reshape(-1, 4) / dpi
+        # Collections without data limits cannot be placed; always draw them
+        self.always = ~np.isfinite(self.extents).all(axis=1)
+
+    def grid(self, tile_size):
+        """Number of (columns, rows) of tiles covering the image"""
+        return math.ceil(self.width / tile_size), math.ceil(self.height / tile_size)
+
+    def render_tile(self, left, top, width, height):
+        """RGBA pixels (height, width, 4) of the image region at (left, top)"""
+        import numpy as np
+        from matplotlib.transforms import Bbox
+
+        dpi, margin = self.dpi, TILE_MARGIN
+        x0 = self.crop.x0 + (left - margin) / dpi
+        y1 = self.crop.y0 + (self.height - top + margin) / dpi
+        # The 1e-6 pixel keeps float error from truncating the canvas a pixel short
+        box = Bbox.from_extents(x0, y1 - (height + 2 * margin + 1e-6) / dpi,
+                                x0 + (width + 2 * margin + 1e-6) / dpi, y1)
+        visible = self.always | ((self.extents[:, 0] <= box.x1) & (self.extents[:, 2] >= box.x0)
+                                 & (self.extents[:, 1] <= box.y1) & (self.extents[:, 3] >= box.y0))
+        for artist, show in zip(self.artists, visible.tolist()):
+            artist.set_visible(show)
+        from . import draw
+
+        buffer = io.BytesIO()
+        # Per tile rather than around tiles(), so the pins never leak into the caller between tiles
+        with draw.pinned():
+            self.fig.savefig(buffer, format='raw', dpi=dpi, bbox_inches=box,
+                             facecolor='white', edgecolor='none')
+        pixels = np.frombuffer(buffer.getbuffer(), dtype=np.uint8)
+        pixels = pixels.reshape(height + 2 * margin, width + 2 * margin, 4)
+        return pixels[margin:margin + height, margin:margin + width]
+
+    def tiles(self, tile_size):
+        """Yield (column, row, RGBA pixels) for every tile, row by row"""
+        try:
+            columns, rows = self.grid(tile_size)
+            for row in range(rows):
+                top = row * tile_size
+                for column in range(columns):
+                    left = column * tile_size
+                    yield column, row, self.render_tile(
+                        left, top, min(tile_size, self.width - left), min(tile_size, self.height - top))
+        finally:
+            for artist in self.artists:
+                artist.set_visible(True)
+
+
+class PngStream:
+    """Write an RGB PNG a band of rows at a time
+
+    Rows use the Up filter (the difference to the row above), computed for a
+    whole band at once; only the last row of the previous band is kept.
+    """
+
+    def __init__(self, path, width, height, level=6):
+        import numpy as np
+
+        self._file = open(path, 'wb')
+        self._compressor = zlib.compressobj(level)
+        self._previous = np.zeros(width * 3, dtype=np.uint8)
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self._file.write(struct.pack('>I', len(data)) + kind + data)
+        self._file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def write_rows(self, rows):
+        """Append rows given as an (n, width, 3) uint8 array"""
+        import numpy as np
+
+        flat = rows.reshape(len(rows), -1)
+        filtered = np.empty((len(rows), flat.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2  # Up
+        filtered[0, 1:] = flat[0] - self._previous
+        filtered[1:, 1:] = flat[1:] - flat[:-1]
+        self._previous = flat[-1].copy()
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            self._chunk(b'IDAT', data)
+
+    def close(self):
+        self._chunk(b'IDAT', self._compressor.flush())
+        self._chunk(b'IEND', b'')
+        self._file.close()
+
+
+def level_sizes(width, height):
+    """(width, height) of every Deep Zoom level, from level 0 (1x1) to full size"""
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    return [(math.ceil(width / 2 ** (max_level - level)), math.ceil(height / 2 ** (max_level - level)))
+            for level in range(max_level + 1)]
+
+
+def raster_bytes(tile_size, width, stitch=False):
+    """Largest amount of pixel memory a tiled render holds at once, in bytes
+
+    The tile canvas (RGBA, with its margin) and the copies made while
+    encoding it, the 2x2 block of child tiles a lower level is built from,
+    and with `stitch` one row of tiles of the full image.
+    """
+    canvas = (tile_size + 2 * TILE_MARGIN) ** 2 * 4
+    total = 2 * canvas + (2 * tile_size) ** 2 * 3 * 2
+    if stitch:
+        total += tile_size * width * 3 * 2
+    return total
+
+
+def tile_size_for(memory_limit, width, height, stitch=False):
+    """Largest power-of-two tile size whose pixel buffers fit in `memory_limit` bytes
+
+    Tiles are not made larger than the image needs. Raises ValueError if
+    not even MIN_TILE_SIZE fits.
+    """
+    if raster_bytes(MIN_TILE_SIZE, width, stitch) > memory_limit:
+        raise ValueError(f"even {MIN_TILE_SIZE} px tiles need about "
+                         f"{raster_bytes(MIN_TILE_SIZE, width, stitch) / 2**20:.1f} MB of pixel memory "
+                         f"for a {width}x{height} image{' with stitching' if stitch else ''}, over the "
+                         f"{memory_limit / 2**20:.1f} MB limit")
+    tile_size = MIN_TILE_SIZE
+    while tile_size < max(width, height) and raster_bytes(2 * tile_size, width, stitch) <= memory_limit:
+        tile_size *= 2
+    return tile_size
+
+
+def write_pyramid(scene, output_dir, stem, dpi=300, tile_size=None, stitch=None,
+                  memory_limit=None, viewer=True):
+    """Render `scene` tile by tile into a Deep Zoom pyramid in `output_dir`
+
+    `stitch` is an optional path for the full image as one PNG.
+    `memory_limit` (bytes) caps the pixel buffers the render holds at once
+    (see raster_bytes): without a `tile_size` the largest tile size that
+    fits is used, and an explicit `tile_size` over the limit raises
+    ValueError before rendering. The tile size defaults to
+    DEFAULT_TILE_SIZE. Returns a summary dict.
+    """
+    import numpy as np
+    from PIL import Image
+
+    start = time.perf_counter()
+    render = TiledRender(scene, dpi)
+    if tile_size is None:
+        tile_size = (DEFAULT_TILE_SIZE if memory_limit is None
+                     else tile_size_for(memory_limit, render.width, render.height, stitch is not None))
+    needed = raster_bytes(tile_size, render.width, stitch is not None)
+    if memory_limit is not None and needed > memory_limit:
+        raise ValueError(f"tiles of {tile_size} px need about {needed / 2**20:.1f} MB of pixel memory "
+                         f"for a {render.width}x{render.height} image"
+                         f"{' with stitching' if stitch else ''}, over the "
+                         f"{memory_limit / 2**20:.1f} MB limit; use a smaller --tile-size, or leave "
+                         f"it out to pick one that fits")
+
+    sizes = level_sizes(render.width, render.height)
+    max_level = len(sizes) - 1
+    files_dir = os.path.join(output_dir, f'{stem}_files')
+
+    def tile_path(level, column, row):
+        return os.path.join(files_dir, str(level), f'{column}_{row}.png')
+
+    # Full-resolution level, streamed into the stitched image row by row
+    os.makedirs(os.path.join(files_dir, str(max_level)), exist_ok=True)
+    png = strip = None
+    if stitch:
+        png = PngStream(stitch, render.width, render.height)
+        strip = np.empty((tile_size, render.width, 3), dtype=np.uint8)
+    count = 0
+    for column, row, pixels in render.tiles(tile_size):
+        rgb = pixels[:, :, :3]
+        Image.fromarray(rgb).save(tile_path(max_level, column, row))
+        count += 1
+        if png is not None:
+            left = column * tile_size
+            strip[:len(rgb), left:left + rgb.shape[1]] = rgb
+            if left + rgb.shape[1] == render.width:
+                png.write_rows(strip[:len(rgb)])
+    if png is not None:
+        png.close()
+
+    # Every lower level from the four child tiles of the level above
+    for level in range(max_level - 1, -1, -1):
+        os.makedirs(os.path.join(files_dir, str(level)), exist_ok=True)
+        child_width, child_height = sizes[level + 1]
+        columns, rows = math.ceil(sizes[level][0] / tile_size), math.ceil(sizes[level][1] / tile_size)
+        for row in range(rows):
+            for column in range(columns):
+                height = min(2 * tile_size, child_height - 2 * row * tile_size)
+                width = min(2 * tile_size, child_width - 2 * column * tile_size)
+                block = Image.new('RGB', (width, height))
+                for dy in range(2):
+                    for dx in range(2):
+                        top, left = dy * tile_size, dx * tile_size
+                        if top < height and left < width:
+                            with Image.open(tile_path(level + 1, 2 * column + dx, 2 * row + dy)) as child:
+                                block.paste(child, (left, top))
+                # 2x2 box filter; a last odd row or column is averaged on its own
+                block.reduce(2).save(tile_path(level, column, row))
+                count += 1
+
+    with open(os.path.join(output_dir, f'{stem}.dzi'), 'w', encoding='utf-8') as f:
+        f.write(DZI_TEMPLATE.format(tile=tile_size, width=render.width, height=render.height))
+    if viewer:
+        with open(os.path.join(output_dir, f'{stem}.html'), 'w', encoding='utf-8') as f:
+            f.write(VIEWER_TEMPLATE.format(title=stem, width=render.width, height=render.height,
+                                           tile=tile_size, max_level=max_level, stem=stem))
+    return {
+        'width': render.width,
+        'height': render.height,
+        'levels': len(sizes),
+        'tiles': count,
+        'tile_size': tile_size,
+        'raster_bytes': needed,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    from . import DIAGRAMS, default_output
+    from .spec import load_scene
+
+    parser = argparse.ArgumentParser(prog='python -m diagrams.tiles',
+                                     description='Render a diagram tile by tile into a Deep Zoom pyramid.')
+    parser.add_argument('name', help=f"diagram to render (one of: {', '.join(DIAGRAMS)}) or a spec path")
+    parser.add_argument('-o', '--output-dir', required=True, help='directory for the pyramid')
+    parser.add_argument('--dpi', type=int, default=300, help='full-resolution DPI (default: 300)')
+    parser.add_argument('--tile-size', type=int,
+                        help=f'tile edge in pixels (default: {DEFAULT_TILE_SIZE}, or the largest that fits '
+                             f'--memory-limit)')
+    parser.add_argument('--stitch', metavar='PNG', help='also write the full image to this PNG')
+    parser.add_argument('--memory-limit', type=float, metavar='MB',
+                        help='cap on the pixel buffers held at once: picks the tile size, or refuses '
+                             'a --tile-size that would need more')
+    parser.add_argument('--no-viewer', action='store_true', help='do not write the HTML viewer')
+    args = parser.parse_args(argv)
+
+    if args.tile_size is not None and args.tile_size < 1:
+        parser.error('--tile-size must be positive')
+    if args.name in DIAGRAMS:
+        stem = os.path.splitext(default_output(args.name))[0]
+    else:
+        stem = os.path.splitext(os.path.basename(args.name))[0]
+    try:
+        scene = load_scene(args.name)
+        os.makedirs(args.output_dir, exist_ok=True)
+        summary = write_pyramid(scene, args.output_dir, stem, args.dpi, args.tile_size, args.stitch,
+                                None if args.memory_limit is None else int(args.memory_limit * 2**20),
+                                viewer=not args.no_viewer)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.name}: {summary['width']}x{summary['height']} px, {summary['levels']} levels, "
+          f"{summary['tiles']} tiles of {summary['tile_size']} px in {summary['seconds']:.2f}s "
+          f"(about {summary['raster_bytes'] / 2**20:.1f} MB of pixel buffers)")
+    print(f"Deep Zoom image: {os.path.join(args.output_dir, stem + '.dzi')}")
+    if args.stitch:
+        print(f"Stitched image: {args.stitch}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,439 @@
+"""
+Visual regression checks for the rendered diagrams
+
+`approve` records the approved PNGs in a small index: per image, the file's
+SHA-256, its pixel size, a perceptual hash and a downsampled copy. `check`
+compares fresh renders against it, cheapest test first:
+
+1. File SHA-256. Identical bytes need no decoding at all.
+2. The perceptual hash of the downsampled image (box-filtered so the longest
+   side is at most THUMBNAIL_SIZE px), cut into a HASH_GRID x HASH_GRID grid
+   of tiles with a dHash (the sign of horizontal gradients on a
+   HASH_SIZE x HASH_SIZE grid) per tile. The check fails when any tile's
+   hash is more than the maximum distance (in bits) from the approved one.
+   Re-encoding, antialiasing and sub-pixel shifts flip a few bits per tile;
+   a renamed label or a moved box flips many more in the tiles it touches,
+   where a single hash of the whole image would average it away.
+3. Only for a failing image: a vectorized NumPy diff of the two thumbnails.
+   Pixels whose channels differ by more than the tolerance are highlighted
+   in an overlay (the new image faded, changes in red) written for
+   reviewers.
+
+The index lives in visual_baseline.json (hashes, readable in review) and
+visual_baseline.npz (the approved thumbnails).
+
+Decoding a 300 DPI PNG is mostly zlib inflating its full RGBA raster, about
+0.5 s for the ERD, so thumbnails are cached in .visual_cache/ keyed by the
+file's path and stat. Renders seed the cache from the canvas they were just
+encoded from, and pngopt from the image it decoded anyway, so a check right
+after a build decodes nothing.
+
+Usage:
+    python -m diagrams.visual approve                 # the current PNGs become the baseline
+    python -m diagrams.visual check                   # exit 1 if any diagram changed
+    python -m diagrams.visual check database_erd.png --max-distance 16 --diff-dir /tmp/diffs
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import DIAGRAMS, default_output
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'visual_baseline.json')
+DIFF_DIR = os.path.join(ROOT, 'visual_diffs')
+
+# Thumbnails of the latest file written under each image name, keyed by its stat
+THUMBNAIL_CACHE = os.path.join(ROOT, '.visual_cache')
+
+INDEX_VERSION = 2
+
+# Longest side of the thumbnails that are hashed and diffed
+THUMBNAIL_SIZE = 768
+
+# Tiles per side of the thumbnail, each hashed on its own
+HASH_GRID = 8
+
+# dHash grid of one tile; HASH_SIZE ** 2 bits per tile
+HASH_SIZE = 16
+
+# Most bits any tile's dHash may differ by before the image counts as changed.
+# Antialiasing, gamma, JPEG re-encoding and half-pixel shifts of the committed
+# diagrams flip at most 7; a renamed label flips 18, a moved box 33
+DEFAULT_MAX_DISTANCE = 10
+
+# Largest per-channel difference (0-255) between thumbnails not highlighted in the overlay
+DEFAULT_TOLERANCE = 16
+
+# Changed pixels are grown by this many thumbnail pixels in the overlay so
+# that thin strokes stay visible
+HIGHLIGHT_RADIUS = 2
+
+
+def default_images():
+    """The PNG file names of every registered diagram"""
+    return [default_output(name, 'png') for name in DIAGRAMS]
+
+
+def thumbnail_of(image):
+    """Box-filter a PIL image so its longest side is at most THUMBNAIL_SIZE
+
+    Returns (RGB uint8 array, full image size).
+    """
+    import numpy as np
+
+    size = image.size
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA')
+    factor = math.ceil(max(size) / THUMBNAIL_SIZE)
+    if factor > 1:
+        image = image.reduce(factor)
+    return np.asarray(image.convert('RGB')), size
+
+
+def _cache_file(path):
+    return os.path.join(THUMBNAIL_CACHE, os.path.basename(path) + '.npz')
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return f'{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}'
+
+
+def cached_thumbnail(path):
+    """The cached thumbnail of the PNG at `path`, if the file has not changed since; else None"""
+    import numpy as np
+
+    try:
+        with np.load(_cache_file(path)) as cached:
+            if str(cached['key']) == _stat_key(path):
+                return cached['pixels'], tuple(cached['size'].tolist())
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def store_thumbnail(path, pixels, size):
+    """Cache the thumbnail of the PNG at `path` under the file's current stat"""
+    import numpy as np
+
+    os.makedirs(THUMBNAIL_CACHE, exist_ok=True)
+    target = _cache_file(path)
+    # Per thread, since check stores from a pool
+    tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, key=np.array(_stat_key(path)), pixels=pixels, size=np.array(size))
+    os.replace(tmp, target)
+
+
+def remember(path, image):
+    """Seed the cache with `image`, the PIL image just written to `path`
+
+    Only images in the baseline are cached, since only they get checked.
+    """
+    if os.path.basename(path) in load_baseline(BASELINE)['images']:
+        store_thumbnail(path, *thumbnail_of(image))
+
+
+def thumbnail(path):
+    """Thumbnail of the PNG at `path` from the cache, or decoded and box-filtered
+
+    Returns (RGB uint8 array, full image size).
+    """
+    from PIL import Image
+
+    cached = cached_thumbnail(path)
+    if cached is not None:
+        return cached
+    with Image.open(path) as image:
+        pixels, size = thumbnail_of(image)
+    store_thumbnail(path, pixels, size)
+    return pixels, size
+
+
+def dhash(pixels):
+    """Difference hash of every tile of an RGB thumbnail, row by row, as one hex string"""
+    import numpy as np
+    from PIL import Image
+
+    gray = np.asarray(Image.fromarray(pixels).convert('L'))
+    height, width = gray.shape
+    bits = []
+    for row in range(HASH_GRID):
+        for column in range(HASH_GRID):
+            tile = gray[row * height // HASH_GRID:(row + 1) * height // HASH_GRID,
+                        column * width // HASH_GRID:(column + 1) * width // HASH_GRID]
+            small = Image.fromarray(np.ascontiguousarray(tile)).resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+            grid = np.asarray(small, dtype=np.int16)
+            bits.append((grid[:, 1:] > grid[:, :-1]).ravel())
+    return np.packbits(np.concatenate(bits)).tobytes().hex()
+
+
+def tile_distances(a, b):
+    """Number of differing bits between two tiled dHashes, per tile, row by row"""
+    import numpy as np
+
+    xor = np.frombuffer(bytes.fromhex(a), np.uint8) ^ np.frombuffer(bytes.fromhex(b), np.uint8)
+    return np.unpackbits(xor).reshape(HASH_GRID ** 2, HASH_SIZE ** 2).sum(axis=1)
+
+
+def describe(path):
+    """Index entry and thumbnail for one image"""
+    from .cache import file_sha256
+
+    pixels, size = thumbnail(path)
+    entry = {'sha256': file_sha256(path), 'size': list(size), 'dhash': dhash(pixels)}
+    return entry, pixels
+
+
+def load_baseline(path=BASELINE):
+    """The index of the approved images, or an empty one"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {'version': INDEX_VERSION, 'images': {}}
+    if index.get('version') != INDEX_VERSION:
+        return {'version': INDEX_VERSION, 'images': {}}
+    return index
+
+
+def load_thumbnails(path=BASELINE, names=None):
+    """The approved thumbnails stored beside the index, by name (only `names`, if given)"""
+    import numpy as np
+
+    thumbnails_path = os.path.splitext(path)[0] + '.npz'
+    if not os.path.exists(thumbnails_path):
+        return {}
+    with np.load(thumbnails_path) as archive:
+        return {name: archive[name] for name in archive.files if names is None or name in names}
+
+
+def _save_npz(file, arrays):
+    """np.savez_compressed with fixed member timestamps, so the same thumbnails give the same bytes"""
+    import zipfile
+
+    from numpy.lib import format as npy
+
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name in sorted(arrays):
+            info = zipfile.ZipInfo(f'{name}.npy', date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w', force_zip64=True) as member:
+                npy.write_array(member, arrays[name], allow_pickle=False)
+
+
+def approve(paths, baseline=BASELINE):
+    """Record the given PNGs as the approved images, keeping other entries"""
+    index = load_baseline(baseline)
+    thumbnails = load_thumbnails(baseline, index['images'])
+    for path in paths:
+        name = os.path.basename(path)
+        index['images'][name], thumbnails[name] = describe(path)
+    index['images'] = dict(sorted(index['images'].items()))
+    index.update(thumbnail_size=THUMBNAIL_SIZE, hash_grid=HASH_GRID, hash_size=HASH_SIZE)
+
+    # Write both files before replacing either, so an interrupted approve
+    # leaves the old baseline whole
+    stem = os.path.splitext(baseline)[0]
+    with open(f'{stem}.tmp.npz', 'wb') as f:
+        _save_npz(f, thumbnails)
+    with open(f'{baseline}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(f'{stem}.tmp.npz', f'{stem}.npz')
+    os.replace(f'{baseline}.tmp', baseline)
+    return index
+
+
+def diff_thumbnails(approved, current, tolerance=DEFAULT_TOLERANCE):
+    """Boolean mask of thumbnail pixels that changed by more than `tolerance`
+
+    Thumbnails of different sizes are compared on a white canvas covering
+    both.
+    """
+    import numpy as np
+
+    height = max(approved.shape[0], current.shape[0])
+    width = max(approved.shape[1], current.shape[1])
+    if approved.shape != current.shape:
+        approved, current = (np.pad(a, ((0, height - a.shape[0]), (0, width - a.shape[1]), (0, 0)),
+                                    constant_values=255) for a in (approved, current))
+    delta = np.abs(approved.astype(np.int16) - current).max(axis=2)
+    return delta > tolerance
+
+
+def write_overlay(current, mask, path):
+    """Save the new thumbnail faded to a light gray with the changes in red"""
+    import numpy as np
+    from PIL import Image
+
+    height, width = mask.shape
+    canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+    canvas[:current.shape[0], :current.shape[1]] = current
+    faded = (canvas.mean(axis=2, keepdims=True) * 0.35 + 255 * 0.65).astype(np.uint8)
+    overlay = np.repeat(faded, 3, axis=2)
+
+    # Grow the mask by a square of HIGHLIGHT_RADIUS with shifted maxima
+    grown = mask.copy()
+    for shift in range(1, HIGHLIGHT_RADIUS + 1):
+        grown[shift:] |= mask[:-shift]
+        grown[:-shift] |= mask[shift:]
+    rows = grown.copy()
+    for shift in range(1, HIGHLIGHT_RADIUS + 1):
+        grown[:, shift:] |= rows[:, :-shift]
+        grown[:, :-shift] |= rows[:, shift:]
+    overlay[grown] = (255, 160, 160)
+    overlay[mask] = (220, 0, 0)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    Image.fromarray(overlay).save(path)
+
+
+def compare_image(path, entry, approved, max_distance=DEFAULT_MAX_DISTANCE, tolerance=DEFAULT_TOLERANCE,
+                  diff_dir=DIFF_DIR):
+    """Compare a render whose bytes differ from the approved file; returns a result dict
+
+    `approved` is the approved thumbnail. `status` is 'equivalent' (same
+    perceptual hash), 'within tolerance' (no tile's hash is more than
+    `max_distance` bits off) or 'changed' (a tile is, or the size changed).
+    """
+    name = os.path.basename(path)
+    result = {'image': name}
+    pixels, size = thumbnail(path)
+    distances = tile_distances(dhash(pixels), entry['dhash'])
+    result['hash_distance'] = int(distances.max())
+    result['tiles_changed'] = int((distances > max_distance).sum())
+    if list(size) != entry['size']:
+        result['size'] = f"{entry['size'][0]}x{entry['size'][1]} -> {size[0]}x{size[1]}"
+    elif not result['tiles_changed']:
+        result['status'] = 'within tolerance' if result['hash_distance'] else 'equivalent'
+        return result
+
+    result['status'] = 'changed'
+    mask = diff_thumbnails(approved, pixels, tolerance)
+    changed = int(mask.sum())
+    result['changed_pixels'] = changed
+    result['changed_fraction'] = changed / mask.size
+    if changed:
+        import numpy as np
+
+        rows, columns = np.nonzero(mask)
+        scale = max(size) / max(pixels.shape[:2])
+        # Bounding box of the changes in full-size pixels
+        result['region'] = [int(columns.min() * scale), int(rows.min() * scale),
+                            int(math.ceil((columns.max() + 1) * scale)),
+                            int(math.ceil((rows.max() + 1) * scale))]
+    overlay = os.path.join(diff_dir, os.path.splitext(name)[0] + '-diff.png')
+    write_overlay(pixels, mask, overlay)
+    result['overlay'] = overlay
+    return result
+
+
+def check(paths, baseline=BASELINE, max_distance=DEFAULT_MAX_DISTANCE, tolerance=DEFAULT_TOLERANCE,
+          diff_dir=DIFF_DIR, jobs=None):
+    """Check every path against the baseline; returns a list of result dicts
+
+    `status` is 'identical' (same bytes), 'missing', 'new' (not in the
+    baseline) or one of compare_image's. Images whose bytes differ are
+    decoded and compared on `jobs` threads (default: one per CPU).
+    """
+    from .cache import file_sha256
+
+    index = load_baseline(baseline)
+    results = {}
+    pending = []
+    for path in paths:
+        name = os.path.basename(path)
+        entry = index['images'].get(name)
+        if not os.path.exists(path):
+            results[path] = {'image': name, 'status': 'missing'}
+        elif entry is None:
+            results[path] = {'image': name, 'status': 'new'}
+        elif file_sha256(path) == entry['sha256']:
+            results[path] = {'image': name, 'status': 'identical'}
+        else:
+            pending.append((path, entry))
+
+    if pending:
+        thumbnails = load_thumbnails(baseline, {os.path.basename(path) for path, _ in pending})
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+            futures = {path: pool.submit(compare_image, path, entry, thumbnails[os.path.basename(path)],
+                                         max_distance, tolerance, diff_dir)
+                       for path, entry in pending}
+            for path, future in futures.items():
+                results[path] = future.result()
+    return [results[path] for path in paths]
+
+
+def _print_result(result):
+    details = []
+    if 'size' in result:
+        details.append(f"size {result['size']}")
+    if 'changed_pixels' in result:
+        details.append(f"{result['changed_fraction']:.3%} of thumbnail pixels differ")
+    if 'hash_distance' in result:
+        details.append(f"dHash distance {result['hash_distance']}/{HASH_SIZE ** 2}"
+                       + (f" in {result['tiles_changed']} tile(s)" if result.get('tiles_changed') else ''))
+    if 'region' in result:
+        details.append('region {}'.format(','.join(map(str, result['region']))))
+    line = f"  {result['image']:<28} {result['status']}"
+    if details:
+        line += f" ({'; '.join(details)})"
+    print(line)
+    if 'overlay' in result:
+        print(f"  {'':<28} overlay: {result['overlay']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.visual',
+                                     description='Check rendered diagrams against approved images.')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='baseline index (default: visual_baseline.json, thumbnails in the .npz beside it)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    approve_cmd = commands.add_parser('approve', help='record PNGs as the approved images')
+    approve_cmd.add_argument('paths', nargs='*', metavar='png',
+                             help='images to approve (default: every diagram PNG)')
+
+    check_cmd = commands.add_parser('check', help='compare PNGs with the approved images')
+    check_cmd.add_argument('paths', nargs='*', metavar='png',
+                           help='images to check (default: every diagram PNG)')
+    check_cmd.add_argument('--max-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                           help=f'most bits a tile\'s dHash may differ by (default: {DEFAULT_MAX_DISTANCE})')
+    check_cmd.add_argument('--tolerance', type=int, default=DEFAULT_TOLERANCE,
+                           help=f'largest per-channel difference left out of the overlay '
+                                f'(default: {DEFAULT_TOLERANCE})')
+    check_cmd.add_argument('--diff-dir', default=DIFF_DIR,
+                           help='where highlight overlays are written (default: visual_diffs)')
+    args = parser.parse_args(argv)
+
+    paths = args.paths or [os.path.join(ROOT, image) for image in default_images()]
+    start = time.perf_counter()
+    if args.command == 'approve':
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            parser.error(f"no such image(s): {', '.join(missing)}")
+        approve(paths, args.baseline)
+        print(f"Approved {len(paths)} image(s) in {args.baseline}")
+        return 0
+
+    results = check(paths, args.baseline, args.max_distance, args.tolerance, args.diff_dir)
+    for result in results:
+        _print_result(result)
+    failed = [result for result in results if result['status'] in ('changed', 'missing', 'new')]
+    elapsed = time.perf_counter() - start
+    if failed:
+        print(f"{len(failed)} of {len(results)} image(s) differ from the baseline ({elapsed * 1000:.0f} ms)")
+        return 1
+    print(f"All {len(results)} image(s) match the baseline ({elapsed * 1000:.0f} ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
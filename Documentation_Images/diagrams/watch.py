@@ -0,0 +1,195 @@
+"""
+Watch mode: re-render diagrams as their inputs change, in one warm process
+
+matplotlib is imported, its fonts loaded and every diagram rendered once at
+start-up; after that the process polls the inputs of each diagram (its
+module and spec, the shared drawing code, the C# models of schema-driven
+specs, the Views and ViewModels of app-driven ones and the projects of
+solution-driven ones) and re-renders only the diagrams a change affects.
+Bursts of writes, such as an editor's save or a `git checkout`, are
+debounced into one render. When package code changes, the diagrams modules
+are re-imported before rendering; matplotlib and its font caches stay warm.
+
+PNGs are written with draw.FAST_PNG, at zlib level 1: the same pixels as a
+normal build, encoded about twice as fast into files about twice the size.
+Run generate_all_diagrams.py --optimize balanced for the committed encoding.
+
+Usage:
+    python -m diagrams.watch                        # every diagram, into this directory
+    python -m diagrams.watch csv_export_flow erd --output-dir build
+    python -m diagrams.watch --variant png --variant svg --debounce 0.2
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+import traceback
+
+import diagrams
+from . import DIAGRAMS, appindex, cache, schema, solution, variant_type
+from .specfile import SPECS_DIR, find_spec_file, read_spec
+
+# Seconds between polls of the watched files
+POLL_INTERVAL = 0.05
+
+# Seconds without further changes before a burst of changes is rendered
+DEBOUNCE = 0.1
+
+# Package code every render runs besides cache.SHARED_SOURCES
+RENDER_SOURCES = ['pngopt.py']
+
+
+def watch_map(names):
+    """{path: set of diagram names} for every input of the given diagrams
+
+    Directories that can gain inputs are included too, and the map is
+    rebuilt after every change. specs/ maps to no diagram: editors that save
+    by renaming touch it on every save of a spec.
+    """
+    watched = {SPECS_DIR: set()}
+    for path in (os.path.join(cache.PACKAGE_DIR, source) for source in RENDER_SOURCES):
+        watched.setdefault(path, set()).update(names)
+    for name in names:
+        own, shared = cache.diagram_sources(name)
+        for path in own + shared:
+            watched.setdefault(path, set()).add(name)
+        spec_path = find_spec_file(name)
+        try:
+            _, spec = read_spec(spec_path) if spec_path else (None, {})
+        except (OSError, ValueError):
+            # A spec saved half-way or with a typo; its render reports the error
+            spec = {}
+        if 'schema' in spec:
+            directories = [os.path.join(spec['schema'], sub) for sub in schema.SOURCE_DIRS]
+            for path in schema.source_files(spec['schema']) + directories:
+                watched.setdefault(path, set()).add(name)
+        if 'app' in spec:
+            directories = [os.path.join(spec['app'], sub) for sub in appindex.SOURCE_DIRS]
+            for path in appindex.source_files(spec['app']) + directories:
+                watched.setdefault(path, set()).add(name)
+        if 'solution' in spec:
+            files = solution.source_files(spec['solution'])
+            for path in files + sorted({os.path.dirname(path) for path in files}):
+                watched.setdefault(path, set()).add(name)
+    return watched
+
+
+def snapshot(paths):
+    """(mtime, size) of every path, None for the ones that do not exist"""
+    state = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            state[path] = None
+        else:
+            state[path] = (stat.st_mtime_ns, stat.st_size)
+    return state
+
+
+def reload_code():
+    """Forget the imported diagrams modules so the next render imports fresh code"""
+    for module in [name for name in sys.modules if name.startswith('diagrams.')]:
+        if module != __name__:
+            del sys.modules[module]
+    importlib.reload(diagrams)
+
+
+def render(name, variants, output_dir, fast=True):
+    """Render one diagram to every variant; returns (outputs, seconds) or raises"""
+    importlib.import_module('diagrams.draw').FAST_PNG = fast
+    start = time.perf_counter()
+    outputs = diagrams.render_outputs(name, diagrams.variant_outputs(name, variants, output_dir))
+    return outputs, time.perf_counter() - start
+
+
+def render_all(names, variants, output_dir, fast=True, saved_at=None):
+    """Render the given diagrams, reporting each one without stopping on errors
+
+    `saved_at` is the wall-clock time of the change that triggered the
+    render, used to report the save-to-output latency.
+    """
+    for name in names:
+        try:
+            outputs, seconds = render(name, variants, output_dir, fast)
+        except Exception:
+            print(f"[{time.strftime('%H:%M:%S')}] {name} failed:")
+            print(traceback.format_exc().strip())
+            continue
+        latency = f", {time.time() - saved_at:.2f}s after save" if saved_at else ''
+        print(f"[{time.strftime('%H:%M:%S')}] {name} -> {', '.join(outputs)} ({seconds:.2f}s render{latency})")
+        sys.stdout.flush()
+
+
+def watch(names, variants, output_dir='.', fast=True, debounce=DEBOUNCE, interval=POLL_INTERVAL,
+          initial=True):
+    """Render, then poll the inputs and re-render affected diagrams until interrupted"""
+    os.makedirs(output_dir, exist_ok=True)
+    if initial:
+        render_all(names, variants, output_dir, fast)
+    watched = watch_map(names)
+    state = snapshot(watched)
+    print(f"Watching {len(watched)} files for {', '.join(names)} (Ctrl-C to stop)")
+    sys.stdout.flush()
+
+    changed = set()
+    last_change = 0.0
+    while True:
+        time.sleep(interval)
+        current = snapshot(watched)
+        if current != state:
+            changed.update(path for path in watched if current[path] != state[path])
+            state = current
+            last_change = time.perf_counter()
+            continue
+        if not changed or time.perf_counter() - last_change < debounce:
+            continue
+
+        affected = set()
+        for path in changed:
+            affected |= watched[path]
+        if any(path.endswith('.py') for path in changed):
+            reload_code()
+        saved_at = max((state[path][0] / 1e9 for path in changed if state[path]), default=None)
+        render_all([name for name in names if name in affected], variants, output_dir, fast, saved_at)
+        changed.clear()
+
+        # New or deleted model files and specs change what is watched
+        watched = watch_map(names)
+        state = snapshot(watched)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m diagrams.watch',
+                                     description='Re-render diagrams whenever their inputs change.')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"diagrams to watch (default: all of {', '.join(DIAGRAMS)})")
+    parser.add_argument('--output-dir', default='.', help='directory to write into')
+    parser.add_argument('--variant', dest='variants', action='append', type=variant_type, metavar='FMT[@DPI]',
+                        help='output to write, e.g. png@96 or svg; repeatable (default: png at 300 DPI)')
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE,
+                        help=f'seconds of quiet before rendering a burst of changes (default: {DEBOUNCE})')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help=f'seconds between polls (default: {POLL_INTERVAL})')
+    parser.add_argument('--small-png', action='store_true',
+                        help="write PNGs with matplotlib's encoder: smaller files, slower saves")
+    parser.add_argument('--no-initial', action='store_true',
+                        help='do not render everything at start-up')
+    args = parser.parse_args(argv)
+
+    names = args.names or list(DIAGRAMS)
+    unknown = [name for name in names if name not in DIAGRAMS]
+    if unknown:
+        parser.error(f"unknown diagram(s): {', '.join(unknown)}")
+    try:
+        watch(names, args.variants or [('png', diagrams.DEFAULT_DPI)], args.output_dir,
+              fast=not args.small_png, debounce=args.debounce, interval=args.interval,
+              initial=not args.no_initial)
+    except KeyboardInterrupt:
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
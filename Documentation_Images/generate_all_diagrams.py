@@ -1,46 +1,279 @@
 """
 Master script to generate all documentation diagrams
+
+Usage:
+    python generate_all_diagrams.py              # all diagrams in this process
+    python generate_all_diagrams.py --jobs 4     # up to 4 worker processes at once
+    python generate_all_diagrams.py --jobs 0     # one worker process per CPU core
+    python generate_all_diagrams.py --incremental   # skip diagrams that are up to date
+    python generate_all_diagrams.py --variant png --variant png@96 --variant svg --variant pdf
+    python generate_all_diagrams.py --optimize balanced   # the committed PNG encoding
+    python generate_all_diagrams.py --optimize smallest   # slowest, smallest PNGs
+    python generate_all_diagrams.py --trace trace.json    # per-phase timings, see diagrams/phases.py
+
+To spread a build over several machines, see diagrams/renderqueue.py.
 """
+import argparse
+import os
 import subprocess
 import sys
-import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from diagrams import DIAGRAMS, OUTPUT_FORMATS, default_output, unique_variants, variant_type
+from diagrams import cache, phases, pngopt
+from diagrams.phases import phase
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = os.path.join(HERE, 'diagram_manifest.json')
+
+
+def render_in_process(name, variants):
+    """Render one diagram to every variant in this (already warm) interpreter"""
+    import diagrams
+
+    result = {'name': name, 'ok': False, 'seconds': 0.0, 'error': ''}
+    start = time.perf_counter()
+    try:
+        diagrams.render_outputs(name, diagrams.variant_outputs(name, variants, HERE))
+        result['ok'] = True
+    except Exception:
+        result['error'] = traceback.format_exc().strip()
+    result['seconds'] = time.perf_counter() - start
+    return result
 
-scripts = [
-    'generate_architecture_diagram.py',
-    'generate_gpa_flow.py',
-    'generate_erd.py',
-    'generate_mvvm_diagram.py',
-    'generate_csv_export_flow.py'
-]
-
-print("=" * 60)
-print("Generating Documentation Images for Student Progress Tracker")
-print("=" * 60)
-print()
-
-for script in scripts:
-    if os.path.exists(script):
-        print(f"Running {script}...")
-        try:
-            result = subprocess.run([sys.executable, script], 
-                                  capture_output=True, text=True, check=True)
-            print(result.stdout)
-        except subprocess.CalledProcessError as e:
-            print(f"Error running {script}:")
-            print(e.stderr)
-            sys.exit(1)
+
+def render_in_subprocess(name, timeout, variants, trace_dir=None):
+    """Render one diagram in its own interpreter so it can be killed on timeout
+
+    With a `trace_dir`, the worker records its phases into a trace there,
+    which is merged into this process's recording.
+    """
+    result = {'name': name, 'ok': False, 'seconds': 0.0, 'error': ''}
+    start = time.perf_counter()
+    command = [sys.executable, '-m', 'diagrams', name, '--output-dir', HERE]
+    for fmt, dpi in variants:
+        command += ['--variant', f'{fmt}@{dpi}']
+    env = dict(os.environ)
+    env.pop(phases.TRACE_ENV, None)
+    if trace_dir:
+        env[phases.TRACE_ENV] = os.path.join(trace_dir, f'{name}.json')
+    try:
+        with phase('worker', diagram=name):
+            proc = subprocess.run(command, cwd=HERE, capture_output=True, text=True, timeout=timeout,
+                                  env=env)
+        if trace_dir and os.path.exists(env[phases.TRACE_ENV]):
+            phases.add(phases.load(env[phases.TRACE_ENV]))
+        if proc.returncode == 0:
+            result['ok'] = True
+        else:
+            result['error'] = proc.stderr.strip() or f"exit code {proc.returncode}"
+    except subprocess.TimeoutExpired:
+        # subprocess.run kills the child before raising
+        result['error'] = f"timed out after {timeout:g}s"
+    except OSError as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def report(result):
+    """Print the outcome of one render as soon as it finishes"""
+    if result['ok']:
+        print(f"Finished {result['name']} in {result['seconds']:.2f}s")
     else:
-        print(f"Warning: {script} not found!")
-
-print()
-print("=" * 60)
-print("All diagrams generated successfully!")
-print("=" * 60)
-print()
-print("Generated files:")
-for script in scripts:
-    output_file = script.replace('generate_', '').replace('.py', '.png')
-    if os.path.exists(output_file):
-        size = os.path.getsize(output_file)
-        print(f"  [OK] {output_file} ({size:,} bytes)")
+        print(f"Error rendering {result['name']}:")
+        print(result['error'])
+
+
+def run_all(names, jobs, timeout, variants):
+    """Render the given diagrams to every variant and keep going past failures
+
+    Each diagram is built once and saved once per (fmt, dpi) variant. With one
+    job everything is drawn in this process, so matplotlib is imported once.
+    With more, each diagram gets its own worker process and `timeout`.
+    """
+    results = {}
+    if jobs == 1:
+        for name in names:
+            print(f"Rendering {name}...")
+            results[name] = render_in_process(name, variants)
+            report(results[name])
+    else:
+        # The pool only bounds how many worker processes run at once
+        with tempfile.TemporaryDirectory() as trace_dir, ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(render_in_subprocess, name, timeout, variants,
+                                   trace_dir if phases.enabled() else None)
+                       for name in names]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result['name']] = result
+                report(result)
+    return results
+
+
+def optimize_outputs(results, variants, preset):
+    """Post-compress every freshly rendered PNG on a worker pool
+
+    Returns {output file: pngopt summary}.
+    """
+    files = [default_output(name, fmt, dpi) for name, result in results.items() if result['ok']
+             for fmt, dpi in variants if fmt == 'png']
+    if not preset or not files:
+        return {}
+    print(f"Optimizing {len(files)} PNG(s) ({preset})...")
+    with phase('optimize', files=len(files), preset=preset):
+        summaries = pngopt.optimize_files([os.path.join(HERE, output_file) for output_file in files], preset)
+    return dict(zip(files, summaries))
+
+
+def plan_builds(manifest, incremental, variants, optimize=None):
+    """Work out which diagrams need rendering, and why
+
+    A diagram is rebuilt, to every variant, when any of its outputs is stale.
+    Returns ({name: reason} to build, {output file: inputs} for every output).
+    """
+    to_build = {}
+    inputs = {}
+    for name in DIAGRAMS:
+        for fmt, dpi in variants:
+            output_file = default_output(name, fmt, dpi)
+            inputs[output_file] = cache.diagram_inputs(name, dpi, fmt, optimize)
+            if not incremental:
+                to_build[name] = 'full rebuild'
+            elif name not in to_build:
+                reason = cache.stale_reason(manifest['outputs'].get(output_file),
+                                            inputs[output_file], os.path.join(HERE, output_file))
+                if reason:
+                    to_build[name] = reason if len(variants) == 1 else f'{output_file}: {reason}'
+    return to_build, inputs
+
+
+def update_manifest(manifest, results, to_build, inputs, variants, incremental, elapsed, optimized):
+    """Record what was built, skipped or failed in this run"""
+    run = {'incremental': incremental, 'seconds': round(elapsed, 4),
+           'built': [], 'skipped': [], 'failed': [],
+           'bytes_saved': sum(summary['bytes_saved'] for summary in optimized.values()),
+           'optimize_seconds': round(sum(summary['encode_seconds'] for summary in optimized.values()), 4)}
+    for name in DIAGRAMS:
+        if name not in to_build:
+            for fmt, dpi in variants:
+                entry = manifest['outputs'][default_output(name, fmt, dpi)]
+                entry.update(status='skipped', reason='up to date')
+            run['skipped'].append(name)
+            continue
+        result = results[name]
+        run['built' if result['ok'] else 'failed'].append(name)
+        for fmt, dpi in variants:
+            output_file = default_output(name, fmt, dpi)
+            if result['ok']:
+                entry = cache.output_entry(name, inputs[output_file], os.path.join(HERE, output_file),
+                                           result['seconds'], optimized.get(output_file))
+                entry['reason'] = to_build[name]
+            else:
+                error = result['error'].splitlines()[-1] if result['error'] else 'failed'
+                entry = {'diagram': name, 'status': 'failed', 'reason': to_build[name],
+                         'error': error}
+            manifest['outputs'][output_file] = entry
+    manifest['last_run'] = run
+
+
+def print_summary(manifest, variants):
+    """Print one line per output from the updated manifest"""
+    print()
+    print("=" * 60)
+    print("Summary")
+    print("=" * 60)
+    for name in DIAGRAMS:
+        for fmt, dpi in variants:
+            output_file = default_output(name, fmt, dpi)
+            entry = manifest['outputs'][output_file]
+            if entry['status'] == 'failed':
+                print(f"  [FAILED] {name} - {entry['error']}")
+                break
+            elif entry['status'] == 'skipped':
+                print(f"  [SKIPPED] {name} -> {output_file} (up to date)")
+            else:
+                saved = ''
+                if 'optimize' in entry:
+                    saved = (f", {entry['optimize']['bytes_saved']:,} saved in "
+                             f"{entry['optimize']['encode_seconds']:.2f}s")
+                print(f"  [OK] {name} ({entry['render_seconds']:.2f}s, {entry['reason']}) "
+                      f"-> {output_file} ({entry['bytes']:,} bytes{saved})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='number of worker processes (default: 1 = render in this process, '
+                             '0 = one per CPU)')
+    parser.add_argument('--timeout', type=float, default=300,
+                        help='seconds before a single worker is killed when --jobs > 1 (default: 300)')
+    parser.add_argument('--incremental', '-i', action='store_true',
+                        help='only render diagrams whose inputs changed since the last build')
+    parser.add_argument('--manifest', default=MANIFEST,
+                        help='build manifest to read and update (default: diagram_manifest.json)')
+    parser.add_argument('--dpi', type=int, default=300, help='output resolution (default: 300)')
+    parser.add_argument('--format', dest='fmt', default='png', choices=OUTPUT_FORMATS,
+                        help='output format (default: png)')
+    parser.add_argument('--variant', dest='variants', action='append', type=variant_type, metavar='FMT[@DPI]',
+                        help='output to write, e.g. png@96 or svg; repeat to write several per diagram '
+                             'from one render (overrides --dpi and --format)')
+    parser.add_argument('--optimize', choices=list(pngopt.PRESETS) + ['none'], default='none',
+                        help='lossless PNG post-compression preset, or none (default: none; '
+                             'the committed PNGs use balanced)')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='record per-phase timings into a Chrome trace, with a JSON summary '
+                             'next to it (FILE.json -> FILE.summary.json)')
+    args = parser.parse_args(argv)
+    variants = unique_variants(args.variants or [(args.fmt, args.dpi)])
+    optimize = None if args.optimize == 'none' else args.optimize
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    print("=" * 60)
+    print("Generating Documentation Images for Student Progress Tracker")
+    print("=" * 60)
+    print()
+
+    if args.trace:
+        phases.enable()
+    start = time.perf_counter()
+    with phase('plan'):
+        manifest = cache.load_manifest(args.manifest)
+        to_build, inputs = plan_builds(manifest, args.incremental, variants, optimize)
+    for name, reason in to_build.items():
+        print(f"{name}: {reason}")
+    results = run_all(list(to_build), jobs, args.timeout, variants)
+    optimized = optimize_outputs(results, variants, optimize)
+    elapsed = time.perf_counter() - start
+
+    with phase('manifest'):
+        update_manifest(manifest, results, to_build, inputs, variants, args.incremental, elapsed, optimized)
+        cache.save_manifest(args.manifest, manifest)
+
+    print_summary(manifest, variants)
+    if args.trace:
+        print()
+        phases.print_summary(phases.save(args.trace))
+        print(f"Trace written to {args.trace}, summary to {phases.summary_path(args.trace)}")
+    run = manifest['last_run']
+    print()
+    if run['failed']:
+        print(f"{len(run['failed'])} of {len(DIAGRAMS)} diagrams failed ({elapsed:.2f}s total)")
+        return 1
+    if not run['built']:
+        print(f"All diagrams are up to date ({elapsed * 1000:.0f} ms)")
+        return 0
+    print(f"All diagrams generated successfully! ({len(run['built'])} built, "
+          f"{len(run['skipped'])} up to date, {elapsed:.2f}s total, {jobs} job(s))")
+    if optimized:
+        print(f"PNG optimization saved {run['bytes_saved']:,} bytes "
+              f"({run['optimize_seconds']:.2f}s of encoding)")
+    return 0
+
 
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The diagrams package lives next to this directory, not in site-packages
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,92 @@
+import pytest
+
+from diagrams import appindex
+from diagrams import spec as specs
+
+PAGE = '''<ContentPage xmlns:x="http://schemas.microsoft.com/winfx/2009/xaml"
+             x:Class="App.Views.{page}" x:DataType="viewmodels:{viewmodel}">
+    <Button Command="{{Binding SaveCommand}}" />
+</ContentPage>
+'''
+
+VIEWMODEL = '''public partial class {name} : ObservableObject
+{{
+    private readonly ApiService _api;
+    private readonly {service} _service;
+
+    [RelayCommand]
+    private async Task SaveAsync()
+    {{
+        await _api.{call}();
+        _service.Refresh();
+    }}
+}}
+'''
+
+SERVICE = '''public class {name}
+{{
+    private readonly ApiService _api;
+
+    public void Refresh() {{ _api.GetTermsAsync(); }}
+}}
+'''
+
+
+@pytest.fixture
+def app_dir(tmp_path):
+    """Three pages: NewCoursePage and EditCoursePage share CourseViewModel"""
+    for directory in ('Views', 'ViewModels', 'Services'):
+        (tmp_path / directory).mkdir()
+    for page, viewmodel in [('NewCoursePage', 'CourseViewModel'), ('TermsPage', 'TermsViewModel'),
+                            ('EditCoursePage', 'CourseViewModel')]:
+        (tmp_path / 'Views' / f'{page}.xaml').write_text(PAGE.format(page=page, viewmodel=viewmodel))
+    for name, service, call in [('CourseViewModel', 'TermService', 'SaveCourseAsync'),
+                                ('TermsViewModel', 'TermService', 'GetTermsAsync')]:
+        (tmp_path / 'ViewModels' / f'{name}.cs').write_text(VIEWMODEL.format(name=name, service=service,
+                                                                             call=call))
+    for name in ('ApiService', 'TermService'):
+        (tmp_path / 'Services' / f'{name}.cs').write_text(SERVICE.format(name=name))
+    return tmp_path
+
+
+def test_extract_app(app_dir, tmp_path):
+    app = appindex.extract_app(str(app_dir), str(tmp_path / 'index.json'))
+
+    assert [(pair['page'], pair['viewmodel'], pair['wiring']) for pair in app['pairs']] == [
+        ('EditCoursePage.xaml', 'CourseViewModel', ['x:DataType']),
+        ('NewCoursePage.xaml', 'CourseViewModel', ['x:DataType']),
+        ('TermsPage.xaml', 'TermsViewModel', ['x:DataType']),
+    ]
+    course = app['viewmodels']['CourseViewModel']
+    assert course['commands'] == ['SaveCommand'] and course['bound_commands'] == ['SaveCommand']
+    # Directly, and through TermService
+    assert course['api_calls'] == ['GetTermsAsync', 'SaveCourseAsync']
+    assert app['services']['TermService']['used_by'] == ['CourseViewModel', 'TermsViewModel']
+
+
+def test_warm_index_reads_nothing(app_dir, tmp_path):
+    appindex.extract_app(str(app_dir), str(tmp_path / 'index.json'))
+    stats = {}
+    appindex.extract_app(str(app_dir), str(tmp_path / 'index.json'), stats)
+
+    assert stats['parsed'] == 0
+
+
+def test_shared_viewmodel_sits_under_its_pages(app_dir, tmp_path, monkeypatch):
+    app = appindex.extract_app(str(app_dir), str(tmp_path / 'index.json'))
+    # Pages of one ViewModel that are not neighbours in file order
+    app['pairs'] = [app['pairs'][1], app['pairs'][2], app['pairs'][0]]
+    monkeypatch.setattr(specs, 'extract_app', lambda path: app)
+
+    layers = specs._layout_app({'kind': 'layered', 'title': 'Test', 'app': str(app_dir)})['layers']
+
+    x = {component['id']: component['at'][0] for layer in layers for component in layer['components']}
+    assert x['vm:CourseViewModel'] == pytest.approx((x['page:NewCoursePage.xaml']
+                                                     + x['page:EditCoursePage.xaml']) / 2)
+    assert x['vm:TermsViewModel'] == pytest.approx(x['page:TermsPage.xaml'])
+    # The ViewModel boxes do not overlap
+    width = layers[1]['component_size'][0]
+    assert abs(x['vm:CourseViewModel'] - x['vm:TermsViewModel']) >= width
+    # The service layer's label is below its boxes, out of the way of the arrows
+    service_layer = layers[2]
+    assert service_layer['label_at'][1] < service_layer['components'][0]['at'][1]
@@ -0,0 +1,119 @@
+import io
+import os
+import threading
+
+import pytest
+
+import diagrams
+from diagrams.buffers import BufferWriter, StreamWriter
+
+DPI = 72
+
+
+@pytest.fixture(scope='module')
+def expected():
+    return bytes(diagrams.render_bytes('gpa_flow', dpi=DPI))
+
+
+def test_buffer_writer_counts_writes_past_the_end():
+    buffer = bytearray(4)
+    writer = BufferWriter(buffer)
+
+    writer.write(b'abcdef')
+
+    assert buffer == b'abcd'
+    assert (writer.size, writer.overflowed) == (6, True)
+
+
+def test_buffer_writer_seeks_back_to_patch():
+    buffer = bytearray(8)
+    writer = BufferWriter(buffer)
+    writer.write(b'xxxxabcd')
+    writer.seek(0)
+    writer.write(b'head')
+
+    assert buffer == b'headabcd'
+    assert writer.seek(0, io.SEEK_END) == 8
+
+
+def test_buffer_writer_rejects_read_only_buffers():
+    with pytest.raises(TypeError):
+        BufferWriter(b'read-only')
+
+
+def test_stream_writer_finishes_partial_writes():
+    class Trickle(io.RawIOBase):
+        def __init__(self):
+            self.data = bytearray()
+
+        def writable(self):
+            return True
+
+        def write(self, data):
+            self.data += bytes(data[:3])
+            return min(3, len(data))
+
+    target = Trickle()
+    writer = StreamWriter(target)
+
+    assert writer.write(b'0123456789') == 10
+    assert (bytes(target.data), writer.tell()) == (b'0123456789', 10)
+
+
+def test_render_to_bytes_io(expected):
+    target = io.BytesIO(b'prefix')
+    target.seek(0, io.SEEK_END)
+
+    size = diagrams.render_to('gpa_flow', target, dpi=DPI)
+
+    assert size == len(expected)
+    assert target.getvalue() == b'prefix' + expected
+
+
+def test_render_to_bytearray(expected):
+    buffer = bytearray(len(expected) + 10)
+
+    assert diagrams.render_to('gpa_flow', buffer, dpi=DPI) == len(expected)
+    assert buffer[:len(expected)] == expected
+
+
+def test_render_to_too_small_a_buffer_raises(expected):
+    with pytest.raises(ValueError, match=f'{len(expected):,} bytes but the buffer holds 100'):
+        diagrams.render_to('gpa_flow', bytearray(100), dpi=DPI)
+
+
+def test_render_to_a_pipe(expected):
+    read_fd, write_fd = os.pipe()
+    received = []
+
+    def read_all():
+        with open(read_fd, 'rb') as pipe:
+            received.append(pipe.read())
+
+    reader = threading.Thread(target=read_all)
+    reader.start()
+    with open(write_fd, 'wb') as pipe:
+        size = diagrams.render_to('gpa_flow', pipe, dpi=DPI)
+    reader.join()
+
+    assert size == len(expected)
+    assert received == [expected]
+
+
+def test_render_to_an_unseekable_stream_as_pdf():
+    buffer = bytearray(1 << 20)
+    size = diagrams.render_to('gpa_flow', buffer, fmt='pdf')
+    stream = io.BytesIO()
+
+    class Unseekable(io.RawIOBase):
+        def writable(self):
+            return True
+
+        def seekable(self):
+            return False
+
+        def write(self, data):
+            return stream.write(data)
+
+    assert diagrams.render_to('gpa_flow', Unseekable(), fmt='pdf') == size == len(stream.getvalue())
+    assert stream.getvalue().startswith(b'%PDF')
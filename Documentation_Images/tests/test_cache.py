@@ -0,0 +1,51 @@
+import pytest
+
+from diagrams import cache
+
+INPUTS = {'source': 'a' * 64, 'shared': 'b' * 64, 'libraries': {'matplotlib': '3.9.0'},
+          'fonts': 'c' * 64, 'dpi': 300, 'format': 'png'}
+
+
+@pytest.fixture
+def built(tmp_path):
+    """An output on disk and the manifest entry recorded for it"""
+    output = tmp_path / 'diagram.png'
+    output.write_bytes(b'rendered bytes')
+    return cache.output_entry('diagram', INPUTS, str(output), 0.5), output
+
+
+def test_up_to_date(built):
+    entry, output = built
+    assert cache.stale_reason(entry, dict(INPUTS), str(output)) is None
+
+
+def test_not_built_before(built):
+    entry, output = built
+    assert cache.stale_reason(None, INPUTS, str(output)) == 'not built before'
+    assert cache.stale_reason(dict(entry, status='failed'), INPUTS, str(output)) == 'not built before'
+
+
+@pytest.mark.parametrize('changes, reason', [
+    ({'source': 'd' * 64}, 'generator source or spec changed'),
+    ({'dpi': 96}, 'DPI changed'),
+    ({'libraries': {'matplotlib': '3.10.0'}, 'fonts': 'e' * 64}, 'fonts, library versions changed'),
+    ({'schema': 'f' * 64}, 'C# models changed'),
+    ({'optimize': {'preset': 'balanced', 'source': 'g' * 64}}, 'PNG optimization preset changed'),
+])
+def test_changed_inputs(built, changes, reason):
+    entry, output = built
+    assert cache.stale_reason(entry, dict(INPUTS, **changes), str(output)) == reason
+
+
+def test_output_missing(built):
+    entry, output = built
+    output.unlink()
+    assert cache.stale_reason(entry, INPUTS, str(output)) == 'output missing'
+
+
+@pytest.mark.parametrize('contents', [b'edited by hand', b'rendered BYTES'])
+def test_output_modified(built, contents):
+    # A different size, and the same size with other bytes
+    entry, output = built
+    output.write_bytes(contents)
+    assert cache.stale_reason(entry, INPUTS, str(output)) == 'output modified'
@@ -0,0 +1,148 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from diagrams import draw
+from diagrams.scene import SceneBuilder
+
+RED = {'facecolor': '#d33', 'edgecolor': 'black'}
+BLUE = {'facecolor': '#36c', 'edgecolor': 'black'}
+
+
+def _builder():
+    return SceneBuilder((3, 3), (0, 10), (0, 10), dpi=72)
+
+
+def _items(scene):
+    return [(style, indices) for _, style, _, indices in draw.plan_batches(scene)]
+
+
+def _pixels(scene, batch, dpi=72):
+    previous = draw.BATCH_PRIMITIVES
+    draw.BATCH_PRIMITIVES = batch
+    try:
+        buffer = io.BytesIO()
+        draw.render_scene(scene, buffer, dpi=dpi)
+    finally:
+        draw.BATCH_PRIMITIVES = previous
+    buffer.seek(0)
+    return np.asarray(Image.open(buffer).convert('RGB'))
+
+
+def test_same_style_primitives_share_one_item():
+    scene = _builder()
+    for i in range(5):
+        scene.rect(i * 2, 1, 1, 1, **RED)
+        scene.line(i * 2, 5, i * 2 + 1, 5, color='black')
+    items = _items(scene.build())
+    assert [indices for _, indices in items] == [[0, 2, 4, 6, 8], [1, 3, 5, 7, 9]]
+
+
+def test_overlapping_primitive_in_between_splits_the_batch():
+    scene = _builder()
+    scene.rect(1, 1, 2, 2, **RED)
+    scene.rect(2, 2, 2, 2, **BLUE)   # over the first red square
+    scene.rect(3, 3, 2, 2, **RED)    # over the blue one: must stay above it
+    scene.rect(8, 8, 1, 1, **RED)    # clear of both
+    assert [indices for _, indices in _items(scene.build())] == [[0], [1], [2, 3]]
+
+
+def test_primitive_clear_of_everything_in_between_joins_the_batch():
+    scene = _builder()
+    scene.rect(1, 1, 2, 2, **RED)
+    scene.rect(2, 2, 2, 2, **BLUE)
+    scene.rect(7, 7, 2, 2, **RED)
+    assert [indices for _, indices in _items(scene.build())] == [[0, 2], [1]]
+
+
+def test_other_zorders_never_split_a_batch():
+    scene = _builder()
+    scene.rect(1, 1, 2, 2, **RED)
+    scene.line(0, 0, 10, 10, color='black')   # drawn above the patches anyway
+    scene.text(2, 2, 'label')
+    scene.rect(2, 2, 2, 2, **RED)
+    assert [indices for _, indices in _items(scene.build())] == [[0, 3], [1], [2]]
+
+
+def test_every_overlapping_pair_keeps_its_order():
+    rng = np.random.default_rng(3)
+    scene = _builder()
+    styles = [RED, BLUE, {'facecolor': 'white', 'edgecolor': '#080'}]
+    for _ in range(400):
+        x, y = rng.uniform(0, 9, 2)
+        scene.rect(x, y, *rng.uniform(0.2, 1.5, 2), **styles[rng.integers(3)])
+    scene = scene.build()
+
+    items = draw.plan_batches(scene)
+
+    assert sorted(i for *_, indices in items for i in indices) == list(range(len(scene)))
+    position = np.empty(len(scene), dtype=int)
+    for number, (*_, indices) in enumerate(items):
+        position[indices] = number
+    bounds = draw._bounds(scene)
+    for i in range(len(scene)):
+        for j in range(i + 1, len(scene)):
+            a, b = bounds[i], bounds[j]
+            if a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]:
+                assert position[i] <= position[j], (i, j)
+    assert len(items) < len(scene)
+
+
+def test_batched_render_matches_one_artist_per_primitive():
+    rng = np.random.default_rng(5)
+    scene = _builder()
+    for _ in range(60):
+        x, y = rng.uniform(0, 9, 2)
+        style = [RED, BLUE][rng.integers(2)]
+        scene.box(x, y, 1, 0.6, boxstyle='round,pad=0.1', **style)
+        scene.line(x, y, x + 1, y + 1, color='black', linewidth=1)
+    scene = scene.build()
+    assert np.array_equal(_pixels(scene, batch=True), _pixels(scene, batch=False))
+
+
+def test_empty_scene_has_no_items():
+    assert draw.plan_batches(_builder().build()) == []
+
+
+def _labelled_scene():
+    scene = _builder()
+    scene.rect(1, 1, 3, 2, **RED)
+    scene.text(2.5, 2, 'Terms', ha='center', va='center', fontsize=10)
+    scene.text(9.5, 9.5, 'sticks out past the axes', ha='left', fontsize=12)
+    return scene.build()
+
+
+def test_each_output_is_drawn_once():
+    scene = _labelled_scene()
+    before = draw.STATS['draws']
+    draw.render_scene_outputs(scene, [(io.BytesIO(), 72, 'png'), (io.BytesIO(), 96, 'png'),
+                                      (io.BytesIO(), 72, 'svg')])
+    assert draw.STATS['draws'] - before == 3
+
+
+def test_text_extents_are_measured_once():
+    scene = _labelled_scene()
+    draw.render_scene(scene, io.BytesIO(), dpi=80)
+    measured = draw.STATS['text_measured']
+    draw.render_scene(scene, io.BytesIO(), dpi=80)
+    assert draw.STATS['text_measured'] == measured
+
+
+@pytest.mark.parametrize('dpi', [72, 150])
+def test_crop_matches_matplotlibs_tight_bbox(dpi):
+    scene = _labelled_scene()
+    ours = io.BytesIO()
+    draw.render_scene(scene, ours, dpi=dpi)
+
+    with draw.pinned():
+        fig, ax = draw.new_figure(scene.meta['figsize'], scene.meta['xlim'], scene.meta['ylim'], scene.meta['dpi'])
+        draw.draw_scene(ax, scene)
+        fig.tight_layout()
+        theirs = io.BytesIO()
+        fig.savefig(theirs, dpi=dpi, bbox_inches='tight', facecolor='white', format='png')
+
+    ours.seek(0)
+    theirs.seek(0)
+    assert Image.open(ours).size == Image.open(theirs).size
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import matplotlib as mpl
+import pytest
+
+from diagrams import fonts
+
+
+def run_fresh(code, tmp_path):
+    """Run `code` in a new interpreter with an empty matplotlib cache directory"""
+    config = tmp_path / 'mplconfig'
+    config.mkdir()
+    env = dict(os.environ, MPLCONFIGDIR=str(config))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(fonts.PACKAGE_DIR), env.get('PYTHONPATH')]))
+    proc = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    return proc, config
+
+
+def test_install_loads_the_bundled_list_without_scanning(tmp_path):
+    proc, config = run_fresh('from diagrams import fonts; fonts.install(); print(fonts.status())', tmp_path)
+
+    assert proc.stdout.startswith('(True, ')
+    # matplotlib's own cache directory gets no font list of its own
+    assert os.listdir(config) == [fonts.CACHE_SUBDIR]
+
+
+def test_ensure_falls_back_when_the_font_manager_came_first(tmp_path):
+    code = ('import matplotlib.font_manager as fm; from diagrams import fonts; fonts.install(); '
+            'fonts.ensure(); print(fm.findfont("DejaVu Sans"))')
+    proc, _ = run_fresh(code, tmp_path)
+
+    assert 'font list fallback' in proc.stderr and 'loaded the bundled font list instead' in proc.stderr
+    assert os.path.realpath(proc.stdout.strip()).startswith(os.path.realpath(mpl.get_data_path()))
+
+
+def test_pinned_fonts_are_unchanged():
+    assert fonts.verify_hashes() == []
+
+
+@pytest.mark.parametrize('change, message', [
+    (lambda pins: pins.update(font_list_version=0), 'bundled font list is version 0'),
+    (lambda pins: next(iter(pins['fonts'].values())).update(bytes=1), 'bytes, not 1'),
+    (lambda pins: pins['fonts'].update({'fonts/ttf/Gone.ttf': {'bytes': 1, 'sha256': ''}}), 'is missing'),
+])
+def test_bundled_problem(change, message):
+    pins = fonts.load_pins()
+    change(pins)
+
+    assert message in fonts._bundled_problem(pins)
+    assert fonts._bundled_problem(fonts.load_pins()) is None
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+import generate_all_diagrams as build
+
+VARIANTS = [('png', 72)]
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    """Workers write into a temporary directory and still find the package"""
+    monkeypatch.setattr(build, 'HERE', str(tmp_path))
+    monkeypatch.setenv('PYTHONPATH', os.pathsep.join(filter(None, [os.path.dirname(build.__file__),
+                                                                   os.environ.get('PYTHONPATH')])))
+    return tmp_path
+
+
+def test_jobs_render_every_diagram_in_its_own_worker(output_dir):
+    results = build.run_all(['gpa_flow', 'csv_export_flow'], 2, 120, VARIANTS)
+
+    assert {name: result['ok'] for name, result in results.items()} == {'gpa_flow': True,
+                                                                        'csv_export_flow': True}
+    assert sorted(os.listdir(output_dir)) == ['csv_export_flow-72dpi.png', 'gpa_calculation_flow-72dpi.png']
+
+
+def test_a_failing_worker_does_not_stop_the_others(output_dir):
+    results = build.run_all(['no_such_diagram', 'gpa_flow'], 2, 120, VARIANTS)
+
+    assert not results['no_such_diagram']['ok']
+    assert 'no_such_diagram' in results['no_such_diagram']['error']
+    assert results['gpa_flow']['ok']
+
+
+def test_timeout_kills_the_worker(output_dir):
+    result = build.render_in_subprocess('gpa_flow', 0.01, VARIANTS)
+
+    assert not result['ok']
+    assert result['error'] == 'timed out after 0.01s'
+    assert not os.listdir(output_dir)
@@ -0,0 +1,25 @@
+import pytest
+
+from diagrams import importtime
+
+
+def test_parse_importtime():
+    stderr = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        120 |   _io',
+        'import time:        40 |        300 |   numpy',
+        'import time:       260 |        260 |     numpy.core',
+        'some other output',
+    ])
+    assert importtime.parse_importtime(stderr) == [('_io', 120, 120, 1), ('numpy', 40, 300, 1),
+                                                  ('numpy.core', 260, 260, 2)]
+
+
+def test_measure_counts_the_imports_a_render_triggers():
+    # matplotlib is only imported once a render starts, so importing the module alone misses it
+    report = importtime.measure('gpa_flow', runs=1)
+    packages = dict(report['top'])
+
+    assert packages['matplotlib'] > 0
+    assert not report['pyplot']
+    assert report['import_ms'] == pytest.approx(sum(packages.values()))
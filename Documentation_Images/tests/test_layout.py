@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import pytest
+
+from diagrams import layout
+
+
+def _overlaps(centers, sizes, gap):
+    """Pairs of boxes in the same row that are closer than `gap`"""
+    found = []
+    for i in range(len(centers)):
+        for j in range(i + 1, len(centers)):
+            dx = abs(centers[i, 0] - centers[j, 0]) - (sizes[i, 0] + sizes[j, 0]) / 2
+            dy = abs(centers[i, 1] - centers[j, 1]) - (sizes[i, 1] + sizes[j, 1]) / 2
+            if dx < gap - 1e-9 and dy < 0:
+                found.append((i, j))
+    return found
+
+
+def _random_tree(n, seed=0):
+    rng = np.random.default_rng(seed)
+    sizes = np.column_stack([rng.uniform(1.5, 3.5, n), rng.uniform(1.0, 4.0, n)])
+    edges = np.array([(int(rng.integers(0, child)), child) for child in range(1, n)])
+    return sizes, edges
+
+
+def test_edges_point_down_and_boxes_do_not_overlap():
+    sizes, edges = _random_tree(40)
+
+    centers, _ = layout.layered_layout(sizes, edges)
+
+    assert centers.shape == (40, 2)
+    tops = centers[:, 1] + sizes[:, 1] / 2
+    bottoms = centers[:, 1] - sizes[:, 1] / 2
+    assert (bottoms[edges[:, 0]] > tops[edges[:, 1]]).all()
+    assert not _overlaps(centers, sizes, 0.8)
+
+
+def test_cycles_and_self_loops_are_laid_out():
+    sizes = np.ones((3, 2))
+    centers, _ = layout.layered_layout(sizes, [(0, 1), (1, 2), (2, 0), (1, 1)])
+    assert len(np.unique(centers[:, 1])) == 3
+
+
+def test_a_tree_lays_out_without_crossings():
+    sizes = np.ones((7, 2))
+    _, crossings = layout.layered_layout(sizes, [(0, 1), (0, 2), (1, 3), (2, 4), (1, 5), (2, 6)])
+    assert crossings == 0
+
+
+@pytest.mark.parametrize('upper, lower, expected', [
+    ([0, 1], [0, 1], 0),
+    ([0, 1], [1, 0], 1),
+    ([0, 1, 2], [2, 1, 0], 3),
+])
+def test_count_crossings(upper, lower, expected):
+    assert layout.count_crossings(np.array(upper, float), np.array(lower, float)) == expected
+
+
+def test_wide_ranks_are_wrapped_into_rows():
+    sizes = np.ones((31, 2))
+    centers, _ = layout.layered_layout(sizes, [(0, child) for child in range(1, 31)], max_row=10)
+    assert len(np.unique(centers[1:, 1])) == 3
+
+
+def test_hundreds_of_tables_lay_out_in_well_under_a_second():
+    sizes, edges = _random_tree(300, seed=1)
+    start = time.perf_counter()
+    centers, _ = layout.layered_layout(sizes, edges)
+    assert time.perf_counter() - start < 1.0
+    assert np.isfinite(centers).all()
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+from diagrams import loadtest, reports
+
+
+def run_against_stand_in(prefix='', **options):
+    """Run `load` against an in-process stand-in server at URL + `prefix`; returns (results, server)"""
+    server = loadtest.StandInServer(terms=3, courses=4, delay_ms=1.0)
+
+    async def main():
+        started = asyncio.get_running_loop().create_future()
+        serving = asyncio.create_task(server.serve(ready=started.set_result))
+        url = await started
+        try:
+            return await loadtest.load(url + prefix, **options)
+        finally:
+            serving.cancel()
+
+    return asyncio.run(main()), server
+
+
+def test_parse_mix():
+    assert loadtest.parse_mix('gpa=3,transcript-csv') == {'gpa': 3.0, 'transcript-csv': 1.0}
+
+
+@pytest.mark.parametrize('text, message', [('grades=1', 'unknown endpoint'), ('gpa=x', 'bad weight'),
+                                           ('gpa=-1', 'negative weight'), ('gpa=0', 'no positive weights')])
+def test_parse_mix_rejects(text, message):
+    with pytest.raises(ValueError, match=message):
+        loadtest.parse_mix(text)
+
+
+def test_closed_loop_run_shares_the_connection_pool():
+    mix = loadtest.parse_mix(loadtest.DEFAULT_MIX)
+    results, server = run_against_stand_in(mix=mix, concurrency=8, connections=2, requests=200, terms=3)
+    summary = results.summary()
+
+    assert summary['total']['requests'] == server.requests == 200
+    assert summary['total']['errors'] == 0
+    assert set(summary['endpoints']) == set(loadtest.ENDPOINTS)
+    assert results.connections <= 2
+    percentiles = list(summary['total']['percentiles_ms'].values())
+    assert percentiles == sorted(percentiles)
+    # Every request waits out the stand-in's 1 ms delay
+    assert summary['total']['min_ms'] >= 1.0
+
+
+def test_fixed_rate_run():
+    results, _ = run_against_stand_in(mix={'gpa': 1.0}, concurrency=4, duration=0.5, rate=100, terms=3)
+    summary = results.summary()
+
+    # Due times, not answers, pace the run: at most one request per 10 ms
+    assert 30 <= summary['total']['requests'] <= 51
+    assert summary['total']['errors'] == 0
+
+
+def test_unknown_paths_count_as_errors():
+    results, _ = run_against_stand_in('/v2', mix={'transcript': 1.0}, concurrency=2, requests=10, terms=3)
+    summary = results.summary()
+
+    assert summary['total']['errors'] == 10
+    assert summary['endpoints']['transcript']['statuses'] == {'404': 10}
+
+
+def test_stand_in_csv_reads_back_as_a_transcript(tmp_path):
+    responses = loadtest.stand_in_responses(terms=3, courses=4)
+    path = tmp_path / 'transcript.csv'
+    path.write_bytes(responses['/api/reports/transcript/csv'][1])
+    transcript = json.loads(responses['/api/reports/transcript'][1])['data']
+
+    summary = reports.read_transcripts([str(path)]).summary()
+
+    assert summary['rows'] == 12
+    assert [term['term'] for term in summary['terms']] == [term['termTitle'] for term in transcript['terms']]
+    assert [term['gpa'] for term in summary['terms'][:2]] == pytest.approx(
+        [term['termGPA'] for term in transcript['terms'][:2]], abs=0.01)
@@ -0,0 +1,69 @@
+from diagrams import otel
+
+
+def _span(span_id, parent_id, actor, label, start, duration=10, server=False):
+    return otel.Span(span_id, parent_id, actor, label, start, start + duration, server)
+
+
+def _shape(steps):
+    """Steps as nested (label or 'loop', repeats, children) tuples"""
+    return [(step.label or 'loop', step.repeats, _shape(step.children)) for step in steps]
+
+
+def test_repeated_call_folds_into_one_step():
+    steps = [otel.Step('API', 'Database', 'SELECT Grades') for _ in range(5)]
+    for step in steps:
+        step.histogram.add(1000)
+
+    collapsed = otel.collapse(steps)
+
+    assert _shape(collapsed) == [('SELECT Grades', (5, 5), [])]
+    assert collapsed[0].histogram.count == 5
+
+
+def test_repeated_run_of_calls_folds_into_a_loop():
+    labels = ['SELECT Terms'] + ['SELECT Courses', 'SELECT Grades'] * 4 + ['SELECT Users']
+    steps = [otel.Step('API', 'Database', label) for label in labels]
+
+    collapsed = otel.collapse(steps)
+
+    assert _shape(collapsed) == [
+        ('SELECT Terms', (1, 1), []),
+        ('loop', (4, 4), [('SELECT Courses', (1, 1), []), ('SELECT Grades', (1, 1), [])]),
+        ('SELECT Users', (1, 1), []),
+    ]
+    assert [child.histogram.count for child in collapsed[1].children] == [0, 0]
+
+
+def test_runs_longer_than_max_pattern_are_not_folded():
+    labels = [f'SELECT T{i}' for i in range(otel.MAX_PATTERN + 1)] * 2
+    collapsed = otel.collapse([otel.Step('API', 'Database', label) for label in labels])
+    assert [step.label for step in collapsed] == labels
+
+
+def test_n_plus_one_queries_in_a_trace():
+    spans = [_span('root', None, 'ReportsController', 'GET /api/reports/gpa/{termId}', 0, 1000, server=True),
+             _span('terms', 'root', 'Database\n(app)', 'SELECT Terms', 10)]
+    for i in range(6):
+        spans.append(_span(f'c{i}', 'root', 'Database\n(app)', 'SELECT Courses', 100 + i * 100, 20))
+        spans.append(_span(f'g{i}', 'root', 'Database\n(app)', 'SELECT Grades', 150 + i * 100, 30))
+
+    root, = otel.call_tree(spans)
+
+    assert (root.source, root.target) == ('Client', 'ReportsController')
+    assert _shape(root.children) == [
+        ('SELECT Terms', (1, 1), []),
+        ('loop', (6, 6), [('SELECT Courses', (1, 1), []), ('SELECT Grades', (1, 1), [])]),
+    ]
+    courses, grades = root.children[1].children
+    assert (courses.histogram.count, courses.histogram.min, courses.histogram.max) == (6, 20, 20)
+    assert grades.histogram.count == 6
+
+
+def test_loops_of_different_lengths_share_a_signature():
+    short = otel.collapse([otel.Step('API', 'Database', 'SELECT Grades') for _ in range(2)])
+    long = otel.collapse([otel.Step('API', 'Database', 'SELECT Grades') for _ in range(9)])
+
+    assert short[0].signature == long[0].signature
+    short[0].absorb(long[0])
+    assert short[0].repeats == (2, 9)
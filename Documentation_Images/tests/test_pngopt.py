@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from diagrams import pngopt
+
+
+def _decoded(path):
+    with Image.open(path) as image:
+        return np.asarray(image.convert('RGBA'))
+
+
+def _line_art(size=(240, 160)):
+    """Opaque flat-color boxes and antialiased-looking edges, like a rendered diagram"""
+    pixels = np.full((size[1], size[0], 3), 255, dtype=np.uint8)
+    pixels[20:60, 30:200] = (46, 134, 171)
+    pixels[90:140, 60:120] = (241, 143, 1)
+    for step in range(8):
+        pixels[60 + step, 30:200] = 255 - step * 25
+    pixels[::7, ::11] = (12, 200, 90)
+    return Image.fromarray(pixels)
+
+
+def _gradient(size=(64, 48)):
+    """More than 256 colors, so no palette"""
+    x, y = np.meshgrid(np.arange(size[0]), np.arange(size[1]))
+    return Image.fromarray(np.stack([x * 4, y * 5, (x + y) * 2], axis=2).astype(np.uint8))
+
+
+def _translucent(size=(48, 32)):
+    pixels = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+    pixels[..., 0] = 200
+    pixels[..., 3] = np.linspace(0, 255, size[0], dtype=np.uint8)
+    return Image.fromarray(pixels, 'RGBA')
+
+
+IMAGES = {
+    'line art': lambda: _line_art().convert('RGBA'),
+    'two colors': lambda: _line_art().convert('1').convert('RGBA'),
+    'gray': lambda: _line_art().convert('L'),
+    'gradient': lambda: _gradient().convert('RGBA'),
+    'translucent': _translucent,
+}
+
+
+@pytest.mark.parametrize('preset', sorted(pngopt.PRESETS))
+@pytest.mark.parametrize('kind', sorted(IMAGES))
+def test_optimize_png_keeps_every_pixel(tmp_path, kind, preset):
+    path = str(tmp_path / 'image.png')
+    IMAGES[kind]().save(path, dpi=(300, 300))
+    before = _decoded(path)
+
+    result = pngopt.optimize_png(path, preset)
+
+    assert np.array_equal(_decoded(path), before)
+    assert result['bytes_after'] <= result['bytes_before']
+    with Image.open(path) as image:
+        assert image.info['dpi'] == pytest.approx((300, 300), abs=0.01)
+
+
+def test_optimize_png_reduces_opaque_line_art_to_a_palette(tmp_path):
+    path = str(tmp_path / 'image.png')
+    _line_art().convert('RGBA').save(path)
+
+    result = pngopt.optimize_png(path, 'fast')
+
+    assert result['replaced']
+    assert result['color_type'] == 'palette'
+    assert result['bytes_saved'] == result['bytes_before'] - result['bytes_after'] > 0
+
+
+def test_optimize_png_rejects_unknown_presets(tmp_path):
+    path = str(tmp_path / 'image.png')
+    _line_art().save(path)
+    with pytest.raises(ValueError, match='unknown preset'):
+        pngopt.optimize_png(path, 'tiny')
@@ -0,0 +1,129 @@
+import pytest
+
+from diagrams import renderqueue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(renderqueue.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = renderqueue.RenderQueue(str(tmp_path / 'queue.db'))
+    yield queue
+    queue.close()
+
+
+def _job(output, priority=0.0):
+    return {'output': output, 'diagram': output.split('.')[0], 'fmt': 'png', 'dpi': 300,
+            'fingerprint': 'f' * 64, 'reason': 'full rebuild', 'priority': priority}
+
+
+def _status(queue):
+    return {row['output']: row['status'] for row in queue.jobs()}
+
+
+def test_claims_lease_each_job_once_longest_first(queue, clock):
+    queue.enqueue([_job('short.png', 1.0), _job('long.png', 9.0)], {})
+
+    first = queue.claim('worker-1', 60)
+    second = queue.claim('worker-2', 60)
+
+    assert (first['output'], first['worker']) == ('long.png', 'worker-1')
+    assert (second['output'], second['worker']) == ('short.png', 'worker-2')
+    assert queue.claim('worker-3', 60) is None
+    assert queue.holds(first) and queue.holds(second)
+    assert queue.unfinished() == 2
+
+
+def test_complete_moves_the_output_into_place(queue, clock, tmp_path):
+    queue.enqueue([_job('a.png')], {})
+    job = queue.claim('worker-1', 60)
+    tmp, output = tmp_path / 'a.png.tmp', tmp_path / 'a.png'
+    tmp.write_bytes(b'png')
+
+    assert queue.complete(job, {'status': 'built'}, str(tmp), str(output))
+    assert output.read_bytes() == b'png' and not tmp.exists()
+    assert _status(queue) == {'a.png': 'done'}
+    assert queue.unfinished() == 0
+
+
+def test_expired_lease_goes_to_another_worker(queue, clock, tmp_path):
+    queue.enqueue([_job('a.png')], {})
+    stalled = queue.claim('worker-1', 60)
+    clock.now += 30
+    assert queue.renew(stalled, 60)
+    clock.now += 61
+
+    taken = queue.claim('worker-2', 60)
+
+    assert taken['id'] == stalled['id']
+    assert (taken['worker'], taken['attempts']) == ('worker-2', 2)
+    assert not queue.holds(stalled)
+    assert not queue.renew(stalled, 60)
+
+    # The stalled worker finishes late: its output is dropped, not moved into place
+    tmp, output = tmp_path / 'a.png.tmp', tmp_path / 'a.png'
+    tmp.write_bytes(b'late')
+    assert not queue.complete(stalled, {'status': 'built'}, str(tmp), str(output))
+    assert not tmp.exists() and not output.exists()
+    assert queue.holds(taken)
+
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(queue, clock):
+    queue.enqueue([_job('a.png')], {}, max_attempts=1)
+    queue.claim('worker-1', 60)
+    clock.now += 61
+
+    assert queue.claim('worker-2', 60) is None
+    row, = queue.jobs()
+    assert row['status'] == 'failed'
+    assert 'lease expired on worker-1' in row['error']
+
+
+def test_failed_job_is_retried_after_a_growing_delay(queue, clock):
+    queue.enqueue([_job('a.png')], {}, max_attempts=3)
+
+    job = queue.claim('worker-1', 60)
+    assert queue.fail(job, 'boom')
+    assert _status(queue) == {'a.png': 'pending'}
+    assert queue.claim('worker-1', 60) is None
+    clock.now += renderqueue.RETRY_DELAY
+
+    job = queue.claim('worker-1', 60)
+    assert job['attempts'] == 2 and job['error'] is None
+    assert queue.fail(job, 'boom')
+    clock.now += renderqueue.RETRY_DELAY
+    assert queue.claim('worker-1', 60) is None
+    clock.now += renderqueue.RETRY_DELAY
+
+    job = queue.claim('worker-1', 60)
+    assert job['attempts'] == 3
+    assert queue.fail(job, 'boom again')
+    row, = queue.jobs()
+    assert (row['status'], row['error']) == ('failed', 'boom again')
+    assert queue.claim('worker-1', 60) is None
+
+
+def test_enqueue_keeps_done_jobs_with_the_same_fingerprint(queue, clock, tmp_path):
+    queue.enqueue([_job('a.png'), _job('b.png')], {'optimize': None})
+    job = queue.claim('worker-1', 60)
+    tmp = tmp_path / 'out.tmp'
+    tmp.write_bytes(b'png')
+    queue.complete(job, {}, str(tmp), str(tmp_path / job['output']))
+
+    assert queue.enqueue([_job('a.png'), _job('b.png')], {'optimize': None}) == 1
+    assert queue.enqueue([dict(_job('a.png'), fingerprint='0' * 64)], {}) == 1
+    assert _status(queue) == {'a.png': 'pending', 'b.png': 'pending'}
+    assert queue.settings() == {'optimize': None}
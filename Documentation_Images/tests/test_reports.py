@@ -0,0 +1,103 @@
+import gzip
+
+import pytest
+from PIL import Image
+
+from diagrams import reports
+
+TRANSCRIPT = '''STUDENT TRANSCRIPT
+Student: Ada Lovelace
+
+TERM: Spring 2025
+"Start: Jan 06, 2025 | End: May 02, 2025"
+Course,Status,Credits,Grade,Percentage,Instructor,Email
+Databases,Completed,3,B+,88%,Dr. Codd,codd@example.edu
+Networks,In Progress,4,,,Dr. Cerf,cerf@example.edu
+Total Credit Hours,,7
+
+TERM: Fall 2024
+"Start: Aug 26, 2024 | End: Dec 13, 2024"
+Course,Status,Credits,Grade,Percentage,Instructor,Email
+Algorithms,Completed,4,A,95%,Dr. Knuth,knuth@example.edu
+Compilers,Completed,3,C,74%,Dr. Aho,aho@example.edu
+'''
+
+GPA = '''Term: Fall 2024
+Term Dates: 2024-08-20 to 2024-12-13
+Course Title,Credit Hours,Letter Grade,Grade Points
+Ethics,2,A-,3.7
+'''
+
+
+@pytest.fixture
+def exports(tmp_path):
+    (tmp_path / 'transcript.csv').write_text(TRANSCRIPT)
+    with gzip.open(tmp_path / 'gpa.csv.gz', 'wt') as f:
+        f.write(GPA)
+    (tmp_path / 'expenses.csv').write_text('Date,Amount,CategoryId\n2024-09-03,"$1,200.00",1\n'
+                                           '09/15/2024,30.5,2\n2024-10-01,20,1\n2024-10-02,5,9\n')
+    (tmp_path / 'income.csv').write_text('Date,Amount\n2024-09-01,2000\n2024-10-01,2000\n2024-10-15,150\n')
+    (tmp_path / 'categories.csv').write_text('Id,Name\n1,Rent\n2,Books\n')
+    return tmp_path
+
+
+def test_transcript_totals(exports):
+    summary = reports.read_transcripts([str(exports / 'transcript.csv'), str(exports / 'gpa.csv.gz')]).summary()
+
+    assert summary['rows'] == 5
+    fall, spring = summary['terms']
+    # Terms in date order; the GPA report's earlier start date wins
+    assert (fall['term'], fall['start'], spring['term']) == ('Fall 2024', '2024-08-20', 'Spring 2025')
+    assert fall['courses'] == 3
+    assert fall['gpa'] == pytest.approx((4 * 4.0 + 3 * 2.0 + 2 * 3.7) / 9, abs=1e-3)
+    assert fall['credits'] == {'Completed': 9.0}
+    assert spring['gpa'] == 3.3
+    assert spring['credits'] == {'Completed': 3.0, 'In Progress': 4.0}
+    assert spring['cumulative_gpa'] == pytest.approx((4 * 4.0 + 3 * 2.0 + 2 * 3.7 + 3 * 3.3) / 12, abs=1e-3)
+    assert summary['grades'] == {'A': 1, 'A-': 1, 'B+': 1, 'C': 1}
+
+
+def test_chunk_size_does_not_change_the_totals(exports):
+    paths = [str(exports / 'transcript.csv'), str(exports / 'gpa.csv.gz')]
+
+    assert reports.read_transcripts(paths, chunk_rows=2).summary() == reports.read_transcripts(paths).summary()
+
+
+def test_finance_totals(exports):
+    totals = reports.FinanceTotals(reports.read_categories(str(exports / 'categories.csv')))
+    summary = reports.read_finances([str(exports / 'expenses.csv')], [str(exports / 'income.csv')], totals,
+                                    chunk_rows=2).summary()
+
+    assert (summary['expense_rows'], summary['income_rows']) == (4, 3)
+    assert summary['months'] == [{'month': '2024-09', 'income': 2000.0, 'expenses': 1230.5},
+                                 {'month': '2024-10', 'income': 2150.0, 'expenses': 25.0}]
+    # Unknown ids keep their id as the name
+    assert summary['categories'] == {'Rent': 1220.0, 'Books': 30.5, '9': 5.0}
+
+
+def test_bad_date_names_the_file(exports):
+    (exports / 'income.csv').write_text('Date,Amount\nyesterday,10\n')
+
+    with pytest.raises(ValueError, match="income.csv: unrecognized date 'yesterday'"):
+        reports.read_finances(income_paths=[str(exports / 'income.csv')])
+
+
+def test_missing_column(exports):
+    with pytest.raises(ValueError, match='no date column'):
+        reports.read_finances([str(exports / 'categories.csv')])
+
+
+def test_render_dashboard(exports, tmp_path):
+    transcript = reports.read_transcripts([str(exports / 'transcript.csv')])
+    finance = reports.read_finances([str(exports / 'expenses.csv')], [str(exports / 'income.csv')])
+
+    output = reports.render_dashboard(transcript, finance, str(tmp_path / 'dashboard.png'), dpi=40)
+
+    with Image.open(output) as image:
+        # Five panels, three to a row
+        assert image.size == (18 * 40, int((2 * 4.5 + 0.6) * 40))
+
+
+def test_nothing_to_chart():
+    with pytest.raises(ValueError, match='no course, expense or income rows'):
+        reports.render_dashboard(reports.TranscriptTotals(), None)
@@ -0,0 +1,74 @@
+import os
+
+import matplotlib as mpl
+from PIL import Image
+
+from diagrams import reproducible
+
+
+def test_pinned_ignores_local_rc_and_restores_it(monkeypatch):
+    monkeypatch.delenv('SOURCE_DATE_EPOCH', raising=False)
+    with mpl.rc_context({'font.size': 30, 'lines.linewidth': 7}):
+        with reproducible.pinned():
+            assert mpl.rcParams['font.size'] == mpl.rcParamsDefault['font.size']
+            assert mpl.rcParams['lines.linewidth'] == mpl.rcParamsDefault['lines.linewidth']
+            assert all(mpl.rcParams[key] == value for key, value in reproducible.RC.items())
+            assert os.environ['SOURCE_DATE_EPOCH'] == reproducible.SOURCE_DATE_EPOCH
+        assert mpl.rcParams['font.size'] == 30
+    assert 'SOURCE_DATE_EPOCH' not in os.environ
+
+
+def test_metadata_is_a_copy():
+    metadata = reproducible.metadata('png')
+    metadata['Software'] = 'changed'
+
+    assert reproducible.metadata('png') == {'Software': None}
+    assert reproducible.metadata('gif') == {}
+
+
+def test_fonts_resolve_to_the_bundled_copies():
+    bundled = os.path.realpath(os.path.join(mpl.get_data_path(), 'fonts'))
+
+    resolved = reproducible.check_fonts()
+
+    assert len(resolved) == len(reproducible.FONT_VARIANTS)
+    assert all(os.path.realpath(path).startswith(bundled) for path in resolved.values())
+
+
+def _png(path, compress_level, color='navy'):
+    image = Image.new('RGB', (64, 32), 'white')
+    image.paste(color, (8, 8, 40, 24))
+    image.save(path, compress_level=compress_level)
+
+
+def test_compare(tmp_path):
+    runs = [tmp_path / f'run{index}' for index in range(3)]
+    for run in runs:
+        run.mkdir()
+        (run / 'same.svg').write_text('<svg>\n<g/>\n</svg>\n')
+        _png(run / 'same.png', 6)
+    (runs[2] / 'text.svg').write_text('<svg>\n<g id="b"/>\n</svg>\n')
+    for run in runs[:2]:
+        (run / 'text.svg').write_text('<svg>\n<g id="a"/>\n</svg>\n')
+        _png(run / 'encoding.png', 6)
+        _png(run / 'pixels.png', 6)
+    _png(runs[2] / 'encoding.png', 1)
+    _png(runs[2] / 'pixels.png', 6, color='red')
+
+    results = reproducible.compare(['same.svg', 'same.png', 'text.svg', 'encoding.png', 'pixels.png',
+                                    'gone.pdf'], [str(run) for run in runs])
+
+    assert results['same.svg'] is None and results['same.png'] is None
+    assert results['text.svg'] == 'run 3: 25 vs 25 bytes, first difference at byte 13 (line 2)'
+    assert results['encoding.png'] == 'run 3: chunks differ: IDAT; same pixels, different encoding'
+    assert results['pixels.png'] == 'run 3: chunks differ: IDAT; 512 pixels differ'
+    assert results['gone.pdf'].startswith('missing in ')
+
+
+def test_verify_survives_a_hostile_environment(tmp_path):
+    # The second run gets HOSTILE_RC and a perturbed environment
+    ok, lines = reproducible.verify(['gpa_flow'], [('png', 72), ('svg', 72)], runs=2, keep=str(tmp_path))
+
+    assert ok, '\n'.join(lines)
+    assert lines[-1].startswith('2 of 2 output(s) identical across 2 runs')
+    assert sorted(os.listdir(tmp_path / 'run1')) == ['gpa_calculation_flow-72dpi.png', 'gpa_calculation_flow.svg']
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from diagrams import schema
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(os.path.join(schema.DEFAULT_API_DIR, 'Models')),
+                                reason='StudentLifeTracker.API is not checked out')
+
+
+@pytest.fixture(scope='module')
+def extracted():
+    return schema.extract_schema(cache_path=None)
+
+
+def test_tables(extracted):
+    assert [table['name'] for table in extracted['tables']] == [
+        'AspNetUsers', 'Assessments', 'Categories', 'Courses', 'Expenses', 'Grades', 'Incomes', 'Terms']
+
+
+def test_relationships(extracted):
+    relationships = {(rel['one'], rel['many'], tuple(rel['foreign_key']), rel['on_delete'])
+                     for rel in extracted['relationships']}
+    assert len(extracted['relationships']) == 8
+    assert relationships == {
+        ('AspNetUsers', 'Terms', ('UserId',), 'Cascade'),
+        ('Terms', 'Courses', ('TermId',), 'Cascade'),
+        ('Courses', 'Assessments', ('CourseId',), 'Cascade'),
+        ('Courses', 'Grades', ('CourseId',), 'Cascade'),
+        ('AspNetUsers', 'Incomes', ('UserId',), 'Cascade'),
+        ('AspNetUsers', 'Expenses', ('UserId',), 'Cascade'),
+        ('Categories', 'Expenses', ('CategoryId',), 'Restrict'),
+        ('AspNetUsers', 'Categories', ('UserId',), 'Cascade'),
+    }
+
+
+def test_keys(extracted):
+    tables = {table['name']: table for table in extracted['tables']}
+    for rel in extracted['relationships']:
+        columns = {column['name']: column for column in tables[rel['many']]['columns']}
+        for name in rel['foreign_key']:
+            assert columns[name]['fk']
+    for table in tables.values():
+        assert any(column['pk'] for column in table['columns']), table['name']
+
+
+def test_parse_cache_gives_the_same_schema(tmp_path, extracted):
+    cache_path = str(tmp_path / 'schema_cache.json')
+    cold, warm = {}, {}
+    assert schema.extract_schema(cache_path=cache_path, stats=cold) == extracted
+    assert schema.extract_schema(cache_path=cache_path, stats=warm) == extracted
+    assert cold['parsed'] > 0
+    assert warm == {'reused': cold['parsed'], 'rehashed': 0, 'parsed': 0}
@@ -0,0 +1,104 @@
+import pytest
+
+from diagrams import solution
+
+SOLUTION = '''Microsoft Visual Studio Solution File, Format Version 12.00
+Project("{FAE04EC0-301F-11D3-BF4B-00C04F79EFBC}") = "App", "App\\App.csproj", "{1}"
+EndProject
+Project("{FAE04EC0-301F-11D3-BF4B-00C04F79EFBC}") = "Api", "Api\\Api.csproj", "{2}"
+EndProject
+Project("{FAE04EC0-301F-11D3-BF4B-00C04F79EFBC}") = "Shared", "Shared\\Shared.csproj", "{3}"
+EndProject
+Project("{2150E333-8FDC-42A3-9474-1A3956D46DE8}") = "Docs", "Docs", "{4}"
+EndProject
+'''
+
+PROJECTS = {
+    'App/App.csproj': '''<Project Sdk="Microsoft.NET.Sdk">
+  <PropertyGroup><TargetFrameworks>net8.0-android;net8.0-ios</TargetFrameworks><UseMaui>true</UseMaui></PropertyGroup>
+  <ItemGroup><ProjectReference Include="..\\Shared\\Shared.csproj" /></ItemGroup>
+</Project>''',
+    'Api/Api.csproj': '''<Project Sdk="Microsoft.NET.Sdk.Web">
+  <PropertyGroup><TargetFramework>net8.0</TargetFramework></PropertyGroup>
+  <ItemGroup>
+    <PackageReference Include="Microsoft.EntityFrameworkCore.SqlServer" Version="8.0.0" />
+    <ProjectReference Include="..\\Shared\\Shared.csproj" />
+    <ProjectReference Include="..\\Gone\\Gone.csproj" />
+  </ItemGroup>
+</Project>''',
+    'Shared/Shared.csproj': '''<Project Sdk="Microsoft.NET.Sdk">
+  <PropertyGroup><TargetFramework>net8.0</TargetFramework></PropertyGroup>
+</Project>''',
+}
+
+SOURCES = {
+    'App/Views/TermsPage.xaml.cs': 'public partial class TermsPage : ContentPage { }',
+    'App/ViewModels/TermsViewModel.cs': 'public partial class TermsViewModel : ObservableObject { }',
+    'Api/Controllers/TermsController.cs': 'public class TermsController : ControllerBase { }',
+    'Api/Data/AppDbContext.cs': '''public class AppDbContext : IdentityDbContext<User>
+{
+    public DbSet<Term> Terms { get; set; }
+    public DbSet<Course> Courses { get; set; }
+}''',
+    'Api/bin/Debug/Generated.cs': 'public class IgnoredService { }',
+    'Shared/DTOs/TermDto.cs': 'public class TermDto { }',
+}
+
+
+@pytest.fixture
+def sln(tmp_path):
+    for path, text in {**PROJECTS, **SOURCES}.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(text)
+    (tmp_path / 'App.sln').write_text(SOLUTION)
+    return tmp_path / 'App.sln'
+
+
+def resolve(sln, stats=None):
+    return solution.resolve_solution(str(sln), str(sln.parent / 'cache.json'), str(sln.parent / 'graph.json'),
+                                     stats)
+
+
+def test_projects_roles_and_references(sln):
+    graph = resolve(sln)
+    projects = graph['projects']
+
+    assert {name: project['role'] for name, project in projects.items()} == {
+        'App': 'client', 'Api': 'api', 'Shared': 'library'}
+    assert projects['App']['frameworks'] == ['net8.0-android', 'net8.0-ios']
+    assert projects['Api']['references'] == ['Shared']
+    assert sorted(projects['Shared']['referenced_by']) == ['Api', 'App']
+    assert projects['Api']['database'] == 'SQL Server'
+    assert graph['unresolved'] == [{'project': 'Api', 'reference': '../Gone/Gone.csproj'}]
+
+
+def test_components(sln):
+    projects = resolve(sln)['projects']
+
+    assert projects['App']['components']['pages'] == ['TermsPage']
+    assert projects['App']['components']['viewmodels'] == ['TermsViewModel']
+    assert projects['Api']['components']['controllers'] == ['Terms']
+    assert projects['Api']['components']['dbcontexts'] == [
+        {'name': 'AppDbContext', 'tables': ['AspNetUsers', 'Terms', 'Courses']}]
+    assert projects['Api']['components']['services'] == []
+    assert projects['Shared']['components']['dtos'] == ['TermDto']
+
+
+def test_graph_is_reused_until_a_source_changes(sln):
+    first = resolve(sln)
+    stats = {}
+    assert resolve(sln, stats) == first
+    assert (stats['graph'], stats['parsed']) == ('reused', 0)
+
+    (sln.parent / 'Api/Controllers/CoursesController.cs').write_text(
+        'public class CoursesController : ControllerBase { }')
+    stats = {}
+    graph = resolve(sln, stats)
+    assert (stats['graph'], stats['parsed']) == ('resolved', 1)
+    assert graph['projects']['Api']['components']['controllers'] == ['Courses', 'Terms']
+    assert graph['sources'] != first['sources']
+
+
+def test_missing_solution(tmp_path):
+    with pytest.raises(ValueError, match='No solution file'):
+        solution.resolve_solution(str(tmp_path / 'none.sln'), None, None)
@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pytest
+
+from diagrams import scene as scenes
+from diagrams import spec as specs
+
+FLOWCHART = {
+    'kind': 'flowchart',
+    'title': 'Test flow',
+    'title_at': [2, 3.9],
+    'canvas': {'size': [4, 4], 'xlim': [0, 4], 'ylim': [0, 4]},
+    'grid': {'top': 3.5, 'row_height': 1.0},
+    'nodes': [
+        {'id': 'start', 'shape': 'start_end', 'x': 2, 'row': 0, 'text': 'START'},
+        {'id': 'ask', 'shape': 'decision', 'x': 2, 'row': 1.5, 'text': 'OK?'},
+        {'id': 'end', 'shape': 'start_end', 'x': 2, 'row': 3, 'text': 'END'},
+    ],
+    'edges': [{'from': 'start', 'to': 'ask'}, {'from': 'ask', 'to': 'end', 'label': 'Yes'}],
+}
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(specs, 'CACHE_DIR', str(tmp_path / 'scene_cache'))
+    monkeypatch.setattr(specs, 'SPEC_INDEX', str(tmp_path / 'scene_cache' / 'specs.json'))
+    return tmp_path / 'scene_cache'
+
+
+def _write(path, spec):
+    path.write_text(json.dumps(spec), encoding='utf-8')
+    return str(path)
+
+
+def test_compile_flowchart():
+    scene = specs.compile_spec(FLOWCHART)
+
+    counts = scene.counts()
+    assert counts['arrow'] == 2
+    assert counts['diamond'] == 1
+    strings = set(scene.strings)
+    assert {'START', 'OK?', 'END', 'Yes', 'Test flow'} <= strings
+    assert scene.meta['xlim'] == [0, 4]
+
+
+@pytest.mark.parametrize('spec, message', [
+    (dict(FLOWCHART, kind='pie'), "unknown spec kind 'pie'"),
+    (dict(FLOWCHART, edges=[{'from': 'start', 'to': 'nowhere'}]), "missing or unknown reference 'nowhere'"),
+])
+def test_compile_errors_name_the_spec(spec, message):
+    with pytest.raises(ValueError, match=message) as error:
+        specs.compile_spec(spec, 'flow.json')
+    assert str(error.value).startswith('flow.json: ')
+
+
+def test_scene_round_trips_through_npz(tmp_path):
+    scene = specs.compile_spec(FLOWCHART)
+    scene.save(str(tmp_path / 'scene.npz'))
+
+    loaded = scenes.Scene.load(str(tmp_path / 'scene.npz'))
+
+    assert np.array_equal(loaded.kinds, scene.kinds)
+    assert np.array_equal(loaded.geometry, scene.geometry)
+    assert np.array_equal(loaded.styles, scene.styles) and np.array_equal(loaded.texts, scene.texts)
+    assert (loaded.style_table, loaded.strings, loaded.meta) == (scene.style_table, scene.strings, scene.meta)
+
+
+def test_load_scene_reuses_the_cached_scene(tmp_path, cache_dir, monkeypatch):
+    path = _write(tmp_path / 'flow.json', FLOWCHART)
+    first = specs.load_scene(path)
+
+    def fail(*args):
+        raise AssertionError('a cached scene was compiled again')
+    monkeypatch.setattr(specs, 'compile_spec', fail)
+    monkeypatch.setattr(specs, 'parse_spec', fail)
+
+    cached = specs.load_scene(path)
+    assert np.array_equal(cached.geometry, first.geometry)
+    assert len(list(cache_dir.glob('flow-*.npz'))) == 1
+
+
+def test_editing_the_spec_replaces_the_cached_scene(tmp_path, cache_dir):
+    path = _write(tmp_path / 'flow.json', FLOWCHART)
+    specs.load_scene(path)
+    key = specs.scene_key(path)
+
+    _write(tmp_path / 'flow.json', dict(FLOWCHART, title='Renamed flow'))
+
+    assert specs.scene_key(path) != key
+    assert 'Renamed flow' in specs.load_scene(path).strings
+    assert [entry.name for entry in cache_dir.glob('flow-*.npz')] == [f'flow-{specs.scene_key(path)}.npz']
+
+
+def test_no_cache_leaves_nothing_behind(tmp_path, cache_dir):
+    path = _write(tmp_path / 'flow.json', FLOWCHART)
+    specs.load_scene(path, use_cache=False)
+    assert not cache_dir.exists()
@@ -0,0 +1,56 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import diagrams
+from diagrams import tiles
+from diagrams.spec import load_scene
+
+DPI = 72
+
+
+def test_stitched_tiles_equal_a_full_render(tmp_path):
+    # architecture has no dashed lines, whose pattern restarts at tile edges
+    stitched = tmp_path / 'stitched.png'
+    summary = tiles.write_pyramid(load_scene('architecture'), str(tmp_path), 'arch', dpi=DPI, tile_size=100,
+                                  stitch=str(stitched))
+
+    with Image.open(io.BytesIO(bytes(diagrams.render_bytes('architecture', dpi=DPI)))) as full:
+        expected = np.asarray(full.convert('RGB'))
+    with Image.open(stitched) as image:
+        assert np.array_equal(np.asarray(image), expected)
+    assert (summary['width'], summary['height']) == (expected.shape[1], expected.shape[0])
+    with Image.open(tmp_path / 'arch_files' / '0' / '0_0.png') as top:
+        assert top.size == (1, 1)
+    assert os.path.exists(tmp_path / 'arch.dzi') and os.path.exists(tmp_path / 'arch.html')
+
+
+def test_memory_limit_picks_the_largest_tile_that_fits():
+    limit = tiles.raster_bytes(128, 5000, stitch=True)
+
+    assert tiles.tile_size_for(limit, 5000, 3000, stitch=True) == 128
+    assert tiles.tile_size_for(limit - 1, 5000, 3000, stitch=True) == 64
+    assert tiles.tile_size_for(2**40, 300, 200) == 512
+
+
+def test_memory_limit_too_small_for_any_tile():
+    with pytest.raises(ValueError, match='even 16 px tiles'):
+        tiles.tile_size_for(1000, 5000, 3000)
+
+
+def test_explicit_tile_size_over_the_memory_limit_is_refused(tmp_path):
+    with pytest.raises(ValueError, match='tiles of 256 px need about'):
+        tiles.write_pyramid(load_scene('architecture'), str(tmp_path), 'arch', dpi=DPI, tile_size=256,
+                            memory_limit=tiles.raster_bytes(128, 10**4))
+    assert not os.listdir(tmp_path)
+
+
+def test_memory_limit_without_tile_size(tmp_path):
+    summary = tiles.write_pyramid(load_scene('gpa_flow'), str(tmp_path), 'gpa', dpi=DPI,
+                                  memory_limit=tiles.raster_bytes(64, 10**4), viewer=False)
+
+    assert summary['tile_size'] == 64
+    assert summary['raster_bytes'] <= tiles.raster_bytes(64, 10**4)
@@ -0,0 +1,39 @@
+import pytest
+
+import diagrams
+from diagrams import __main__ as cli
+
+
+def test_parse_variant():
+    assert diagrams.parse_variant('png@96') == ('png', 96)
+    assert diagrams.parse_variant('SVG') == ('svg', diagrams.DEFAULT_DPI)
+
+
+@pytest.mark.parametrize('text', ['', '@96', 'png@0', 'png@x', 'xyz', 'jpg@96'])
+def test_parse_variant_rejects(text):
+    with pytest.raises(ValueError):
+        diagrams.parse_variant(text)
+
+
+def test_output_formats_are_ones_matplotlib_can_write():
+    from matplotlib.backend_bases import FigureCanvasBase
+
+    assert set(diagrams.OUTPUT_FORMATS) <= set(FigureCanvasBase.get_supported_filetypes())
+
+
+def test_unsupported_format_is_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(['gpa_flow', '--variant', 'xyz'])
+
+    assert exc.value.code == 2
+    assert "unsupported output format 'xyz'" in capsys.readouterr().err
+
+
+def test_vector_variants_differing_only_in_dpi_write_one_file(tmp_path):
+    variants = [diagrams.parse_variant(text) for text in ['svg', 'svg@96', 'png', 'png@96', 'png']]
+
+    outputs = diagrams.variant_outputs('erd', variants, str(tmp_path))
+
+    assert [output for output, _, _ in outputs] == [str(tmp_path / 'database_erd.svg'),
+                                                    str(tmp_path / 'database_erd.png'),
+                                                    str(tmp_path / 'database_erd-96dpi.png')]
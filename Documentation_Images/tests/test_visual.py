@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from diagrams import visual
+
+
+@pytest.fixture
+def baseline(tmp_path, monkeypatch):
+    """An approved image in a temporary baseline, with its own thumbnail cache"""
+    monkeypatch.setattr(visual, 'THUMBNAIL_CACHE', str(tmp_path / 'cache'))
+    path = tmp_path / 'diagram.png'
+    draw_diagram(path)
+    baseline = str(tmp_path / 'baseline.json')
+    visual.approve([str(path)], baseline)
+    return path, baseline
+
+
+def draw_diagram(path, box=(200, 150, 500, 300), label='Student', compress_level=6):
+    image = Image.new('RGB', (1600, 1000), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle(box, outline='navy', width=6)
+    draw.text((box[0] + 20, box[1] + 20), label, fill='black', font_size=60)
+    draw.line((900, 200, 1400, 800), fill='gray', width=8)
+    image.save(path, compress_level=compress_level)
+
+
+def test_identical_bytes(baseline):
+    path, index = baseline
+    result, = visual.check([str(path)], index)
+
+    assert result['status'] == 'identical'
+
+
+def test_re_encoded_image_is_equivalent(baseline):
+    path, index = baseline
+    draw_diagram(path, compress_level=1)
+
+    result, = visual.check([str(path)], index)
+
+    assert (result['status'], result['hash_distance']) == ('equivalent', 0)
+
+
+def test_moved_box_is_changed(baseline, tmp_path):
+    path, index = baseline
+    draw_diagram(path, box=(260, 150, 560, 300))
+
+    result, = visual.check([str(path)], index, diff_dir=str(tmp_path / 'diffs'))
+
+    assert result['status'] == 'changed'
+    assert result['tiles_changed'] >= 1
+    assert os.path.exists(result['overlay'])
+    x0, y0, x1, y1 = result['region']
+    assert x0 <= 200 + 8 and x1 >= 560 - 8 and y0 <= 150 + 8 and y1 >= 300 - 8
+
+
+def test_missing_and_new(baseline, tmp_path):
+    _, index = baseline
+    new = tmp_path / 'other.png'
+    draw_diagram(new)
+
+    results = visual.check([str(tmp_path / 'diagram_gone.png'), str(new)], index)
+
+    assert [result['status'] for result in results] == ['missing', 'new']
+
+
+def test_load_thumbnails_returns_arrays_not_an_open_archive(baseline):
+    _, index = baseline
+
+    thumbnails = visual.load_thumbnails(index)
+
+    assert type(thumbnails) is dict
+    assert list(thumbnails) == ['diagram.png']
+    assert isinstance(thumbnails['diagram.png'], np.ndarray)
+    assert visual.load_thumbnails(index, names={'elsewhere.png'}) == {}
+
+
+def test_thumbnails_are_cached_by_file_stat(baseline, monkeypatch):
+    path, _ = baseline
+    pixels, size = visual.thumbnail(str(path))
+
+    def no_decoding(image):
+        raise AssertionError('decoded a cached image')
+
+    monkeypatch.setattr(visual, 'thumbnail_of', no_decoding)
+    cached, cached_size = visual.thumbnail(str(path))
+    assert np.array_equal(cached, pixels) and cached_size == size
+
+    draw_diagram(path, label='Course')
+    os.utime(path, ns=(0, 0))
+    with pytest.raises(AssertionError, match='decoded'):
+        visual.thumbnail(str(path))
+
+
+def test_remember_seeds_the_cache_for_baseline_images(baseline, monkeypatch):
+    path, index = baseline
+    monkeypatch.setattr(visual, 'BASELINE', index)
+    draw_diagram(path, label='Course')
+    with Image.open(path) as image:
+        image.load()
+        visual.remember(str(path), image)
+        expected = visual.thumbnail_of(image)[0]
+
+    assert np.array_equal(visual.cached_thumbnail(str(path))[0], expected)